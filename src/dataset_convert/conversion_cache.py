@@ -0,0 +1,28 @@
+import hashlib
+from utils.sqlite_cache import SQLiteCache
+
+# Part of every entry key: bump it with any RPLANConverter change to the converted entries
+CONVERTER_VERSION = "2"
+
+DEFAULT_CACHE_PATH = "datasets/.conversion_cache.sqlite"
+
+
+class ConversionCache(SQLiteCache):
+    """
+    On-disk cache of converted RPLAN entries, keyed by the content hash of a
+    HouseGAN JSON file, the conversion parameters and the converter version.
+
+    Entries that cannot be converted are cached as well (as None), so they are
+    not retried on every run.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, version: str = CONVERTER_VERSION):
+        super().__init__(path, "conversions")
+        self.version = version
+
+    def entry_key(self, content: bytes, round_value: int, pixel_to_meter: float) -> str:
+        """Hash a source file's bytes together with the conversion parameters and converter version."""
+        h = hashlib.sha256(f"{self.version}|{round_value}|{pixel_to_meter!r}".encode("utf-8"))
+        h.update(b"\0")
+        h.update(content)
+        return h.hexdigest()
@@ -8,6 +8,7 @@ import os
 import json
 import glob
 from pathlib import Path
+from src.metrics.results_store import ResultsStore
 
 def extract_rplan_ids(base_folder="results8_70B", output_file="list.txt"):
     """
@@ -18,6 +19,20 @@ def extract_rplan_ids(base_folder="results8_70B", output_file="list.txt"):
         output_file (str): Output file to save the list of rplan_ids
     """
     rplan_ids = []
+
+    results_dir = os.path.join(base_folder, "generations", "rplan_8_70B", "full_prompt")
+    store = ResultsStore(results_dir)
+    if store.is_current():
+        print(f"Reading rplan_ids from results table: {store.path}")
+        rows = store.rows(columns=["index", "rplan_id"])
+        # Same order as the sorted glob below (folder names sorted as strings)
+        for row in sorted(rows, key=lambda r: str(r["index"])):
+            if row["rplan_id"]:
+                rplan_ids.append(row["rplan_id"])
+            else:
+                print(f"  Warning: No rplan_id found for sample {row['index']}")
+        _save_rplan_ids(rplan_ids, output_file)
+        return
     
     # Pattern to find all analysis/sample.json files
     pattern = os.path.join(base_folder, "generations", "rplan_8_70B", "full_prompt", "*", "analysis", "sample.json")
@@ -57,7 +72,11 @@ def extract_rplan_ids(base_folder="results8_70B", output_file="list.txt"):
             print(f"  Error: File not found: {json_file}")
         except Exception as e:
             print(f"  Error: Unexpected error processing {json_file}: {e}")
-    
+
+    _save_rplan_ids(rplan_ids, output_file)
+
+def _save_rplan_ids(rplan_ids, output_file):
+    """Write unique rplan_ids (first occurrence order) to output_file, one <id>.json per line"""
     # Save to output file
     if rplan_ids:
         # Remove duplicates while preserving order
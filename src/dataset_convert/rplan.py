@@ -1,18 +1,123 @@
 import json
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
+from itertools import islice
 import random
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
 from pathlib import Path
-from datasets import DatasetDict, Dataset
+import numpy as np
+from datasets import DatasetDict, Dataset, Features, Value
 from sklearn.model_selection import train_test_split
 from shapely.geometry import LineString
 from shapely.ops import polygonize
-from shapely.affinity import scale
 from tqdm import tqdm
 from dataset_convert.rplan_graph import RPLANGraph
+from dataset_convert.conversion_cache import CONVERTER_VERSION, DEFAULT_CACHE_PATH, ConversionCache
 from utils.constants import RPLAN_ROOM_CLASS
 from collections import Counter, defaultdict
-import networkx as nx
+
+ROOM_NUMBERS = [5, 6, 7, 8]
+
+# Schema of converted entries; fixed so streamed batches never disagree on inferred types
+FEATURES = Features({
+    "rplan_id": Value("string"),
+    "room_count": Value("int64"),
+    "total_area": Value("float64"),
+    "input_graph": Value("string"),
+    "topology_hash": Value("string"),
+    # Lists of structs are written as [{...}], which every datasets version reads as a list
+    # (datasets.List only exists from datasets 4, and Sequence({...}) would mean a dict of lists)
+    "spaces": [{
+        "id": Value("string"),
+        "room_type": Value("string"),
+        "area": Value("float64"),
+        "width": Value("float64"),
+        "height": Value("float64"),
+        "floor_polygon": [{"x": Value("float64"), "y": Value("float64")}],
+    }],
+    "prompt": Value("string"),
+})
+
+# Per-process converter used by the conversion pool
+_WORKER_CONVERTER = None
+
+
+def _init_convert_worker(converter: "RPLANConverter") -> None:
+    global _WORKER_CONVERTER
+    _WORKER_CONVERTER = converter
+
+
+def _convert_chunk(chunk: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    return [_WORKER_CONVERTER._convert_entry(item) for item in chunk]
+
+
+def _rectilinear_ring(segments: List[List[float]]) -> Optional[np.ndarray]:
+    """
+    Assemble axis-aligned integer wall segments into a simple ring by walking the degree-2 vertices.
+
+    Returns the (N, 2) ring without the closing vertex, in the same vertex order shapely's polygonize
+    produces for the same input (clockwise, starting at the tail of the first unique segment), or None
+    when the segments are not a single simple rectilinear ring and polygonize has to decide.
+    """
+    unique = {tuple(seg) for seg in segments}
+    if len(unique) < 4:
+        return None
+    walls = np.array(list(unique), dtype=np.float64)
+    horizontal, vertical = walls[:, 1] == walls[:, 3], walls[:, 0] == walls[:, 2]
+    if not ((horizontal != vertical).all() and (walls == np.floor(walls)).all()):
+        # diagonal or zero-length wall, or off the pixel grid
+        return None
+
+    neighbours: Dict[tuple, List[tuple]] = {}
+    for x1, y1, x2, y2 in unique:
+        neighbours.setdefault((x1, y1), []).append((x2, y2))
+        neighbours.setdefault((x2, y2), []).append((x1, y1))
+    if len(neighbours) != len(unique) or any(len(n) != 2 for n in neighbours.values()):
+        return None
+
+    first = next(iter(unique))
+    start, prev, cur = first[:2], first[:2], first[2:]
+    ring = [start]
+    while cur != start:
+        ring.append(cur)
+        a, b = neighbours[cur]
+        prev, cur = cur, (b if a == prev else a)
+    if len(ring) != len(unique):
+        # more than one cycle
+        return None
+
+    closed = np.array(ring + ring[:2], dtype=np.float64)
+    ring, following = closed[:-2], closed[1:-1]
+    # No backtracking between consecutive walls, and every wall only meets itself and its two neighbours
+    # (axis-aligned segments intersect exactly when their bounding boxes do)
+    direction = np.diff(closed, axis=0)
+    if (direction[:-1] * direction[1:]).sum(axis=1).min() < 0:
+        return None
+    lo, hi = np.minimum(ring, following), np.maximum(ring, following)
+    touching = ((lo[:, None] <= hi[None, :]) & (lo[None, :] <= hi[:, None])).all(axis=2)
+    if (touching.sum(axis=1) != 3).any():
+        return None
+
+    # polygonize yields clockwise shells (negative signed area); walking the other way around
+    # starts from the other end of the first segment
+    if ring_signed_area(ring) > 0:
+        ring = np.concatenate([ring[1::-1], ring[:1:-1]])
+    return ring
+
+
+def ring_signed_area(ring: np.ndarray) -> float:
+    """Shoelace signed area of an (N, 2) ring without the closing vertex (positive when counter-clockwise)."""
+    x, y = ring[:, 0], ring[:, 1]
+    return float(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]) + x[-1] * y[0] - x[0] * y[-1]) / 2
+
+
+def _chunked(items: Iterable, size: int) -> Iterator[List]:
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
 
 @dataclass
 class RPLANConverter:
@@ -24,6 +129,13 @@ class RPLANConverter:
     room_map: Dict[int, str] = field(init=False)
     pixel_to_meter: float = field(init=False)
     room_number: int = 8
+    # Seed for every split/shuffle, so the same corpus always yields the same datasets
+    seed: int = 84
+    # Number of conversion processes and entries sent to a process at a time
+    workers: int = 1
+    chunk_size: int = 256
+    # SQLite cache of converted entries (see ConversionCache); None disables it
+    cache_path: Optional[str] = None
 
     def __post_init__(self):
         # reverse original_map to map code → name
@@ -34,6 +146,13 @@ class RPLANConverter:
     def _map_room_type(self, code: int) -> str:
         return self.room_map.get(code, str(code))
 
+    def _room_ring(self, segments: List[List[float]]) -> np.ndarray:
+        """(N, 2) room outline in meters, without the closing vertex."""
+        ring = _rectilinear_ring(segments)
+        if ring is None:
+            ring = np.asarray(self._segments_to_polygon(segments).exterior.coords[:-1], dtype=np.float64)
+        return ring * self.pixel_to_meter
+
     def _segments_to_polygon(self, segments: List[List[float]]):
         unique = {tuple(seg) for seg in segments}
         lines = [LineString([(x1, y1), (x2, y2)]) for x1, y1, x2, y2 in unique]
@@ -77,11 +196,10 @@ class RPLANConverter:
             if not segs:
                 return None
             try:
-                poly = self._segments_to_polygon(segs)
-                poly = scale(poly, xfact=self.pixel_to_meter, yfact=self.pixel_to_meter, origin=(0,0))
-                area = round(poly.area, self.round_value)
-                minx, miny, maxx, maxy = poly.bounds
-                is_rectangular = (len(poly.exterior.coords) - 1) == 4
+                ring = self._room_ring(segs)
+                area = round(abs(ring_signed_area(ring)), self.round_value)
+                (minx, miny), (maxx, maxy) = ring.min(axis=0).tolist(), ring.max(axis=0).tolist()
+                is_rectangular = len(ring) == 4
 
                 room_data = {
                     **room,
@@ -90,7 +208,7 @@ class RPLANConverter:
                     "height": round(maxy - miny, self.round_value) if is_rectangular else 0,
                     "floor_polygon": [
                         {"x": round(x, self.round_value), "y": round(y, self.round_value)}
-                        for x, y in poly.exterior.coords[:-1]
+                        for x, y in ring.tolist()
                     ]
                 }
                 # area = int(poly.area)
@@ -122,7 +240,7 @@ class RPLANConverter:
         })
         input_graph = fp_graph.to_labeled_adjacency()
         # remove entries with spaces with empty array
-        if any(not neigh for neigh in input_graph.values()) or not nx.is_connected(nx.from_dict_of_lists(input_graph)):
+        if any(not neigh for neigh in input_graph.values()) or not fp_graph.is_connected():
             return None
         
         only_rooms = [r for r in spaces if r["room_type"] not in ["interior_door"]]
@@ -162,52 +280,180 @@ class RPLANConverter:
             "total_area": round(total_area, self.round_value),
             # "total_area": int(total_area),
             "input_graph": json.dumps(input_graph),
+            "topology_hash": fp_graph.topology_hash(),
             "spaces": spaces,
             "prompt": json.dumps(input_data)
         }
 
-    def create_dataset(self, raw: List[Dict[str, Any]]) -> DatasetDict:
-        converted = [
-            out for item in tqdm(raw, desc="Converting entries")
-            if (out := self._convert_entry(item)) is not None
-        ]
-
-        if self.room_number == 0:
-            train, test_val = train_test_split(converted, test_size=0.2, shuffle=True)
-            test, val = train_test_split(test_val, test_size=0.5, shuffle=True)
+    def iter_converted(self, entries: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily convert raw entries, dropping the ones that cannot be converted.
+        With workers > 1 the entries are converted in a process pool; results keep the input order and
+        at most 2 * workers chunks are in flight, so memory stays bounded for any corpus size.
+        """
+        if self.workers <= 1:
+            for item in entries:
+                out = self._convert_entry(item)
+                if out is not None:
+                    yield out
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_convert_worker, initargs=(self,)) as pool:
+            pending = deque()
+            for chunk in _chunked(entries, self.chunk_size):
+                pending.append(pool.submit(_convert_chunk, chunk))
+                if len(pending) >= 2 * self.workers:
+                    yield from (out for out in pending.popleft().result() if out is not None)
+            while pending:
+                yield from (out for out in pending.popleft().result() if out is not None)
+
+    def convert_all(self, raw: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Convert a list of raw entries (see `iter_converted`)."""
+        return list(self.iter_converted(tqdm(raw, desc="Converting entries")))
+
+    def converted_dataset(self, folder: str) -> Dataset:
+        """
+        Stream a folder of HouseGAN JSON files through conversion into an Arrow-backed Dataset.
+        Files are read one at a time and written to the Arrow cache in batches, so neither the raw
+        corpus nor the converted entries are ever held in memory as a whole.
+        """
+        # The folder is passed rather than the file list: list-valued gen_kwargs would be
+        # treated as shards and the generator (and its process pool) run once per file
+        return Dataset.from_generator(
+            self._generate,
+            features=FEATURES,
+            gen_kwargs={"folder": folder},
+            fingerprint=self._folder_fingerprint(self._list_folder(folder)),
+        )
+
+    def _generate(self, folder: str) -> Iterator[Dict[str, Any]]:
+        files = tqdm(self._list_folder(folder), desc="Converting JSON files")
+        if self.cache_path is None:
+            yield from self.iter_converted(self._iter_files(files))
         else:
-            target_room_plans = [item for item in converted if item["room_count"] == self.room_number]
-            other_plans = [item for item in converted if item["room_count"] != self.room_number]
-            test, val = train_test_split(target_room_plans, test_size=0.5, shuffle=True)
-            random.seed(84)
-            random.shuffle(other_plans)
+            yield from self._iter_cached(files)
+
+    def _iter_cached(self, files: Iterable[Path]) -> Iterator[Dict[str, Any]]:
+        """
+        Like iter_converted over the files, but entries whose file content and conversion parameters
+        are already in the conversion cache are reused; only new or changed files are converted.
+        """
+        cache = ConversionCache(self.cache_path)
+        pool = None
+        if self.workers > 1:
+            pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_convert_worker, initargs=(self,))
+        try:
+            for batch in _chunked(files, max(1, self.workers) * self.chunk_size):
+                contents = [p.read_bytes() for p in batch]
+                keys = [cache.entry_key(content, self.round_value, self.pixel_to_meter) for content in contents]
+                cached = cache.get_many(keys)
+
+                missing = {}
+                for p, content, key in zip(batch, contents, keys):
+                    if key not in cached and key not in missing:
+                        data = json.loads(content)
+                        data["rplan_id"] = p.stem
+                        missing[key] = data
+                if pool is None:
+                    results = [self._convert_entry(data) for data in missing.values()]
+                else:
+                    chunks = _chunked(missing.values(), self.chunk_size)
+                    results = [out for chunk in pool.map(_convert_chunk, chunks) for out in chunk]
+                computed = dict(zip(missing, results))
+                cache.put_many(computed)
+
+                for p, key in zip(batch, keys):
+                    out = cached[key] if key in cached else computed[key]
+                    if out is not None:
+                        # The id comes from the file name, which is not part of the key
+                        yield {**out, "rplan_id": p.stem}
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            print(f"Conversion cache: {cache.hits} hits, {cache.misses} misses")
+            cache.close()
+
+    def _folder_fingerprint(self, files: List[Path]) -> str:
+        # Cached Arrow data is reused only while the files and conversion parameters are unchanged
+        h = hashlib.sha256(f"{CONVERTER_VERSION}|{self.round_value}|{self.pixel_to_meter}".encode("utf-8"))
+        for p in files:
+            stat = p.stat()
+            h.update(f"|{p.resolve()}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8"))
+        return h.hexdigest()
+
+    def split_dataset(self, converted: Union[Dataset, List[Dict[str, Any]]], room_number: Optional[int] = None) -> DatasetDict:
+        """
+        Build the train/test/validation splits for one room number from already converted entries
+        (room_number 0 means a random 80/10/10 split). Deterministic for a fixed seed.
+        Splits are index selections over the converted Dataset, so rows are not copied in memory.
+        """
+        if not isinstance(converted, Dataset):
+            converted = Dataset.from_list(converted, features=FEATURES)
+        room_number = self.room_number if room_number is None else room_number
+        indices = list(range(len(converted)))
+        if room_number == 0:
+            train, test_val = train_test_split(indices, test_size=0.2, shuffle=True, random_state=self.seed)
+            test, val = train_test_split(test_val, test_size=0.5, shuffle=True, random_state=self.seed)
+        else:
+            room_counts = converted["room_count"]
+            target_room_plans = [i for i, count in zip(indices, room_counts) if count == room_number]
+            other_plans = [i for i, count in zip(indices, room_counts) if count != room_number]
+            test, val = train_test_split(target_room_plans, test_size=0.5, shuffle=True, random_state=self.seed)
+            random.Random(self.seed).shuffle(other_plans)
             train = other_plans
 
         return DatasetDict({
-            "train": Dataset.from_list(train),
-            "test": Dataset.from_list(test),
-            "validation": Dataset.from_list(val),
+            "train": converted.select(train),
+            "test": converted.select(test),
+            "validation": converted.select(val),
         })
 
-    def _load_folder(self, folder: str) -> List[Dict[str, Any]]:
-        files = sorted(Path(folder).glob("*.json"), key=lambda p: int(p.stem))
-        raw = []
-        for p in tqdm(files, desc="Loading JSON files"):
+    def create_dataset(self, raw: List[Dict[str, Any]]) -> DatasetDict:
+        return self.split_dataset(self.convert_all(raw))
+
+    def create_datasets(self, source: Union[str, List[Dict[str, Any]]],
+                        room_numbers: List[int] = ROOM_NUMBERS) -> Dict[int, DatasetDict]:
+        """
+        Convert the corpus once (a folder is streamed, see `converted_dataset`) and derive the
+        rplan_N splits for every room number from it.
+        """
+        converted = self.converted_dataset(source) if isinstance(source, str) else self.convert_all(source)
+        if not isinstance(converted, Dataset):
+            converted = Dataset.from_list(converted, features=FEATURES)
+        return {room_number: self.split_dataset(converted, room_number) for room_number in room_numbers}
+
+    def _list_folder(self, folder: str) -> List[Path]:
+        return sorted(Path(folder).glob("*.json"), key=lambda p: int(p.stem))
+
+    def _iter_files(self, files: Iterable[Path]) -> Iterator[Dict[str, Any]]:
+        for p in files:
             data = json.loads(p.read_text())
             data["rplan_id"] = p.stem
-            raw.append(data)
-        return raw
+            yield data
+
+    def _load_folder(self, folder: str) -> List[Dict[str, Any]]:
+        return list(self._iter_files(tqdm(self._list_folder(folder), desc="Loading JSON files")))
 
     def __call__(self, folder: str) -> DatasetDict:
-        raw = self._load_folder(folder)
-        return self.create_dataset(raw)
+        return self.split_dataset(self.converted_dataset(folder))
 
 if __name__ == "__main__":
-    for room_number in [5, 6, 7, 8]:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert the RPLAN HouseGAN JSON corpus into rplan_N datasets")
+    parser.add_argument("--input", type=str, default="datasets/rplan_json", help="Folder of HouseGAN JSON files")
+    parser.add_argument("--output_prefix", type=str, default="datasets/rplan", help="Datasets are saved to <prefix>_<N>")
+    parser.add_argument("--room_numbers", type=int, nargs="+", default=ROOM_NUMBERS, help="Room numbers to build splits for")
+    parser.add_argument("--workers", type=int, default=1, help="Number of conversion processes (default: 1)")
+    parser.add_argument("--cache_path", type=str, default=DEFAULT_CACHE_PATH, help="Per-file conversion cache (SQLite)")
+    parser.add_argument("--no_cache", action="store_true", help="Convert every file from scratch")
+    args = parser.parse_args()
+
+    converter = RPLANConverter(workers=args.workers, cache_path=None if args.no_cache else args.cache_path)
+    datasets = converter.create_datasets(args.input, args.room_numbers)
+    for room_number, ds in datasets.items():
         print(f"Processing rplan_{room_number}")
-        converter = RPLANConverter(room_number=room_number)
-        ds = converter("datasets/rplan_json")
-        ds.save_to_disk(f"datasets/rplan_{room_number}")
+        ds.save_to_disk(f"{args.output_prefix}_{room_number}")
         print(f"Saved rplan_{room_number}")
         print(ds)
         print("Train sample:", ds["train"][0])
@@ -1,7 +1,12 @@
 from dataclasses import dataclass, field
+from functools import lru_cache
+import json
 import networkx as nx
-from typing import Any, Dict, List, Set
+import numpy as np
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 from collections import Counter, defaultdict
+from hashlib import blake2b
+import shapely
 from shapely.geometry import Polygon
 from itertools import combinations
 
@@ -20,21 +25,122 @@ ROOM_CLASS = {
   17: "interior_door",
 }
 
+ROOM_CLASS_BY_NAME = {name: code for code, name in ROOM_CLASS.items()}
+
+# Room type names indexed for the edge-type count matrices of batch_compatibility
+EDGE_TYPE_NAMES = sorted(set(ROOM_CLASS.values()))
+EDGE_TYPE_INDEX = {name: i for i, name in enumerate(EDGE_TYPE_NAMES)}
+
+# Buffer (meters) within which an interior door counts as touching a room
+DOOR_TOUCH_DISTANCE = 0.2
+
+# Number of distinct expected adjacencies kept by the process-wide expected_structure cache
+EXPECTED_STRUCTURE_CACHE_SIZE = 8192
+
 CMAP = {
   1: '#EE4D4D', 2: '#C67C7B', 3: '#FFD274', 4: '#BEBEBE', 5: '#BFE3E8', 6: '#7BA779', 7: '#E87A90', 8: '#FF8C69', 10: '#1F849B', 11: '#727171', 12: '#D3A2C7', 13: '#785A67', 15: '#FFFFFF'
 }
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class RPLANGraph:
     """
     Represent a floorplan as a graph.
+
+    Nodes are stored as arrays of original space indices and room types, edges as an (E, 2)
+    array of node positions (deduplicated, in insertion order). A networkx view is only
+    built on demand through `graph` (e.g. for `draw()`).
     """
     floorplan: Dict[str, Any]
     room_class: Dict[int,str] = field(default_factory=lambda: ROOM_CLASS.copy())
     cmap: Dict[int,str] = field(default_factory=lambda: CMAP.copy())
     room_door_types: Set[int] = frozenset({17})
     door_idxs: Set[int] = field(init=False)
-    graph: nx.Graph = field(init=False)
+    node_ids: np.ndarray = field(init=False, repr=False)
+    node_types: np.ndarray = field(init=False, repr=False)
+    edges: np.ndarray = field(init=False, repr=False)
+    floating_interior_doors: Optional[int] = field(init=False, default=None)
+    _graph: Optional[nx.Graph] = field(init=False, default=None, repr=False)
+
+    def _set_graph(self, nodes: Dict[int, int], edges: Iterable[Tuple[int, int]]) -> None:
+        """Store nodes (space index -> room type, in insertion order) and undirected edges between space indices."""
+        position = {idx: pos for pos, idx in enumerate(nodes)}
+        types = list(nodes.values())
+        seen = set()
+        pairs = []
+        for a, b in edges:
+            for idx in (a, b):
+                if idx not in position:
+                    # like networkx, an edge to an unknown node adds it (without a room type)
+                    position[idx] = len(types)
+                    types.append(-1)
+            key = (a, b) if a <= b else (b, a)
+            if key not in seen:
+                seen.add(key)
+                pairs.append((position[a], position[b]))
+        self.node_ids = np.fromiter(position, dtype=np.int64, count=len(position))
+        self.node_types = np.array(types, dtype=np.int64)
+        self.edges = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        self._graph = None
+
+    @property
+    def graph(self) -> nx.Graph:
+        """networkx view of the graph (nodes keyed by space index, with a room_type attribute)."""
+        if self._graph is None:
+            G = nx.Graph()
+            for idx, rt in zip(self.node_ids.tolist(), self.node_types.tolist()):
+                if rt == -1:
+                    G.add_node(idx)
+                else:
+                    G.add_node(idx, room_type=rt)
+            ids = self.node_ids
+            G.add_edges_from(zip(ids[self.edges[:, 0]].tolist(), ids[self.edges[:, 1]].tolist()))
+            self._graph = G
+        return self._graph
+
+    def _adjacency(self) -> List[List[int]]:
+        """Neighbour positions of every node, in the order networkx would list them."""
+        adjacency: List[List[int]] = [[] for _ in range(len(self.node_ids))]
+        for u, v in self.edges.tolist():
+            adjacency[u].append(v)
+            if u != v:
+                adjacency[v].append(u)
+        return adjacency
+
+    def is_connected(self) -> bool:
+        """Whether every node can be reached from every other one (False for an empty graph)."""
+        if not len(self.node_ids):
+            return False
+        adjacency = self._adjacency()
+        seen = {0}
+        stack = [0]
+        while stack:
+            for nb in adjacency[stack.pop()]:
+                if nb not in seen:
+                    seen.add(nb)
+                    stack.append(nb)
+        return len(seen) == len(adjacency)
+
+    def topology_hash(self, iterations: int = 3, digest_size: int = 16) -> str:
+        """
+        Weisfeiler-Lehman hash of the graph with room types as node labels.
+
+        Graphs with the same room-type adjacency structure (up to renumbering the spaces) get the same
+        hash; equal to networkx's weisfeiler_lehman_graph_hash(self.graph, node_attr="room_type").
+        """
+        if iterations <= 0:
+            raise ValueError("The WL algorithm requires that `iterations` be positive")
+
+        def hash_label(label: str) -> str:
+            return blake2b(label.encode("ascii"), digest_size=digest_size).hexdigest()
+
+        adjacency = self._adjacency()
+        labels = [str(rt) for rt in self.node_types.tolist()]
+        histogram = []
+        for _ in range(iterations):
+            labels = [hash_label(labels[pos] + "".join(sorted(labels[nb] for nb in nbrs)))
+                      for pos, nbrs in enumerate(adjacency)]
+            histogram.extend(sorted(Counter(labels).items()))
+        return hash_label(str(tuple(histogram)))
 
     @classmethod
     def from_housegan(cls, fp: Dict[str,Any]) -> "RPLANGraph":
@@ -46,89 +152,156 @@ class RPLANGraph:
             if t in inst.room_door_types
         }
 
-        G = nx.Graph()
-        for idx, t in enumerate(types):
-            if idx not in inst.door_idxs:
-                G.add_node(idx, room_type=t)
-
+        nodes = {idx: t for idx, t in enumerate(types) if idx not in inst.door_idxs}
+        edges = []
         for edge in fp.get("ed_rm", []):
             if len(edge) == 2:
                 a, b = edge
                 if a not in inst.door_idxs and b not in inst.door_idxs:
-                    G.add_edge(a, b)
+                    edges.append((a, b))
 
-        inst.graph = G
+        inst._set_graph(nodes, edges)
+        inst.floating_interior_doors = 0
         return inst
 
     @classmethod
-    def from_ds2d(cls, data: Dict[str,Any], gap_threshold: float = 0.2, boundary_tolerance: float = 0.3, overlap_threshold: float = 0.3) -> "RPLANGraph":
+    def from_ds2d(cls, data: Dict[str,Any], gap_threshold: float = DOOR_TOUCH_DISTANCE, boundary_tolerance: float = 0.3, overlap_threshold: float = 0.3) -> "RPLANGraph":
     # def from_ds2d(cls, data: Dict[str,Any], gap_threshold: float = 2, boundary_tolerance: float = 3, overlap_threshold: float = 0.3) -> "RPLANGraph":
         inst = cls(data)  # Store the original data
+        parsed = cls._ds2d_polygons(data)
+        if parsed is None:
+            inst.door_idxs = set()
+            inst._set_graph({}, [])
+            inst.floating_interior_doors = 0
+            return inst
+
+        room_polys, door_polys = parsed
+        touches = cls._door_touches(door_polys, room_polys, gap_threshold)
+        inst._build_ds2d_graph(room_polys, door_polys, touches, boundary_tolerance, overlap_threshold)
+        # Floating doors are always judged at DOOR_TOUCH_DISTANCE; reuse the touch sets when they match
+        if gap_threshold != DOOR_TOUCH_DISTANCE:
+            touches = cls._door_touches(door_polys, room_polys, DOOR_TOUCH_DISTANCE)
+        inst.floating_interior_doors = cls._count_floating(touches)
+        return inst
+
+    @staticmethod
+    def _ds2d_polygons(data: Dict[str, Any], report: bool = True) -> Optional[Tuple[Dict[int, Polygon], Dict[int, Polygon]]]:
+        """
+        Parse the room and interior door polygons of DS2D data, keyed by space index.
+        Malformed spaces are skipped (and reported); None when the data itself is malformed.
+        """
         room_polys = {}
         door_polys = {}
-        name_to_int = {v:k for k,v in ROOM_CLASS.items()}
+        shells = {}
 
         # Validate data structure
         if not isinstance(data, dict) or "spaces" not in data:
-            print(f"ERROR: from_ds2d data is malformed: {data}")
-            inst.door_idxs = set()
-            inst.graph = nx.Graph()
-            return inst
+            if report:
+                print(f"ERROR: from_ds2d data is malformed: {data}")
+            return None
 
         spaces = data["spaces"]
         if not isinstance(spaces, list):
-            print(f"ERROR: from_ds2d spaces is not a list: {spaces}")
-            inst.door_idxs = set()
-            inst.graph = nx.Graph()
-            return inst
+            if report:
+                print(f"ERROR: from_ds2d spaces is not a list: {spaces}")
+            return None
 
         for idx, item in enumerate(spaces):
             # Validate item is a dictionary
             if not isinstance(item, dict):
-                print(f"ERROR: from_ds2d room {idx} is not a dict: {item}")
+                if report:
+                    print(f"ERROR: from_ds2d room {idx} is not a dict: {item}")
                 continue
 
             # Validate required keys exist
             if "floor_polygon" not in item or "room_type" not in item:
-                print(f"ERROR: from_ds2d room {idx} missing required keys: {item}")
+                if report:
+                    print(f"ERROR: from_ds2d room {idx} missing required keys: {item}")
                 continue
 
             floor_polygon = item["floor_polygon"]
             if not isinstance(floor_polygon, list):
-                print(f"ERROR: from_ds2d room {idx} floor_polygon is not a list: {floor_polygon}")
+                if report:
+                    print(f"ERROR: from_ds2d room {idx} floor_polygon is not a list: {floor_polygon}")
                 continue
 
-            try:
-                coords = []
-                for pt_idx, pt in enumerate(floor_polygon):
-                    if not isinstance(pt, dict) or "x" not in pt or "y" not in pt:
+            coords = []
+            for pt_idx, pt in enumerate(floor_polygon):
+                if not isinstance(pt, dict) or "x" not in pt or "y" not in pt:
+                    if report:
                         print(f"ERROR: from_ds2d room {idx} point {pt_idx} is malformed: {pt}")
-                        break
-                    coords.append((pt["x"], pt["y"]))
+                    break
+                coords.append((pt["x"], pt["y"]))
 
-                if len(coords) != len(floor_polygon):
-                    continue  # Skip this room if any points were invalid
+            if len(coords) != len(floor_polygon):
+                continue  # Skip this room if any points were invalid
+            shells[idx] = coords
 
-                poly = Polygon(coords)
-                if item["room_type"] == "interior_door":
-                    door_polys[idx] = poly
-                else:
-                    room_polys[idx] = poly
-            except Exception as e:
-                print(f"ERROR: from_ds2d processing room {idx}: {e}")
+        polys = RPLANGraph._build_polygons(shells, report)
+        for idx, poly in polys.items():
+            if spaces[idx]["room_type"] == "interior_door":
+                door_polys[idx] = poly
+            else:
+                room_polys[idx] = poly
+        return room_polys, door_polys
+
+    @staticmethod
+    def _build_polygons(shells: Dict[int, List[Tuple[Any, Any]]], report: bool = True) -> Dict[int, Polygon]:
+        """
+        Polygon(coords) for every shell, skipping (and reporting) the ones shapely rejects.
+        Shells that close into a valid ring are built in one vectorized call.
+        """
+        polys: Dict[int, Polygon] = {}
+        simple = [
+            idx for idx, coords in shells.items()
+            if len(coords) >= 4 or (len(coords) == 3 and coords[0] != coords[-1])
+        ]
+        if simple:
+            try:
+                flat = np.array([pt for idx in simple for pt in shells[idx]], dtype=np.float64)
+                ring_idx = np.repeat(np.arange(len(simple)), [len(shells[idx]) for idx in simple])
+                polys = dict(zip(simple, shapely.polygons(shapely.linearrings(flat, indices=ring_idx)).tolist()))
+            except Exception:
+                polys = {}
+
+        for idx, coords in shells.items():
+            if idx in polys:
                 continue
-        inst.door_idxs = set(door_polys.keys())
-        G = nx.Graph()
+            try:
+                polys[idx] = Polygon(coords)
+            except Exception as e:
+                if report:
+                    print(f"ERROR: from_ds2d processing room {idx}: {e}")
+        return dict(sorted(polys.items()))
+
+    @staticmethod
+    def _door_touches(door_polys: Dict[int, Polygon], room_polys: Dict[int, Polygon], gap_threshold: float) -> Dict[int, List[int]]:
+        """Rooms (in space order) intersecting each door buffered by gap_threshold, tested in one vectorized call."""
+        if not door_polys:
+            return {}
+        room_idxs = list(room_polys)
+        if not room_idxs:
+            return {door_idx: [] for door_idx in door_polys}
+        buffers = shapely.buffer(np.array(list(door_polys.values()), dtype=object), gap_threshold)
+        hits = shapely.intersects(buffers[:, None], np.array(list(room_polys.values()), dtype=object)[None, :])
+        return {door_idx: [room_idxs[i] for i in np.flatnonzero(row)] for door_idx, row in zip(door_polys, hits)}
+
+    def _build_ds2d_graph(self, room_polys: Dict[int, Polygon], door_polys: Dict[int, Polygon],
+                          touches: Dict[int, List[int]], boundary_tolerance: float, overlap_threshold: float) -> None:
+        data = self.floorplan
+        name_to_int = ROOM_CLASS_BY_NAME
+        self.door_idxs = set(door_polys.keys())
+        nodes = {}
+        edges = []
         for idx in room_polys:
-            rt_int = name_to_int.get(data["spaces"][idx]["room_type"], name_to_int["unknown"])
-            G.add_node(idx, room_type=rt_int)
+            nodes[idx] = name_to_int.get(data["spaces"][idx]["room_type"], name_to_int["unknown"])
 
         # Track door connections to detect multiple doors between same rooms
         door_connections = defaultdict(list)
 
         for door_idx, door_poly in door_polys.items():
-            buf = door_poly.buffer(gap_threshold)
-            touching = [i for i,p in room_polys.items() if buf.intersects(p)]
+            touching = touches[door_idx]
+            valid_connection = None
 
             for a,b in combinations(touching, 2):
                 # Validation 1: Check if the door is close to the gap between the two spaces
@@ -145,16 +318,18 @@ class RPLANGraph:
                     continue  # Skip if door is too far from either room boundary
 
                 # Validation 2: Check if door significantly overlaps with room interiors
-                door_area = door_poly.area
-
-                valid_connection = True
-                for room_poly in room_polys.values():
-                    if door_poly.overlaps(room_poly):
-                        overlap_area = door_poly.intersection(room_poly).area
-                        overlap_ratio = overlap_area / door_area if door_area > 0 else 0
-                        if overlap_ratio > overlap_threshold:
-                            valid_connection = False
-                            break
+                # (independent of the room pair, so evaluated once per door)
+                if valid_connection is None:
+                    door_area = door_poly.area
+
+                    valid_connection = True
+                    for room_poly in room_polys.values():
+                        if door_poly.overlaps(room_poly):
+                            overlap_area = door_poly.intersection(room_poly).area
+                            overlap_ratio = overlap_area / door_area if door_area > 0 else 0
+                            if overlap_ratio > overlap_threshold:
+                                valid_connection = False
+                                break
 
                 if not valid_connection:
                     continue  # Skip this connection if door overlaps significantly with any room
@@ -170,8 +345,7 @@ class RPLANGraph:
         # Only add connections for room pairs that have exactly one door
         for room_pair, door_list in door_connections.items():
             if len(door_list) == 1:  # Only connect if exactly one door
-                a, b = room_pair
-                G.add_edge(a, b)
+                edges.append(room_pair)
 
         # Handle front_door connections (special case: floating door connecting to one room)
         front_door_idxs = [idx for idx in room_polys.keys() if data["spaces"][idx]["room_type"] == "front_door"]
@@ -193,142 +367,90 @@ class RPLANGraph:
 
             # Connect front_door to the closest room
             if closest_room is not None:
-                G.add_edge(fd_idx, closest_room)
+                edges.append((fd_idx, closest_room))
 
-        inst.graph = G
-        return inst
+        self._set_graph(nodes, edges)
 
     @classmethod
     def from_labeled_adjacency(cls, labeled: Dict[str, List[str]]) -> "RPLANGraph":
         inst = cls({})
-        G = nx.Graph()
-        name_to_int = {v: k for k, v in ROOM_CLASS.items()}
+        name_to_int = ROOM_CLASS_BY_NAME
         label_to_idx: Dict[str, int] = {}
+        nodes = {}
         for idx, label in enumerate(labeled):
             label_to_idx[label] = idx
             base = label.split("|", 1)[0]
-            rt_int = name_to_int.get(base, name_to_int["unknown"])
-            G.add_node(idx, room_type=rt_int)
+            nodes[idx] = name_to_int.get(base, name_to_int["unknown"])
+        edges = []
         for src_label, nbr_labels in labeled.items():
             a = label_to_idx[src_label]
             for nb_label in nbr_labels:
-                b = label_to_idx[nb_label]
-                G.add_edge(a, b)
-        inst.graph = G
+                edges.append((a, label_to_idx[nb_label]))
+        inst._set_graph(nodes, edges)
         inst.door_idxs = set()
+        inst.floating_interior_doors = 0
         return inst
 
     def to_labeled_adjacency(self) -> Dict[str, List[str]]:
-        raw_adj = {n: list(self.graph.neighbors(n)) for n in self.graph.nodes()}
-        counts = Counter(self.graph.nodes[n]['room_type'] for n in self.graph.nodes())
+        ids = self.node_ids.tolist()
+        types = self.node_types.tolist()
+        counts = Counter(types)
         type_seq: Dict[int, int] = defaultdict(int)
-        type_idx: Dict[int, Any] = {}
+        labels: List[str] = [""] * len(ids)
 
-        for idx in sorted(self.graph.nodes):
-            rt = self.graph.nodes[idx]['room_type']
+        # duplicated room types are numbered in space index order
+        for pos in sorted(range(len(ids)), key=ids.__getitem__):
+            rt = types[pos]
+            base = self.room_class[rt]
             if counts[rt] > 1:
-                type_idx[idx] = type_seq[rt]
+                labels[pos] = f"{base}|{type_seq[rt]}"
                 type_seq[rt] += 1
             else:
-                type_idx[idx] = None
+                labels[pos] = base
 
-        labeled: Dict[str, List[str]] = {}
-        for idx, nbrs in raw_adj.items():
-            rt = self.graph.nodes[idx]['room_type']
-            base = self.room_class[rt]
-            src_label = f"{base}|{type_idx[idx]}" if type_idx[idx] is not None else base
-            neighbor_labels: List[str] = []
-            for n in nbrs:
-                rt_n = self.graph.nodes[n]['room_type']
-                nb_base = self.room_class[rt_n]
-                nb_label = f"{nb_base}|{type_idx[n]}" if type_idx[n] is not None else nb_base
-                neighbor_labels.append(nb_label)
-            labeled[src_label] = neighbor_labels
-        return labeled
-
-    def _multiset_edges(self, graph: nx.Graph) -> Counter:
+        return {labels[pos]: [labels[nb] for nb in nbrs] for pos, nbrs in enumerate(self._adjacency())}
+
+    def _multiset_edges(self, graph: "RPLANGraph") -> Counter:
         """Helper method to count edges by room type pairs"""
+        names = [self.room_class.get(rt, 'unknown') for rt in graph.node_types.tolist()]
         cnt = Counter()
-        for u, v in graph.edges():
-            rt_u = graph.nodes[u]['room_type']
-            rt_v = graph.nodes[v]['room_type']
-            base_u = self.room_class.get(rt_u, 'unknown')
-            base_v = self.room_class.get(rt_v, 'unknown')
-            edge = tuple(sorted((base_u, base_v)))
-            cnt[edge] += 1
+        for u, v in graph.edges.tolist():
+            base_u, base_v = names[u], names[v]
+            cnt[(base_u, base_v) if base_u <= base_v else (base_v, base_u)] += 1
         return cnt
 
-    def _count_front_doors(self, graph: nx.Graph) -> int:
+    def _count_front_doors(self, graph: "RPLANGraph") -> int:
         """Helper method to count front door nodes"""
-        return sum(1 for n in graph.nodes() if graph.nodes[n]['room_type'] == 15)
+        return int((graph.node_types == 15).sum())
 
     def _count_floating_interior_doors_from_ds2d(self, data: Dict[str, Any]) -> int:
         """Helper method to count floating interior doors from DS2D data"""
-        if not isinstance(data, dict) or "spaces" not in data:
+        parsed = self._ds2d_polygons(data, report=False)
+        if parsed is None:
             return 0
+        room_polys, door_polys = parsed
+        return self._count_floating(self._door_touches(door_polys, room_polys, DOOR_TOUCH_DISTANCE))
 
-        spaces = data["spaces"]
-        if not isinstance(spaces, list):
-            return 0
-
-        floating_count = 0
-
-        # Find all interior doors
-        door_polys = {}
-        room_polys = {}
-
-        for idx, item in enumerate(spaces):
-            if not isinstance(item, dict) or "floor_polygon" not in item or "room_type" not in item:
-                continue
-
-            floor_polygon = item["floor_polygon"]
-            if not isinstance(floor_polygon, list):
-                continue
-
-            try:
-                coords = []
-                for pt in floor_polygon:
-                    if not isinstance(pt, dict) or "x" not in pt or "y" not in pt:
-                        break
-                    coords.append((pt["x"], pt["y"]))
-
-                if len(coords) != len(floor_polygon):
-                    continue
-
-                from shapely.geometry import Polygon
-                poly = Polygon(coords)
-
-                if item["room_type"] == "interior_door":
-                    door_polys[idx] = poly
-                else:
-                    room_polys[idx] = poly
-            except Exception:
-                continue
-
-        # Check each door to see if it's floating
-        for door_idx, door_poly in door_polys.items():
-            # Count how many rooms this door touches
-            touching_rooms = 0
-            for room_idx, room_poly in room_polys.items():
-                if door_poly.buffer(0.2).intersects(room_poly):
-                # if door_poly.buffer(2).intersects(room_poly):
-                    touching_rooms += 1
-
-            # If door touches 0 or 1 room, it's floating
-            if touching_rooms <= 1:
-                floating_count += 1
-
-        return floating_count
+    @staticmethod
+    def _count_floating(touches: Dict[int, List[int]]) -> int:
+        """Doors touching 0 or 1 room are floating"""
+        return sum(1 for rooms in touches.values() if len(rooms) <= 1)
 
     def _get_floating_interior_door_count(self, obj) -> int:
+        count = getattr(obj, 'floating_interior_doors', None)
+        if count is not None:
+            return count
         floorplan = getattr(obj, 'floorplan', None)
+        count = 0
         if isinstance(floorplan, dict) and "spaces" in floorplan:
-            return self._count_floating_interior_doors_from_ds2d(floorplan)
-        return 0
+            count = self._count_floating_interior_doors_from_ds2d(floorplan)
+        if isinstance(obj, RPLANGraph):
+            obj.floating_interior_doors = count
+        return count
 
     def compatibility_score(self, other: "RPLANGraph") -> int:
-        c1 = self._multiset_edges(self.graph)
-        c2 = self._multiset_edges(other.graph)
+        c1 = self._multiset_edges(self)
+        c2 = self._multiset_edges(other)
         all_edges = set(c1.keys()) | set(c2.keys())
         edge_mistakes = sum(abs(c1[e] - c2[e]) for e in all_edges)
 
@@ -340,8 +462,8 @@ class RPLANGraph:
         return edge_mistakes + floating_penalty
 
     def compatibility_score_scaled(self, other: "RPLANGraph") -> float:
-        c1 = self._multiset_edges(self.graph)
-        c2 = self._multiset_edges(other.graph)
+        c1 = self._multiset_edges(self)
+        c2 = self._multiset_edges(other)
         all_edges = set(c1.keys()) | set(c2.keys())
 
         edge_mismatches = sum(abs(c1[e] - c2[e]) for e in all_edges)
@@ -359,6 +481,85 @@ class RPLANGraph:
             return 1.0
         return 1.0 - total_mismatches / total_elements
 
+    @staticmethod
+    def _edge_type_counts(graphs: List["RPLANGraph"]) -> np.ndarray:
+        """(len(graphs), T * T) matrix counting each graph's edges per room type name pair, as _multiset_edges does."""
+        size = len(EDGE_TYPE_NAMES)
+        counts = np.zeros((len(graphs), size * size), dtype=np.int64)
+        edge_counts = np.fromiter((len(g.edges) for g in graphs), dtype=np.int64, count=len(graphs))
+        if not edge_counts.sum():
+            return counts
+
+        # Offset every graph's node positions into one concatenated node array
+        node_counts = np.fromiter((len(g.node_types) for g in graphs), dtype=np.int64, count=len(graphs))
+        offsets = np.cumsum(node_counts) - node_counts
+        types = np.concatenate([g.node_types for g in graphs])
+        edges = np.concatenate([g.edges for g in graphs]) + np.repeat(offsets, edge_counts)[:, None]
+        owners = np.repeat(np.arange(len(graphs)), edge_counts)
+
+        codes, inverse = np.unique(types, return_inverse=True)
+        code_names = np.array([EDGE_TYPE_INDEX[ROOM_CLASS.get(code, "unknown")] for code in codes.tolist()], dtype=np.int64)
+        pairs = np.sort(code_names[inverse.reshape(-1)][edges], axis=1)
+        np.add.at(counts, (owners, pairs[:, 0] * size + pairs[:, 1]), 1)
+        return counts
+
+    @classmethod
+    def batch_compatibility(cls, outputs: Sequence[Any], expecteds: Sequence[Dict[str, List[str]]],
+                            scaled: bool = False, boundary_tolerance: float = 0.3,
+                            overlap_threshold: float = 0.3) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compatibility of many (DS2D output, expected labeled adjacency) pairs at once.
+
+        Every output is parsed once by from_ds2d, which also records its floating interior door count;
+        expected adjacencies come from the process-wide expected_structure cache. The edge multisets of
+        all pairs are then compared as count matrices.
+
+        Returns:
+            scores: compatibility_score of each output against its expected graph
+                (compatibility_score_scaled if scaled), NaN where the pair could not be scored
+            floating: floating interior door count of each output, -1 where it could not be scored
+        """
+        if len(outputs) != len(expecteds):
+            raise ValueError(f"Got {len(outputs)} outputs but {len(expecteds)} expected graphs")
+        scores = np.full(len(outputs), np.nan)
+        floating = np.full(len(outputs), -1, dtype=np.int64)
+
+        expected_counts: Dict[int, np.ndarray] = {}
+        ok, out_graphs, exp_counts, out_floating = [], [], [], []
+        for i, (output, expected) in enumerate(zip(outputs, expecteds)):
+            try:
+                if id(expected) not in expected_counts:
+                    expected_counts[id(expected)] = expected_structure(expected).edge_counts
+                exp_row = expected_counts[id(expected)]
+
+                out_graph = cls.from_ds2d(output, boundary_tolerance=boundary_tolerance,
+                                          overlap_threshold=overlap_threshold)
+            except Exception:
+                continue
+            ok.append(i)
+            out_graphs.append(out_graph)
+            exp_counts.append(exp_row)
+            out_floating.append(out_graph.floating_interior_doors)
+
+        if not ok:
+            return scores, floating
+
+        c1 = cls._edge_type_counts(out_graphs)
+        c2 = np.stack(exp_counts)
+        # Labeled adjacencies have no floating doors, so only the outputs' count toward the penalty
+        floating1 = np.array(out_floating, dtype=np.int64)
+        floating_penalty = floating1
+        mismatches = np.abs(c1 - c2).sum(axis=1) + floating_penalty
+        if scaled:
+            total = np.maximum(c1, c2).sum(axis=1) + floating_penalty
+            pair_scores = np.where(total == 0, 1.0, 1.0 - mismatches / np.maximum(total, 1))
+        else:
+            pair_scores = mismatches.astype(np.float64)
+
+        scores[ok] = pair_scores
+        floating[ok] = floating1
+        return scores, floating
+
     def draw(self, title: str = "Input Graph", seed: int = 42) -> None:
         import matplotlib.pyplot as plt
         pos = nx.spring_layout(self.graph, seed=seed)
@@ -392,3 +593,70 @@ class RPLANGraph:
         nx.draw_networkx_edges(self.graph, pos, width=2)
         plt.title(title)
         plt.axis("off")
+
+
+@dataclass(frozen=True)
+class ExpectedStructure:
+    """
+    What scoring needs from an expected labeled adjacency: its edge counts per room type name pair
+    (a row of RPLANGraph._edge_type_counts, read-only) and its number of nodes per room type.
+    """
+    edge_counts: np.ndarray
+    node_type_counts: Dict[int, int]
+
+
+def canonical_adjacency_key(labeled: Dict[str, List[str]]) -> Tuple[Tuple[int, ...], Tuple[Tuple[int, int], ...]]:
+    """
+    Label-free canonical form of a labeled adjacency, the key of the expected_structure cache: its sorted
+    node room types and the sorted room type pairs of its undirected edges, each edge counted once as
+    from_labeled_adjacency stores it. Adjacencies that differ only in room numbering, label order or
+    neighbor order share a key, and the key determines the ExpectedStructure.
+    """
+    unknown = ROOM_CLASS_BY_NAME["unknown"]
+    types = {label: ROOM_CLASS_BY_NAME.get(label.split("|", 1)[0], unknown) for label in labeled}
+    seen = set()
+    pairs = []
+    for src, nbrs in labeled.items():
+        for nb in nbrs:
+            edge = (src, nb) if src <= nb else (nb, src)
+            if edge in seen:
+                continue
+            seen.add(edge)
+            # A neighbor that is not a node fails here, as in from_labeled_adjacency
+            a, b = types[src], types[nb]
+            pairs.append((a, b) if a <= b else (b, a))
+    return tuple(sorted(types.values())), tuple(sorted(pairs))
+
+
+@lru_cache(maxsize=EXPECTED_STRUCTURE_CACHE_SIZE)
+def _expected_structure(key: Tuple[Tuple[int, ...], Tuple[Tuple[int, int], ...]]) -> ExpectedStructure:
+    node_types, edge_pairs = key
+    size = len(EDGE_TYPE_NAMES)
+    edge_counts = np.zeros(size * size, dtype=np.int64)
+    for a, b in edge_pairs:
+        i, j = sorted((EDGE_TYPE_INDEX[ROOM_CLASS.get(a, "unknown")], EDGE_TYPE_INDEX[ROOM_CLASS.get(b, "unknown")]))
+        edge_counts[i * size + j] += 1
+    edge_counts.setflags(write=False)
+    return ExpectedStructure(edge_counts, dict(Counter(node_types)))
+
+
+def expected_structure(labeled: Dict[str, List[str]]) -> ExpectedStructure:
+    """
+    Edge and node type counts of an expected labeled adjacency, memoized per process on its label-free canonical form.
+    Test prompts repeat the same input graphs (and GRPO scores every generation of a prompt against it),
+    so rewards, candidate ranking and metrics share one bounded LRU cache instead of rebuilding the graph.
+    """
+    return _expected_structure(canonical_adjacency_key(labeled))
+
+
+def expected_structure_cache_info() -> Dict[str, Any]:
+    """Hits, misses, current and maximum size and hit rate of the expected_structure cache."""
+    info = _expected_structure.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+    }
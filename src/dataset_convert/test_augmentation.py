@@ -0,0 +1,79 @@
+import json
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+# rplan.py imports its siblings through the src root; augmentation is a sibling module of src/train
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "train"))
+from augmentation import DIHEDRAL, HOUSE_EXTENT, FloorplanAugmenter
+from rplan import ring_signed_area
+from test_fixtures import *
+
+FIXTURES = ["sample_ds2d_data", "complex_ds2d_data", "multiple_doors_ds2d_data"]
+
+
+def converted_sample(ds2d_data):
+    """A converted sample (rplan.py columns) from a DS2D fixture, with clockwise rings like the converter's"""
+    spaces = []
+    for space in ds2d_data["spaces"]:
+        ring = np.array([[p["x"], p["y"]] for p in space["floor_polygon"]])
+        if ring_signed_area(ring) > 0:
+            ring = ring[::-1]
+        (minx, miny), (maxx, maxy) = ring.min(axis=0), ring.max(axis=0)
+        spaces.append({
+            "id": space["id"],
+            "room_type": space["room_type"],
+            "area": space.get("area"),
+            "width": round(maxx - minx, 2),
+            "height": round(maxy - miny, 2),
+            "floor_polygon": [{"x": float(x), "y": float(y)} for x, y in ring],
+        })
+    prompt = {"input": {"room_count": len(spaces), "spaces": [
+        {"id": s["id"], "room_type": s["room_type"], "width": s["width"], "height": s["height"]} for s in spaces
+    ]}}
+    return {"room_count": len(spaces), "spaces": spaces, "prompt": json.dumps(prompt)}
+
+
+def ring(space):
+    return np.array([[p["x"], p["y"]] for p in space["floor_polygon"]])
+
+
+class TestFloorplanAugmenter:
+    """Augmentations keep the geometry that the prompt and the metrics depend on"""
+
+    @pytest.mark.parametrize("fixture_name", FIXTURES)
+    def test_symmetries_keep_geometry(self, fixture_name, request):
+        """Every symmetry keeps signed areas, the 2-decimal grid and the house extent, and swaps extents on quarter turns"""
+        sample = converted_sample(request.getfixturevalue(fixture_name))
+        augmenter = FloorplanAugmenter(seed=0)
+        augmented = augmenter.transform_polygons([sample["spaces"]] * len(DIHEDRAL), np.arange(len(DIHEDRAL)))
+        for symmetry, spaces in enumerate(augmented):
+            for original, space in zip(sample["spaces"], spaces):
+                before, after = ring(original), ring(space)
+                assert ring_signed_area(after) == pytest.approx(ring_signed_area(before), abs=1e-9)
+                assert np.array_equal(np.round(after, 2), after)
+                assert after.min() >= 0 and after.max() <= HOUSE_EXTENT
+                extent = np.round(after.max(axis=0) - after.min(axis=0), 2)
+                expected = (original["width"], original["height"])
+                assert tuple(extent) == (expected[::-1] if symmetry % 2 else expected)
+
+    @pytest.mark.parametrize("fixture_name", FIXTURES)
+    def test_batch_keeps_rooms(self, fixture_name, request):
+        """Augmented batches keep areas, widths and heights matching the polygons, in the spaces and the prompt"""
+        sample = converted_sample(request.getfixturevalue(fixture_name))
+        batch = {key: [value] * 16 for key, value in sample.items()}
+        augmented = FloorplanAugmenter(seed=0)(batch)
+        areas = {space["id"]: space["area"] for space in sample["spaces"]}
+        for spaces, prompt in zip(augmented["spaces"], augmented["prompt"]):
+            assert sorted(space["id"] for space in spaces) == sorted(areas)
+            for space in spaces:
+                polygon = ring(space)
+                assert space["area"] == areas[space["id"]]
+                assert ring_signed_area(polygon) < 0
+                extent = np.round(polygon.max(axis=0) - polygon.min(axis=0), 2)
+                assert (space["width"], space["height"]) == tuple(extent)
+            rooms = json.loads(prompt)["input"]["spaces"]
+            assert [room["id"] for room in rooms] == [space["id"] for space in spaces]
+            assert [(room["width"], room["height"]) for room in rooms] == [(s["width"], s["height"]) for s in spaces]
@@ -0,0 +1,55 @@
+import json
+import sys
+from pathlib import Path
+import pytest
+
+# create_example and extract_output_json import their siblings through the repository root (src.utils)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.pred.extract_output_json import extract_output_json
+from src.utils.compact_format import compact_floorplan, expand_floorplan
+from src.utils.create_example import create_output
+from test_fixtures import *
+
+FIXTURES = ["sample_ds2d_data", "complex_ds2d_data", "multiple_doors_ds2d_data"]
+
+
+def converted_sample(ds2d_data):
+    """A converted sample (rplan.py columns) from a DS2D fixture"""
+    return {
+        "room_count": ds2d_data.get("room_count", len(ds2d_data["spaces"])),
+        "total_area": round(sum(space.get("area", 0) for space in ds2d_data["spaces"]), 2),
+        "spaces": ds2d_data["spaces"],
+    }
+
+
+class TestCompactFormat:
+    """The compact encoding reverses to the default one"""
+
+    @pytest.mark.parametrize("fixture_name", FIXTURES)
+    def test_output_round_trip(self, fixture_name, request):
+        """extract_output_json(compact=True) of the compact target equals the default target"""
+        sample = converted_sample(request.getfixturevalue(fixture_name))
+        default = extract_output_json(create_output(sample))
+        compact = create_output(sample, compact=True)
+
+        assert extract_output_json(compact, compact=True) == default
+        assert extract_output_json(f"assistant\n{compact}", compact=True) == default
+        assert len(compact) < len(create_output(sample))
+
+    def test_floorplan_round_trip(self):
+        """Every 2-decimal coordinate survives the fixed-point encoding exactly"""
+        coords = [round(i * 0.01, 2) for i in range(1801)]
+        floorplan = {
+            "room_count": 1,
+            "spaces": [{"id": "living_room", "floor_polygon": [{"x": x, "y": y} for x, y in zip(coords, reversed(coords))]}],
+        }
+        compact = compact_floorplan(floorplan)
+        assert all(isinstance(v, int) for vertex in compact["spaces"][0]["floor_polygon"] for v in vertex)
+        assert expand_floorplan(json.loads(json.dumps(compact))) == floorplan
+
+    def test_expand_keeps_default_vertices(self):
+        """Expanding an output that is already in the default encoding leaves it unchanged"""
+        floorplan = {"rooms": [{"id": "kitchen", "floor_polygon": [{"x": 1.5, "y": 2.25}, [150, 400]]}]}
+        expanded = expand_floorplan(floorplan)
+        assert expanded["rooms"][0]["floor_polygon"] == [{"x": 1.5, "y": 2.25}, {"x": 1.5, "y": 4.0}]
+        assert expand_floorplan("not a floorplan") == "not a floorplan"
@@ -0,0 +1,83 @@
+import random
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+from shapely.affinity import scale
+
+# rplan.py imports its siblings through the src root (dataset_convert.rplan_graph, utils.constants)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from rplan import RPLANConverter, _rectilinear_ring, ring_signed_area
+from test_fixtures import *
+
+FIXTURES = [
+    "sample_ds2d_data",
+    "complex_ds2d_data",
+    "generated_ds2d_data",
+    "double_connection_balcony_ds2d_data",
+    "containment_issue_ds2d_data",
+    "multiple_doors_ds2d_data",
+    "floating_interior_door_data",
+]
+
+
+def room_segments(space, converter, rng):
+    """HouseGAN-style wall segments of a DS2D room: pixel grid, shuffled, random direction, some walls split."""
+    points = [(round(p["x"] / converter.pixel_to_meter), round(p["y"] / converter.pixel_to_meter))
+              for p in space["floor_polygon"]]
+    segments = []
+    for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]):
+        if (x1, y1) == (x2, y2):
+            continue
+        pieces = [(x1, y1), (x2, y2)]
+        if rng.random() < 0.3 and (abs(x2 - x1) > 1 or abs(y2 - y1) > 1):
+            pieces.insert(1, ((x1 + x2) // 2, (y1 + y2) // 2))
+        for (ax, ay), (bx, by) in zip(pieces, pieces[1:]):
+            segments.append([ax, ay, bx, by] if rng.random() < 0.5 else [bx, by, ax, ay])
+    rng.shuffle(segments)
+    return segments
+
+
+class TestSegmentsToPolygon:
+    """Rectilinear ring assembly against shapely polygonize"""
+
+    @pytest.mark.parametrize("fixture_name", FIXTURES)
+    def test_ring_matches_polygonize(self, fixture_name, request):
+        """Fast-path rings have the same vertices, order and start as polygonize"""
+        converter = RPLANConverter()
+        rng = random.Random(0)
+        fast = 0
+        for space in request.getfixturevalue(fixture_name)["spaces"]:
+            segments = room_segments(space, converter, rng)
+            ring = _rectilinear_ring(segments)
+            if ring is None:
+                continue
+            fast += 1
+            expected = converter._segments_to_polygon(segments)
+            assert np.array_equal(ring, np.asarray(expected.exterior.coords[:-1]))
+
+            # Area and bounds in meters agree with shapely on the scaled polygon
+            expected = scale(expected, xfact=converter.pixel_to_meter, yfact=converter.pixel_to_meter, origin=(0, 0))
+            ring = converter._room_ring(segments)
+            assert abs(ring_signed_area(ring)) == expected.area
+            assert tuple(ring.min(axis=0)) + tuple(ring.max(axis=0)) == expected.bounds
+        assert fast > 0
+
+    def test_non_simple_segments_fall_back(self):
+        """Anything that is not one simple rectilinear ring is left to polygonize"""
+        converter = RPLANConverter()
+        square = [[0, 0, 4, 0], [4, 0, 4, 4], [4, 4, 0, 4], [0, 4, 0, 0]]
+        cases = [
+            square + [[10, 0, 14, 0], [14, 0, 14, 4], [14, 4, 10, 4], [10, 4, 10, 0]],  # two rooms
+            square + [[4, 4, 6, 4]],  # dangling wall
+            [[0, 0, 4, 0], [4, 0, 2, 0], [2, 0, 2, 4], [2, 4, 0, 4], [0, 4, 0, 0]],  # backtracking
+            [[0, 0, 4, 0], [4, 0, 4, 4], [4, 4, 2, 4], [2, 4, 2, -2], [2, -2, 0, -2], [0, -2, 0, 0]],  # crossing
+            [[0, 0, 4, 0], [4, 0, 0, 4], [0, 4, 0, 0]],  # diagonal
+        ]
+        for segments in cases:
+            assert _rectilinear_ring(segments) is None
+
+        with pytest.raises(ValueError, match="Multiple polygons"):
+            converter._room_ring(cases[0])
+        ring = converter._room_ring(cases[4]) / converter.pixel_to_meter
+        assert np.allclose(ring, converter._segments_to_polygon(cases[4]).exterior.coords[:-1])
@@ -1,6 +1,7 @@
 import pytest
-from rplan_graph import RPLANGraph
+from rplan_graph import RPLANGraph, expected_structure, expected_structure_cache_info
 import networkx as nx
+import numpy as np
 from test_fixtures import *
 
 class TestCompatibility:
@@ -361,6 +362,103 @@ class TestCompatibility:
         # Verify that the floating door penalty is additive
         assert score >= expected_penalty, f"Total score should be at least the floating door penalty"
 
+    def test_floating_interior_doors_stored_on_graph(self, floating_interior_door_data, complex_ds2d_data,
+                                                     expected_graph_without_floating_doors, monkeypatch):
+        """Test that from_ds2d stores the floating door count and scoring does not re-parse the floorplan"""
+        graph = RPLANGraph.from_ds2d(floating_interior_door_data)
+        assert graph.floating_interior_doors == graph._count_floating_interior_doors_from_ds2d(floating_interior_door_data)
+        assert graph.floating_interior_doors > 0
+        wide = RPLANGraph.from_ds2d(floating_interior_door_data, gap_threshold=1.0)
+        assert wide.floating_interior_doors == graph.floating_interior_doors
+        assert RPLANGraph.from_labeled_adjacency(expected_graph_without_floating_doors).floating_interior_doors == 0
+
+        other = RPLANGraph.from_ds2d(complex_ds2d_data)
+        expected_score = graph.compatibility_score(other)
+        monkeypatch.setattr(RPLANGraph, "_ds2d_polygons", staticmethod(lambda *args, **kwargs: pytest.fail("re-parsed")))
+        assert graph.compatibility_score(other) == expected_score
+        graph.compatibility_score_scaled(other)
+
+    def test_batch_compatibility_matches_pairwise(self, sample_ds2d_data, complex_ds2d_data, floating_interior_door_data,
+                                                  expected_graph_without_floating_doors):
+        """Test that batch_compatibility gives the same scores and floating door counts as scoring pair by pair"""
+        outputs = [sample_ds2d_data, complex_ds2d_data, floating_interior_door_data, {"spaces": "broken"}, sample_ds2d_data]
+        expected = RPLANGraph.from_ds2d(complex_ds2d_data).to_labeled_adjacency()
+        expecteds = [expected, expected, expected_graph_without_floating_doors, expected, {"bedroom": ["missing"]}]
+
+        for scaled in (False, True):
+            scores, floating = RPLANGraph.batch_compatibility(outputs, expecteds, scaled=scaled)
+            for i, (output, labeled) in enumerate(zip(outputs[:4], expecteds[:4])):
+                graph = RPLANGraph.from_ds2d(output)
+                other = RPLANGraph.from_labeled_adjacency(labeled)
+                pairwise = graph.compatibility_score_scaled(other) if scaled else graph.compatibility_score(other)
+                assert scores[i] == pairwise, f"Pair {i}: batch {scores[i]} != pairwise {pairwise}"
+                assert floating[i] == graph._count_floating_interior_doors_from_ds2d(output)
+
+            # A pair that cannot be scored is NaN instead of failing the batch
+            assert np.isnan(scores[4]) and floating[4] == -1
+
+        # A complex plan against its own adjacency has no edge mistakes
+        scores, _ = RPLANGraph.batch_compatibility([complex_ds2d_data], [expected])
+        assert scores[0] == RPLANGraph.from_ds2d(complex_ds2d_data)._count_floating_interior_doors_from_ds2d(complex_ds2d_data)
+
+    def test_expected_structure_cache(self, complex_ds2d_data):
+        """Test that equal expected adjacencies share one cached structure matching the graph's edge counts"""
+        labeled = RPLANGraph.from_ds2d(complex_ds2d_data).to_labeled_adjacency()
+        structure = expected_structure(labeled)
+        graph = RPLANGraph.from_labeled_adjacency(labeled)
+        assert np.array_equal(structure.edge_counts, RPLANGraph._edge_type_counts([graph])[0])
+        assert sum(structure.node_type_counts.values()) == len(labeled)
+        assert not structure.edge_counts.flags.writeable
+
+        before = expected_structure_cache_info()
+        reordered = {label: labeled[label] for label in reversed(list(labeled))}
+        assert expected_structure(reordered) is structure
+        # Renumbering rooms of the same type and reordering neighbors does not change the key
+        rename = {label: label for label in labeled}
+        numbered = sorted(label for label in labeled if "|" in label)
+        for old_label, new_label in zip(numbered, reversed(numbered)):
+            if old_label.split("|")[0] == new_label.split("|")[0]:
+                rename[old_label] = new_label
+        renamed = {rename[label]: [rename[nb] for nb in reversed(nbrs)] for label, nbrs in labeled.items()}
+        assert expected_structure(renamed) is structure
+        after = expected_structure_cache_info()
+        assert after["hits"] == before["hits"] + 2 and after["misses"] == before["misses"]
+        assert 0.0 < after["hit_rate"] <= 1.0
+
+        # Same room types per node and neighbor, but a different edge set: two 2-cycles vs one 4-cycle
+        pairs = {"bedroom|0": ["bedroom|1"], "bedroom|1": ["bedroom|0"], "bedroom|2": ["bedroom|3"], "bedroom|3": ["bedroom|2"]}
+        cycle = {"bedroom|0": ["bedroom|1"], "bedroom|1": ["bedroom|2"], "bedroom|2": ["bedroom|3"], "bedroom|3": ["bedroom|0"]}
+        for adjacency in (pairs, cycle):
+            graph = RPLANGraph.from_labeled_adjacency(adjacency)
+            assert np.array_equal(expected_structure(adjacency).edge_counts, RPLANGraph._edge_type_counts([graph])[0])
+        assert expected_structure(pairs) is not expected_structure(cycle)
+
+class TestTopologyHash:
+    """Weisfeiler-Lehman topology hashing"""
+
+    @pytest.mark.parametrize("fixture_name", ["sample_ds2d_data", "complex_ds2d_data", "generated_ds2d_data",
+                                              "multiple_doors_ds2d_data", "floating_interior_door_data"])
+    def test_matches_networkx_and_ignores_numbering(self, fixture_name, request):
+        """Test that the hash equals networkx's WL hash and survives renumbering the spaces"""
+        graph = RPLANGraph.from_ds2d(request.getfixturevalue(fixture_name))
+        topology = graph.topology_hash()
+        assert topology == nx.weisfeiler_lehman_graph_hash(graph.graph, node_attr="room_type")
+
+        labeled = graph.to_labeled_adjacency()
+        assert RPLANGraph.from_labeled_adjacency(labeled).topology_hash() == topology
+        reversed_labels = {label: list(reversed(labeled[label])) for label in reversed(list(labeled))}
+        assert RPLANGraph.from_labeled_adjacency(reversed_labels).topology_hash() == topology
+
+    def test_distinguishes_room_types_and_edges(self):
+        """Test that changing a room type or an adjacency changes the hash"""
+        base = {"living_room": ["kitchen", "bedroom"], "kitchen": ["living_room"], "bedroom": ["living_room"]}
+        retyped = {"living_room": ["kitchen", "bathroom"], "kitchen": ["living_room"], "bathroom": ["living_room"]}
+        rewired = {"living_room": ["kitchen"], "kitchen": ["living_room", "bedroom"], "bedroom": ["kitchen"]}
+        hashes = {RPLANGraph.from_labeled_adjacency(g).topology_hash() for g in (base, retyped, rewired)}
+        assert len(hashes) == 3
+        with pytest.raises(ValueError):
+            RPLANGraph.from_labeled_adjacency(base).topology_hash(iterations=0)
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"]) 
     
\ No newline at end of file
@@ -0,0 +1,49 @@
+import json
+import sys
+from pathlib import Path
+import pytest
+from datasets import Dataset
+
+# topology_index.py imports its siblings through the src root (dataset_convert.rplan_graph)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from rplan_graph import RPLANGraph
+from topology_index import TopologyIndex, graph_topology_hash
+
+CHAIN = {"living_room": ["kitchen"], "kitchen": ["living_room", "bedroom"], "bedroom": ["kitchen"]}
+STAR = {"living_room": ["kitchen", "bedroom"], "kitchen": ["living_room"], "bedroom": ["living_room"]}
+PAIR = {"living_room": ["bathroom"], "bathroom": ["living_room"]}
+
+
+def make_dataset(graphs, with_hash=True):
+    rows = {"input_graph": [json.dumps(g) for g in graphs]}
+    if with_hash:
+        rows["topology_hash"] = [RPLANGraph.from_labeled_adjacency(g).topology_hash() for g in graphs]
+    return Dataset.from_dict(rows)
+
+
+class TestTopologyIndex:
+    def test_groups_plans_by_topology(self):
+        graphs = [CHAIN, STAR, CHAIN, PAIR, STAR, CHAIN]
+        index = TopologyIndex.from_dataset(make_dataset(graphs))
+        assert len(index) == 6 and index.num_topologies == 3
+        assert index.same_topology(CHAIN) == [0, 2, 5]
+        assert index.same_topology(json.dumps(STAR)) == [1, 4]
+        assert index.lookup("missing") == []
+        assert [len(indices) for indices in index.groups().values()] == [3, 2, 1]
+        assert index.deduplicate() == [0, 1, 3]
+        assert index.deduplicate(max_per_topology=2) == [0, 1, 2, 3, 4]
+
+        # Datasets without the column are hashed from their input graphs
+        assert TopologyIndex.from_dataset(make_dataset(graphs, with_hash=False)).hashes == index.hashes
+        assert graph_topology_hash(RPLANGraph.from_labeled_adjacency(PAIR)) == index.hashes[3]
+
+    def test_stratified_sample_keeps_topology_shares(self):
+        index = TopologyIndex.from_dataset(make_dataset([CHAIN] * 60 + [STAR] * 30 + [PAIR] * 10))
+        sample = index.stratified_sample(10, seed=1)
+        assert sample == index.stratified_sample(10, seed=1)
+        assert len(sample) == len(set(sample)) == 10
+        counts = [sum(1 for idx in sample if index.hashes[idx] == index.hashes[first]) for first in (0, 60, 90)]
+        assert counts == [6, 3, 1]
+        assert index.stratified_sample(1000) == list(range(100))
+        with pytest.raises(ValueError):
+            index.deduplicate(max_per_topology=0)
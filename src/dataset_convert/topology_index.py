@@ -0,0 +1,107 @@
+import json
+import random
+from collections import defaultdict
+from typing import Any, Dict, List, Sequence, Union
+from datasets import Dataset
+from dataset_convert.rplan_graph import RPLANGraph
+
+
+def graph_topology_hash(graph: Union[RPLANGraph, Dict[str, List[str]], str]) -> str:
+    """Topology hash of an RPLANGraph, a labeled adjacency or its JSON string (the input_graph column)."""
+    if isinstance(graph, str):
+        graph = json.loads(graph)
+    if isinstance(graph, dict):
+        graph = RPLANGraph.from_labeled_adjacency(graph)
+    return graph.topology_hash()
+
+
+class TopologyIndex:
+    """
+    Rows of a converted RPLAN dataset grouped by topology hash (see `RPLANGraph.topology_hash`),
+    i.e. by room-type adjacency structure.
+
+    Looking up the plans that share a topology is a dict access, so same-topology ground truths,
+    deduplication and topology-stratified subsets need no pairwise graph comparison.
+    """
+
+    def __init__(self, hashes: Sequence[str]):
+        self.hashes = list(hashes)
+        self._groups: Dict[str, List[int]] = defaultdict(list)
+        for idx, topology in enumerate(self.hashes):
+            self._groups[topology].append(idx)
+
+    @classmethod
+    def from_dataset(cls, dataset: Dataset, column: str = "topology_hash") -> "TopologyIndex":
+        """Index a converted dataset; datasets converted before the topology_hash column existed are hashed from input_graph."""
+        if column in dataset.column_names:
+            return cls(dataset[column])
+        return cls([graph_topology_hash(graph) for graph in dataset["input_graph"]])
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    @property
+    def num_topologies(self) -> int:
+        return len(self._groups)
+
+    def lookup(self, topology_hash: str) -> List[int]:
+        """Row indices of the plans with the given topology hash (empty if there are none)."""
+        return list(self._groups.get(topology_hash, []))
+
+    def same_topology(self, graph: Union[RPLANGraph, Dict[str, List[str]], str]) -> List[int]:
+        """Row indices of the plans with the same topology as a graph, labeled adjacency or input_graph JSON."""
+        return self.lookup(graph_topology_hash(graph))
+
+    def groups(self) -> Dict[str, List[int]]:
+        """Row indices per topology, largest groups first."""
+        ordered = sorted(self._groups.items(), key=lambda item: (-len(item[1]), item[0]))
+        return {topology: list(indices) for topology, indices in ordered}
+
+    def deduplicate(self, max_per_topology: int = 1) -> List[int]:
+        """Sorted row indices keeping the first `max_per_topology` plans of every topology."""
+        if max_per_topology < 1:
+            raise ValueError(f"max_per_topology must be positive, got {max_per_topology}")
+        return sorted(idx for indices in self._groups.values() for idx in indices[:max_per_topology])
+
+    def stratified_sample(self, n: int, seed: int = 84) -> List[int]:
+        """
+        Sorted row indices of a random subset of size n in which every topology keeps its share of the
+        dataset (largest-remainder rounding). Deterministic for a fixed seed.
+        """
+        if n >= len(self.hashes):
+            return list(range(len(self.hashes)))
+        ordered = sorted(self._groups.items())
+        total = len(self.hashes)
+        quotas = [n * len(indices) / total for _, indices in ordered]
+        counts = [int(q) for q in quotas]
+        by_remainder = sorted(range(len(ordered)), key=lambda i: counts[i] - quotas[i])
+        for i in by_remainder[:n - sum(counts)]:
+            counts[i] += 1
+
+        rng = random.Random(seed)
+        sample = []
+        for (_, indices), count in zip(ordered, counts):
+            sample.extend(rng.sample(indices, count))
+        return sorted(sample)
+
+    def summary(self, top: int = 10) -> Dict[str, Any]:
+        """Plan and topology counts, plus the sizes of the `top` largest topology groups."""
+        sizes = sorted((len(indices) for indices in self._groups.values()), reverse=True)
+        return {
+            "plans": len(self.hashes),
+            "topologies": len(sizes),
+            "singletons": sum(1 for size in sizes if size == 1),
+            "largest_groups": sizes[:top],
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+    from datasets import load_from_disk
+
+    parser = argparse.ArgumentParser(description="Report how the plans of a converted RPLAN dataset group by topology")
+    parser.add_argument("--dataset", type=str, required=True, help="Path of a dataset saved by rplan.py (e.g. datasets/rplan_5)")
+    args = parser.parse_args()
+
+    for split, ds in load_from_disk(args.dataset).items():
+        print(split, TopologyIndex.from_dataset(ds).summary())
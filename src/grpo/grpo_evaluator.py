@@ -4,12 +4,49 @@ from src.dataset_convert.rplan_graph import RPLANGraph
 # from src.utils.json_check.verify import is_valid_json, is_valid_json_feedback
 from src.utils.json_check.verify import is_valid_json
 import json
+import math
 
 class GRPOEvaluator:
     @staticmethod
-    def evaluate(output_floor_plan, input_prompt, round_digits: int = 4):
+    def evaluate(output_floor_plan, input_prompt, round_digits: int = 4, compact: bool = False):
+        return GRPOEvaluator.evaluate_batch([output_floor_plan], [input_prompt], round_digits, compact)[0]
+
+    @staticmethod
+    def evaluate_batch(output_floor_plans, input_prompts, round_digits: int = 4, compact: bool = False):
+        """
+        evaluate() for a batch of completions. Compatibility of every completion that gets
+        that far is scored in one RPLANGraph.batch_compatibility call.
+        """
+        results = []
+        pending, outputs, expecteds = [], [], []
+        for output_floor_plan, input_prompt in zip(output_floor_plans, input_prompts):
+            evaluated = GRPOEvaluator._evaluate_geometry(output_floor_plan, input_prompt, round_digits, compact)
+            if evaluated is None:
+                results.append({"is_valid_json": False})
+                continue
+            stats, output_json, input_graph_json = evaluated
+            pending.append(len(results))
+            results.append(stats)
+            outputs.append(output_json)
+            expecteds.append(input_graph_json)
+
+        if pending:
+            scores, _ = RPLANGraph.batch_compatibility(outputs, expecteds, scaled=True)
+            for idx, compatibility_score in zip(pending, scores.tolist()):
+                if math.isnan(compatibility_score):
+                    results[idx] = {"is_valid_json": False}
+                else:
+                    results[idx]["compatibility"] = round(compatibility_score, round_digits)
+        return results
+
+    @staticmethod
+    def _evaluate_geometry(output_floor_plan, input_prompt, round_digits: int = 4, compact: bool = False):
+        """
+        Everything evaluate() reports except compatibility. Returns (stats, parsed output,
+        expected input graph), or None when the completion cannot be evaluated.
+        """
         try:
-            output_floor_plan = extract_output_json(output_floor_plan)
+            output_floor_plan = extract_output_json(output_floor_plan, compact)
             input_graph_json = json.loads(input_prompt.get("input_graph", "{}"))
             
             polygons_overlap = {}
@@ -63,10 +100,6 @@ class GRPOEvaluator:
             else:
                 total_area_ratio = 0
 
-            input_graph = RPLANGraph.from_labeled_adjacency(input_graph_json)
-            output_graph = RPLANGraph.from_ds2d(output_floor_plan)
-            compatibility_score = output_graph.compatibility_score_scaled(input_graph)
-
 #             print(f"""
 # {'='*60}
 # GRPO EVALUATION DEBUG
@@ -86,14 +119,14 @@ class GRPOEvaluator:
 # {'='*60}
 # """)
 
-            return {
+            stats = {
                 "is_valid_json": is_valid,
                 # "room_count": room_count_match,
                 "total_area": round(total_area_ratio, round_digits),
                 "is_overlap": is_overlap,
-                "compatibility": round(compatibility_score, round_digits)
             }
+            return stats, output_floor_plan, input_graph_json
         except Exception as e:
             # print(f"Error in evaluate: {e}")
             # print(traceback.format_exc())
-            return { "is_valid_json": False }
+            return None
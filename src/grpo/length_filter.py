@@ -0,0 +1,131 @@
+import argparse
+import hashlib
+import os
+from typing import Dict, Sequence, Tuple
+import numpy as np
+from datasets import Dataset, load_from_disk
+from src.utils.create_example import build_prompt, create_output
+from src.utils.disk_cache import tokenizer_fingerprint, write_atomic
+
+# Bump whenever the prompt/completion templates counted here change, so cached lengths are recomputed
+LENGTHS_VERSION = "1"
+
+DEFAULT_LENGTH_CACHE_DIR = "datasets/.length_cache"
+
+DEFAULT_MAX_PROMPT_LENGTH = 4096
+DEFAULT_MAX_COMPLETION_LENGTH = 4096
+
+# Histogram bin edges, as fractions of the token budget; the last column counts samples over budget
+HISTOGRAM_FRACTIONS = (0.125, 0.25, 0.5, 0.75, 1.0)
+
+
+def _cache_key(dataset: Dataset, tokenizer, compact: bool) -> str:
+    h = hashlib.sha256(f"{LENGTHS_VERSION}|{compact}|{dataset._fingerprint}".encode("utf-8"))
+    h.update(tokenizer_fingerprint(tokenizer).encode("utf-8"))
+    h.update(build_prompt({}, compact=compact).encode("utf-8"))
+    return h.hexdigest()
+
+
+def compute_lengths(dataset: Dataset, tokenizer, compact: bool = False, batch_size: int = 1000) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Token counts of every sample's chat prompt and of its reference completion (the target JSON
+    and the end-of-turn token), as the GRPO trainer and the policy would produce them.
+    """
+    def count_batch(batch):
+        samples = [dict(zip(batch.keys(), values)) for values in zip(*batch.values())]
+        prompts = tokenizer([build_prompt(sample, compact=compact) for sample in samples], add_special_tokens=False)["input_ids"]
+        completions = tokenizer([f"{create_output(sample, compact=compact)}<|eot_id|>" for sample in samples],
+                                add_special_tokens=False)["input_ids"]
+        return {"prompt_tokens": [len(ids) for ids in prompts], "completion_tokens": [len(ids) for ids in completions]}
+
+    counted = dataset.map(count_batch, batched=True, batch_size=batch_size, remove_columns=dataset.column_names,
+                          load_from_cache_file=False, desc="Counting tokens")
+    return (np.asarray(counted["prompt_tokens"], dtype=np.int64),
+            np.asarray(counted["completion_tokens"], dtype=np.int64))
+
+
+def load_lengths(dataset: Dataset, tokenizer, compact: bool = False,
+                 cache_dir: str = DEFAULT_LENGTH_CACHE_DIR) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    compute_lengths, cached on disk under a key of the tokenizer, the templates and the dataset content,
+    so later launches (and the other ranks) only read two arrays.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{_cache_key(dataset, tokenizer, compact)}.npz")
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            return cached["prompt_tokens"], cached["completion_tokens"]
+
+    prompt_tokens, completion_tokens = compute_lengths(dataset, tokenizer, compact=compact)
+    # np.savez appends .npz to paths without it, so the temporary file keeps the suffix
+    write_atomic(path, lambda tmp_path: np.savez(tmp_path, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+                 suffix=".npz")
+    return prompt_tokens, completion_tokens
+
+
+def within_budget(prompt_tokens: np.ndarray, completion_tokens: np.ndarray,
+                  max_prompt_length: int, max_completion_length: int) -> np.ndarray:
+    """Mask of the samples whose prompt and reference completion both fit their budgets."""
+    return (prompt_tokens <= max_prompt_length) & (completion_tokens <= max_completion_length)
+
+
+def filter_by_length(dataset: Dataset, prompt_tokens: np.ndarray, completion_tokens: np.ndarray,
+                     max_prompt_length: int, max_completion_length: int) -> Dataset:
+    """The samples of the dataset that fit the budgets, in their original order."""
+    keep = within_budget(prompt_tokens, completion_tokens, max_prompt_length, max_completion_length)
+    if keep.all():
+        return dataset
+    return dataset.select(np.flatnonzero(keep))
+
+
+def length_histogram(room_counts: Sequence[int], lengths: np.ndarray, budget: int) -> Dict[int, np.ndarray]:
+    """Per room count, the number of samples in each bin of HISTOGRAM_FRACTIONS * budget, plus those over budget."""
+    room_counts = np.asarray(room_counts)
+    edges = np.array([int(budget * fraction) for fraction in HISTOGRAM_FRACTIONS])
+    # right=True: a length equal to an edge falls in that edge's bin, so the budget itself fits
+    bins = np.digitize(lengths, edges, right=True)
+    return {
+        int(room_count): np.bincount(bins[room_counts == room_count], minlength=len(edges) + 1)
+        for room_count in np.unique(room_counts)
+    }
+
+
+def print_length_report(room_counts: Sequence[int], prompt_tokens: np.ndarray, completion_tokens: np.ndarray,
+                        max_prompt_length: int, max_completion_length: int) -> None:
+    """Markdown length histograms of the prompts and the reference completions, per room count."""
+    room_counts = np.asarray(room_counts)
+    for name, lengths, budget in (("Prompt", prompt_tokens, max_prompt_length),
+                                  ("Completion", completion_tokens, max_completion_length)):
+        edges = [int(budget * fraction) for fraction in HISTOGRAM_FRACTIONS]
+        columns = [f"≤ {edge}" for edge in edges] + [f"> {budget}"]
+        print(f"\n{name} tokens (budget {budget})\n")
+        print("| Rooms | Samples | Mean | P95 | Max | " + " | ".join(columns) + " |")
+        print("|" + "|".join(["------------"] * (5 + len(columns))) + "|")
+        for room_count, counts in length_histogram(room_counts, lengths, budget).items():
+            selected = lengths[room_counts == room_count]
+            cells = [str(room_count), str(len(selected)), f"{selected.mean():.0f}",
+                     f"{np.percentile(selected, 95):.0f}", str(selected.max())]
+            print("| " + " | ".join(cells + [str(count) for count in counts]) + " |")
+
+    keep = within_budget(prompt_tokens, completion_tokens, max_prompt_length, max_completion_length)
+    print(f"\n{int(keep.sum())} of {len(keep)} samples fit both budgets ({len(keep) - int(keep.sum())} over budget)")
+
+
+if __name__ == "__main__":
+    from transformers import AutoTokenizer
+
+    parser = argparse.ArgumentParser(description="Prompt and reference completion token lengths per room count")
+    parser.add_argument("--dataset", type=str, default="hf_datasets/rplan_converted_no_doors", help="Dataset saved by rplan.py")
+    parser.add_argument("--split", type=str, default="train")
+    parser.add_argument("--tokenizer", type=str, default="models/Llama-4-Scout-17B-16E-Instruct", help="Tokenizer name or path")
+    parser.add_argument("--compact", action="store_true", help="Use the compact floorplan encoding")
+    parser.add_argument("--max_prompt_length", type=int, default=DEFAULT_MAX_PROMPT_LENGTH)
+    parser.add_argument("--max_completion_length", type=int, default=DEFAULT_MAX_COMPLETION_LENGTH)
+    parser.add_argument("--cache_dir", type=str, default=DEFAULT_LENGTH_CACHE_DIR)
+    args = parser.parse_args()
+
+    dataset = load_from_disk(args.dataset)[args.split]
+    prompt_tokens, completion_tokens = load_lengths(dataset, AutoTokenizer.from_pretrained(args.tokenizer),
+                                                    compact=args.compact, cache_dir=args.cache_dir)
+    print_length_report(dataset["room_count"], prompt_tokens, completion_tokens,
+                        args.max_prompt_length, args.max_completion_length)
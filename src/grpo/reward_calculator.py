@@ -2,30 +2,30 @@ from src.grpo.grpo_evaluator import GRPOEvaluator
 from typing import Any, Callable, Dict, List
 
 class RewardCalculator:
-    def __init__(self, num_functions: int = 2, reward_round_digits: int = 4):
+    def __init__(self, num_functions: int = 2, reward_round_digits: int = 4, compact: bool = False):
         self._cache: Dict[str, Any] = {"stats": None, "key": None}
         self.num_functions = num_functions
         self.reward_round_digits = reward_round_digits
+        # Completions use the compact floorplan encoding (see src.utils.compact_format)
+        self.compact = compact
 
     def _compute_stats(self, completions: List[Any], **kwargs: Any) -> List[Dict[str, Any]]:
         key = id(completions[0] + completions[-1])
         if self._cache["key"] != key:
-            self._cache["stats"] = [
-                GRPOEvaluator.evaluate(
-                    comp,
-                    {
-                        "total_area": ta,
-                        "input_graph": ig,
-                        "spaces": spaces
-                    }
-                )
-                for comp, ta, ig, spaces in zip(
-                    completions,
+            prompts = [
+                {
+                    "total_area": ta,
+                    "input_graph": ig,
+                    "spaces": spaces
+                }
+                for ta, ig, spaces in zip(
                     kwargs.get("total_area", []),
                     kwargs.get("input_graph", {}),
                     kwargs.get("spaces", [])
                 )
             ]
+            # Compatibility of the whole batch of completions is scored at once
+            self._cache["stats"] = GRPOEvaluator.evaluate_batch(completions, prompts, compact=self.compact)
             self._cache["key"] = key
         return self._cache["stats"]
 
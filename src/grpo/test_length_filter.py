@@ -0,0 +1,117 @@
+import json
+import os
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+from datasets import Dataset
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.grpo.length_filter import (
+    compute_lengths,
+    filter_by_length,
+    length_histogram,
+    load_lengths,
+    within_budget,
+)
+from src.utils.create_example import build_prompt, create_output
+
+
+class CharTokenizer:
+    """One token per character, counting the texts it tokenizes"""
+
+    name_or_path = "char"
+
+    def __init__(self):
+        self.calls = 0
+
+    def __len__(self):
+        return 0x110000
+
+    def __call__(self, texts, add_special_tokens=True):
+        self.calls += 1
+        return {"input_ids": [[ord(c) for c in text] for text in texts]}
+
+
+def make_dataset(n=12):
+    rows = []
+    for i in range(n):
+        spaces = [{"id": f"room|{j}", "room_type": "bedroom", "area": 10.0 + j,
+                   "floor_polygon": [{"x": 0.0, "y": 0.0}, {"x": 1.0 + i, "y": 0.0}, {"x": 1.0, "y": 1.0}]}
+                  for j in range(1 + i % 3)]
+        prompt = {"input": {"room_count": len(spaces), "spaces": [{"id": s["id"], "room_type": s["room_type"]} for s in spaces]}}
+        rows.append({"room_count": len(spaces), "total_area": sum(s["area"] for s in spaces),
+                     "spaces": spaces, "prompt": json.dumps(prompt)})
+    return Dataset.from_list(rows)
+
+
+class TestBudget:
+    """A sample exactly at the budget fits it; one token over does not"""
+
+    def test_within_budget_edges(self):
+        prompt_tokens = np.array([100, 101, 100, 50])
+        completion_tokens = np.array([200, 200, 201, 10])
+        keep = within_budget(prompt_tokens, completion_tokens, 100, 200)
+        np.testing.assert_array_equal(keep, [True, False, False, True])
+
+    def test_filter_by_length(self):
+        dataset = make_dataset(6)
+        prompt_tokens = np.array([100, 101, 100, 50, 100, 99])
+        completion_tokens = np.array([200, 200, 201, 10, 200, 0])
+        filtered = filter_by_length(dataset, prompt_tokens, completion_tokens, 100, 200)
+        assert filtered["prompt"] == [dataset[i]["prompt"] for i in (0, 3, 4, 5)]
+        # Nothing over budget: the dataset itself
+        assert filter_by_length(dataset, prompt_tokens, completion_tokens, 101, 201) is dataset
+
+    def test_histogram_edges(self):
+        budget = 800
+        # Bin edges 100, 200, 400, 600, 800; a length equal to an edge falls in that edge's bin
+        lengths = np.array([1, 100, 101, 200, 400, 600, 601, 800, 801, 5000])
+        histogram = length_histogram([7] * len(lengths), lengths, budget)
+        np.testing.assert_array_equal(histogram[7], [2, 2, 1, 1, 2, 2])
+
+    def test_histogram_matches_budget_per_room_count(self):
+        room_counts = np.array([5, 5, 6, 6, 6, 8])
+        lengths = np.array([64, 65, 64, 10, 65, 0])
+        histogram = length_histogram(room_counts, lengths, 64)
+        assert sorted(histogram) == [5, 6, 8]
+        for room_count, counts in histogram.items():
+            selected = lengths[room_counts == room_count]
+            assert counts.sum() == len(selected)
+            # The over-budget column counts exactly the samples within_budget drops
+            assert counts[-1] == int((~within_budget(selected, np.zeros_like(selected), 64, 0)).sum())
+        np.testing.assert_array_equal(histogram[5], [0, 0, 0, 0, 1, 1])
+
+
+class TestLengths:
+    @pytest.mark.parametrize("compact", [False, True])
+    def test_compute_lengths(self, compact):
+        dataset = make_dataset()
+        prompt_tokens, completion_tokens = compute_lengths(dataset, CharTokenizer(), compact=compact, batch_size=5)
+        samples = list(dataset)
+        np.testing.assert_array_equal(prompt_tokens, [len(build_prompt(s, compact=compact)) for s in samples])
+        np.testing.assert_array_equal(completion_tokens, [len(create_output(s, compact=compact)) + len("<|eot_id|>") for s in samples])
+
+    def test_load_lengths_cache_round_trip(self, tmp_path):
+        dataset = make_dataset()
+        cache_dir = str(tmp_path / "length_cache")
+        tokenizer = CharTokenizer()
+        computed = load_lengths(dataset, tokenizer, cache_dir=cache_dir)
+        calls = tokenizer.calls
+        assert calls > 0
+        files = os.listdir(cache_dir)
+        assert len(files) == 1 and files[0].endswith(".npz")
+
+        # Read back from the cache without tokenizing
+        cached = load_lengths(dataset, tokenizer, cache_dir=cache_dir)
+        assert tokenizer.calls == calls
+        for cached_lengths, computed_lengths in zip(cached, computed):
+            assert cached_lengths.dtype == np.int64
+            np.testing.assert_array_equal(cached_lengths, computed_lengths)
+        np.testing.assert_array_equal(cached[0], compute_lengths(dataset, CharTokenizer())[0])
+
+        # Other content or another template is another entry
+        load_lengths(dataset.select(range(5)), tokenizer, cache_dir=cache_dir)
+        load_lengths(dataset, tokenizer, compact=True, cache_dir=cache_dir)
+        assert tokenizer.calls > calls
+        assert len(os.listdir(cache_dir)) == 3
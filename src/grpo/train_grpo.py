@@ -1,8 +1,13 @@
 import argparse
 from datasets import load_from_disk
 from src.grpo.reward_calculator import RewardCalculator
+from src.grpo.length_filter import (
+    DEFAULT_LENGTH_CACHE_DIR, DEFAULT_MAX_COMPLETION_LENGTH, DEFAULT_MAX_PROMPT_LENGTH,
+    filter_by_length, load_lengths, print_length_report,
+)
 from src.utils import build_prompt
 from trl import GRPOConfig
+from transformers import AutoTokenizer
 from dotenv import load_dotenv
 import wandb
 from src.grpo.custom_grpo_trainer import BestRewardCallback, CustomGRPOTrainer
@@ -19,23 +24,39 @@ def main():
     parser.add_argument("--eval_sample_size", type=int, default=200, help="Number of examples to use for evaluation")
     parser.add_argument("--no_eval", action="store_true", help="Disable evaluation during training")
     parser.add_argument("--early_stopping_patience", type=int, default=2, help="Early stopping patience")
+    parser.add_argument("--compact", action="store_true", help="Use the compact floorplan encoding for prompts and completions")
+    parser.add_argument("--max_prompt_length", type=int, default=DEFAULT_MAX_PROMPT_LENGTH, help="Prompt token budget")
+    parser.add_argument("--max_completion_length", type=int, default=DEFAULT_MAX_COMPLETION_LENGTH, help="Completion token budget")
+    parser.add_argument("--no_length_filter", action="store_true",
+                        help="Keep samples whose prompt or reference completion exceeds its token budget")
+    parser.add_argument("--length_cache_dir", type=str, default=DEFAULT_LENGTH_CACHE_DIR, help="Cache of the token lengths")
     
     args = parser.parse_args()
 
     dataset = load_from_disk(args.dataset)
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+
+    def fit_budgets(split):
+        # Over-long samples only produce truncated, zero-reward completions
+        prompt_tokens, completion_tokens = load_lengths(split, tokenizer, compact=args.compact, cache_dir=args.length_cache_dir)
+        print_length_report(split["room_count"], prompt_tokens, completion_tokens,
+                            args.max_prompt_length, args.max_completion_length)
+        if args.no_length_filter:
+            return split
+        return filter_by_length(split, prompt_tokens, completion_tokens, args.max_prompt_length, args.max_completion_length)
     
     train_dataset = (
-        dataset["train"]
-        .map(lambda x: {"prompt": build_prompt(x)})
+        fit_budgets(dataset["train"])
+        .map(lambda x: {"prompt": build_prompt(x, compact=args.compact)})
     )
     
     eval_dataset = None
     if "validation" in dataset:
+        validation = fit_budgets(dataset["validation"]).shuffle(seed=84)
         eval_dataset = (
-            dataset["validation"]
-            .shuffle(seed=84)
-            .select(range(args.eval_sample_size))
-            .map(lambda x: {"prompt": build_prompt(x)})
+            validation
+            .select(range(min(args.eval_sample_size, len(validation))))
+            .map(lambda x: {"prompt": build_prompt(x, compact=args.compact)})
         )
     
     do_eval = not args.no_eval
@@ -43,8 +64,8 @@ def main():
         output_dir=args.output,
         per_device_train_batch_size=1,
         num_generations=4,
-        max_prompt_length=4096,
-        max_completion_length=4096,
+        max_prompt_length=args.max_prompt_length,
+        max_completion_length=args.max_completion_length,
         bf16=True,
         gradient_checkpointing=True,
 
@@ -71,7 +92,7 @@ def main():
         save_only_model=True
     )
 
-    reward_calculator = RewardCalculator()
+    reward_calculator = RewardCalculator(compact=args.compact)
     reward_funcs = reward_calculator.make_reward_funcs()
 
     # trainer = GRPOTrainer(
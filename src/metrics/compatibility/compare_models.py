@@ -6,9 +6,12 @@ only on the intersection of valid JSON instances across all models.
 import os
 import sys
 import json
+import numpy as np
 from eval_overall import Evaluate
+from src.metrics.bootstrap import paired_bootstrap
+from src.metrics.metric_cache import DEFAULT_CACHE_PATH, MetricCache
 
-def get_intersection_of_valid_indices(result_folders, room_counts):
+def get_intersection_of_valid_indices(result_folders, room_counts, cache=None):
     """
     Get the intersection of valid JSON indices across all result folders.
     Returns a dict mapping room_count -> list of valid indices common to all folders.
@@ -21,7 +24,7 @@ def get_intersection_of_valid_indices(result_folders, room_counts):
         print(f"Warning: {first_folder} not found")
         return {rc: [] for rc in room_counts}
         
-    ev = Evaluate(folder_path=first_folder, room_counts=room_counts)
+    ev = Evaluate(folder_path=first_folder, room_counts=room_counts, cache=cache)
     for rc in room_counts:
         all_valid_indices[rc] = set(ev.get_valid_indices_for(rc))
     
@@ -31,7 +34,7 @@ def get_intersection_of_valid_indices(result_folders, room_counts):
             print(f"Warning: {folder} not found, skipping")
             continue
             
-        ev = Evaluate(folder_path=folder, room_counts=room_counts)
+        ev = Evaluate(folder_path=folder, room_counts=room_counts, cache=cache)
         for rc in room_counts:
             folder_valid_indices = set(ev.get_valid_indices_for(rc))
             all_valid_indices[rc] = all_valid_indices[rc].intersection(folder_valid_indices)
@@ -39,7 +42,30 @@ def get_intersection_of_valid_indices(result_folders, room_counts):
     # Convert back to sorted lists
     return {rc: sorted(list(indices)) for rc, indices in all_valid_indices.items()}
 
-def save_compatibility_json(all_stats_union, all_stats_intersection, result_folders, model_names, room_counts):
+def bootstrap_intersection(evaluators, model_names, common_valid_indices, room_counts, n_resamples=2000, confidence=0.95):
+    """
+    Paired bootstrap of raw compatibility on the common valid instances of every room count.
+    Differences are taken against the first model. Returns a dict room_count -> {model_name: stats} (None if no instances).
+    """
+    names = [name for name in model_names if name in evaluators]
+    results = {}
+    for rc in room_counts:
+        indices = common_valid_indices.get(rc, [])
+        per_model = [evaluators[name].get_scores(indices) for name in names]
+        keep = [j for j in range(len(indices)) if all(scores[j] is not None for scores in per_model)]
+        if not names or not keep:
+            results[rc] = None
+            continue
+
+        samples = np.array([[scores[j] for j in keep] for scores in per_model], dtype=float)
+        bs = paired_bootstrap(samples, n_resamples=n_resamples, confidence=confidence)
+        results[rc] = {}
+        for m, name in enumerate(names):
+            results[rc][name] = {key: float(values[m]) for key, values in bs.items()}
+            results[rc][name]["n"] = len(keep)
+    return results
+
+def save_compatibility_json(all_stats_union, all_stats_intersection, result_folders, model_names, room_counts, bootstrap_stats=None):
     """
     Save compatibility results to JSON file in final_results directory.
     """
@@ -88,6 +114,12 @@ def save_compatibility_json(all_stats_union, all_stats_intersection, result_fold
                     }
                 else:
                     json_data["intersection_stats"][model_name][str(rc)] = None
+
+    # Add paired bootstrap confidence intervals on the intersection
+    if bootstrap_stats is not None:
+        json_data["bootstrap_intersection"] = {
+            str(rc): bootstrap_stats.get(rc) for rc in room_counts
+        }
     
     # Save to file
     output_file = f"{output_dir}/compatibility.json"
@@ -96,7 +128,7 @@ def save_compatibility_json(all_stats_union, all_stats_intersection, result_fold
     
     print(f"\nCompatibility results saved to: {output_file}")
 
-def compare_models(result_folders, model_names=None, room_counts=None):
+def compare_models(result_folders, model_names=None, room_counts=None, cache_path=DEFAULT_CACHE_PATH, n_resamples=2000):
     """
     Compare multiple models fairly by computing scores on intersection of valid instances.
     
@@ -104,30 +136,36 @@ def compare_models(result_folders, model_names=None, room_counts=None):
         result_folders: List of paths to result folders
         model_names: List of model names (defaults to folder names)
         room_counts: List of room counts to evaluate (defaults to [5,6,7,8])
+        cache_path: Per-sample metric cache shared by all evaluations (None disables caching)
+        n_resamples: Bootstrap resamples for the intersection confidence intervals (0 disables them)
     """
     if room_counts is None:
         room_counts = [5, 6, 7, 8]
         
     if model_names is None:
         model_names = [folder for folder in result_folders]
+
+    cache = MetricCache(cache_path) if cache_path else None
     
-    common_valid_indices = get_intersection_of_valid_indices(result_folders, room_counts)
+    common_valid_indices = get_intersection_of_valid_indices(result_folders, room_counts, cache=cache)
     
-    # Collect stats using all valid instances for each model
-    all_stats_union = {}
+    # One evaluator per model; each loads its per-sample records once
+    evaluators = {}
     for folder, model_name in zip(result_folders, model_names):
         if os.path.exists(folder):
-            ev = Evaluate(folder_path=folder, room_counts=room_counts)
-            stats, _ = ev.evaluate(valid_indices=None)
-            all_stats_union[model_name] = stats
+            evaluators[model_name] = Evaluate(folder_path=folder, room_counts=room_counts, cache=cache)
+
+    # Collect stats using all valid instances for each model
+    all_stats_union = {}
+    for model_name, ev in evaluators.items():
+        stats, _ = ev.evaluate(valid_indices=None)
+        all_stats_union[model_name] = stats
     
     # Collect stats using intersection of valid instances
     all_stats_intersection = {}
-    for folder, model_name in zip(result_folders, model_names):
-        if os.path.exists(folder):
-            ev = Evaluate(folder_path=folder, room_counts=room_counts)
-            stats, _ = ev.evaluate(valid_indices=common_valid_indices)
-            all_stats_intersection[model_name] = stats
+    for model_name, ev in evaluators.items():
+        stats, _ = ev.evaluate(valid_indices=common_valid_indices)
+        all_stats_intersection[model_name] = stats
     
     # Print summary
     print(f"Intersection uses {len(common_valid_indices.get(8, []))} common instances")
@@ -184,8 +222,38 @@ def compare_models(result_folders, model_names=None, room_counts=None):
         row = "| " + " | ".join(row_cells) + " |"
         print(row)
 
+    # Print paired bootstrap confidence intervals on the intersection
+    bootstrap_stats = None
+    if n_resamples > 0:
+        bootstrap_stats = bootstrap_intersection(evaluators, model_names, common_valid_indices, room_counts, n_resamples=n_resamples)
+        reference = next((name for name in model_names if name in evaluators), None)
+
+        print(f"\n{'='*60}")
+        print(f"BOOTSTRAP: 95% CI on intersection, paired difference vs {reference}")
+        print(f"{'='*60}")
+
+        bs_header_cells = ["Model"]
+        for rc in room_counts:
+            bs_header_cells.extend([f"{rc} spaces", f"{rc} diff"])
+        print("| " + " | ".join(bs_header_cells) + " |")
+        print("|" + "|".join(["------------"] * len(bs_header_cells)) + "|")
+
+        for model_name in model_names:
+            if model_name not in evaluators:
+                continue
+            row_cells = [model_name]
+            for rc in room_counts:
+                bs = bootstrap_stats.get(rc)
+                if bs is None:
+                    row_cells.extend(["–", "–"])
+                    continue
+                m = bs[model_name]
+                row_cells.append(f"{m['mean']:.2f} [{m['ci_low']:.2f}, {m['ci_high']:.2f}]")
+                row_cells.append(f"{m['diff']:+.2f} [{m['diff_ci_low']:+.2f}, {m['diff_ci_high']:+.2f}]")
+            print("| " + " | ".join(row_cells) + " |")
+
     # Save results to JSON
-    save_compatibility_json(all_stats_union, all_stats_intersection, result_folders, model_names, room_counts)
+    save_compatibility_json(all_stats_union, all_stats_intersection, result_folders, model_names, room_counts, bootstrap_stats)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -1,17 +1,157 @@
 import os
 import json
+import math
 import statistics
+import pyarrow.dataset as pads
 from src.dataset_convert.rplan_graph import RPLANGraph
 from src.utils.json_check.verify import is_valid_json
+from src.metrics.results_store import ResultsStore, sample_folders
+
+CACHE_KIND = "compatibility"
+
+
+def compatibility_record(subfolder):
+    """
+    Compute the per-sample compatibility record for one results subfolder:
+    whether prompt.json could be read, whether 0.json is valid, the generated
+    room count and the raw compatibility score against the prompt's input graph.
+    """
+    return compatibility_records([subfolder])[0]
+
+
+def compatibility_records(subfolders):
+    """
+    compatibility_record for many results subfolders. Files are read per sample, and every
+    valid output is scored against its prompt's input graph in one RPLANGraph.batch_compatibility call.
+    """
+    records = []
+    pending, outputs, expecteds = [], [], []
+    for subfolder in subfolders:
+        record = {"prompt_ok": False, "valid": False, "room_count": None, "score": None}
+        records.append(record)
+        try:
+            with open(os.path.join(subfolder, 'prompt.json')) as pf:
+                prompt = json.load(pf)
+        except Exception:
+            continue
+        record["prompt_ok"] = True
+
+        try:
+            with open(os.path.join(subfolder, '0.json')) as of:
+                output = json.load(of)
+            if not is_valid_json(output):
+                continue
+            record["valid"] = True
+
+            spaces = output.get('spaces', [])
+            door_types = {'interior_door'}
+            record["room_count"] = len([room for room in spaces if room.get('room_type', '').lower() not in door_types]) - 1
+
+            expected = prompt["input_graph"]
+        except Exception as e:
+            # print(f"Error in folder {subfolder}: {e}")
+            continue
+        pending.append(record)
+        outputs.append(output)
+        expecteds.append(expected)
+
+    if pending:
+        scores, _ = RPLANGraph.batch_compatibility(outputs, expecteds)
+        for record, score in zip(pending, scores.tolist()):
+            if not math.isnan(score):
+                record["score"] = int(score)
+    return records
+
 
 class Evaluate:
     """
     Compute and print a Markdown table of raw compatibility scores
     for specified room counts.
     """
-    def __init__(self, folder_path='results/', room_counts=None):
+    def __init__(self, folder_path='results/', room_counts=None, cache=None):
         self.folder_path = folder_path
         self.room_counts = room_counts or [5, 6, 7, 8]
+        self.cache = cache
+        self._records = None
+        self._store = None
+        self._store_checked = False
+
+    def _current_store(self):
+        """The folder's results table when it is up to date with the sample folders (checked once), else None."""
+        if not self._store_checked:
+            store = ResultsStore(self.folder_path)
+            self._store = store if store.is_current() else None
+            self._store_checked = True
+        return self._store
+
+    def _sample_records(self):
+        """
+        Per-sample records keyed by folder index, computed once per instance by crawling the folder;
+        with a MetricCache only samples whose 0.json/prompt.json changed are recomputed.
+        """
+        if self._records is not None:
+            return self._records
+
+        folders = sample_folders(self.folder_path)
+
+        records = {}
+        if self.cache is None:
+            computed = compatibility_records([subfolder for _, subfolder in folders])
+            records = {folder_idx: record for (folder_idx, _), record in zip(folders, computed)}
+        else:
+            keys = [self.cache.sample_key(subfolder) for _, subfolder in folders]
+            cached = self.cache.get_many(keys, CACHE_KIND)
+            # Only score samples missing from the cache, each distinct key once
+            missing = {}
+            for (_, subfolder), key in zip(folders, keys):
+                if key not in cached and key not in missing:
+                    missing[key] = subfolder
+            computed = dict(zip(missing, compatibility_records(list(missing.values()))))
+            for (folder_idx, _), key in zip(folders, keys):
+                records[folder_idx] = cached[key] if key in cached else computed[key]
+            self.cache.put_many(computed, CACHE_KIND)
+
+        self._records = records
+        return records
+
+    def _records_for(self, rc=None, valid_indices=None, scored=False):
+        """
+        Records of the samples with a readable prompt, keyed by folder index: only those in valid_indices
+        when given, only valid outputs with rc rooms when rc is given, and only scored ones when scored.
+        When an up-to-date results table exists, these predicates are pushed down into the Parquet scan.
+        """
+        store = self._current_store()
+        if store is not None:
+            expr = pads.field("prompt_ok") == True
+            if valid_indices is not None:
+                expr &= pads.field("index").isin(sorted(valid_indices))
+            if rc is not None:
+                expr &= (pads.field("json_valid") == True) & (pads.field("output_room_count") == rc)
+            if scored:
+                expr &= pads.field("compatibility").is_valid()
+            rows = store.rows(columns=["index", "prompt_ok", "json_valid", "output_room_count", "compatibility"], filter=expr)
+            return {
+                row["index"]: {
+                    "prompt_ok": row["prompt_ok"],
+                    "valid": row["json_valid"],
+                    "room_count": row["output_room_count"],
+                    "score": row["compatibility"],
+                }
+                for row in rows
+            }
+
+        records = {}
+        for folder_idx, record in self._sample_records().items():
+            if valid_indices is not None and folder_idx not in valid_indices:
+                continue
+            if not record["prompt_ok"]:
+                continue
+            if rc is not None and (not record["valid"] or record["room_count"] != rc):
+                continue
+            if scored and record["score"] is None:
+                continue
+            records[folder_idx] = record
+        return records
 
     def get_valid_indices_for(self, rc, valid_indices=None):
         """
@@ -19,54 +159,15 @@ class Evaluate:
         If valid_indices is provided, only consider those indices.
         Returns a list of folder indices (as integers) that have valid JSON.
         """
-        valid_folder_indices = []
-        
-        for folder_name in sorted(os.listdir(self.folder_path),
-                                  key=lambda x: int(x) if x.isdigit() else x):
-            if not folder_name.isdigit():
-                continue
-                
-            folder_idx = int(folder_name)
-            
-            # If valid_indices is provided, only consider those indices
-            if valid_indices is not None and folder_idx not in valid_indices:
-                continue
-                
-            subfolder = os.path.join(self.folder_path, folder_name)
-            if not os.path.isdir(subfolder):
-                continue
-                
-            try:
-                with open(os.path.join(subfolder, 'prompt.json')) as pf:
-                    prompt = json.load(pf)
-
-                # Check if this prompt was trying to generate rc spaces
-                # expected_room_count = prompt.get("room_count")
-                # if expected_room_count != rc:
-                #     continue
-
-                with open(os.path.join(subfolder, '0.json')) as of:
-                    output = json.load(of)
-                
-                if not is_valid_json(output):
-                    continue
-
-                # input_graph = RPLANGraph.from_ds2d(output)
-                
-                spaces = output.get('spaces', [])
-                door_types = {'interior_door'}
-                actual_room_count = len([room for room in spaces if room.get('room_type', '').lower() not in door_types]) - 1
-                if actual_room_count != rc:
-                    continue
-                
-                # If we reach here, this instance is valid
-                valid_folder_indices.append(folder_idx)
-                
-            except Exception as e:
-                # print(f"Error in folder {folder_name} (rc={rc}): {e}")
-                continue
+        return list(self._records_for(rc, valid_indices))
 
-        return valid_folder_indices
+    def get_scores(self, indices):
+        """
+        Raw compatibility score of each given folder index, in the same order.
+        None when the index is missing or its score could not be computed.
+        """
+        records = self._records_for(valid_indices=indices)
+        return [records[idx]["score"] if idx in records else None for idx in indices]
 
     def _compute_raw_for(self, rc, valid_indices=None):
         """
@@ -74,61 +175,13 @@ class Evaluate:
         If valid_indices is provided, only consider those indices.
         Returns (mean, stdev, error_rate, valid_indices_used) or (None, None, None, []) if no cases found.
         """
-        scores = []
-        target_attempts = 0  # Attempts that were trying to generate rc spaces
-        successful_attempts = 0  # Attempts that actually generated rc spaces
-        valid_indices_used = []
-        
-        for folder_name in sorted(os.listdir(self.folder_path),
-                                  key=lambda x: int(x) if x.isdigit() else x):
-            if not folder_name.isdigit():
-                continue
-                
-            folder_idx = int(folder_name)
-            
-            # If valid_indices is provided, only consider those indices
-            if valid_indices is not None and folder_idx not in valid_indices:
-                continue
-                
-            subfolder = os.path.join(self.folder_path, folder_name)
-            if not os.path.isdir(subfolder):
-                continue
-            try:
-                with open(os.path.join(subfolder, 'prompt.json')) as pf:
-                    prompt = json.load(pf)
-
-                # Check if this prompt was trying to generate rc spaces
-                # expected_room_count = prompt.get("room_count")
-                # if expected_room_count != rc:
-                #     continue
-                
-                target_attempts += 1
-
-                with open(os.path.join(subfolder, '0.json')) as of:
-                    output = json.load(of)
-                
-                if not is_valid_json(output):
-                    continue
-
-                input_graph = RPLANGraph.from_ds2d(output)
-                
-                spaces = output.get('spaces', [])
-                door_types = {'interior_door'}
-                actual_room_count = len([room for room in spaces if room.get('room_type', '').lower() not in door_types]) - 1
-                if actual_room_count != rc:
-                    continue
-                
-                successful_attempts += 1
-                valid_indices_used.append(folder_idx)
-                expected_graph = RPLANGraph.from_labeled_adjacency(
-                    prompt["input_graph"]
-                )
-                scores.append(
-                    input_graph.compatibility_score(expected_graph)
-                )
-            except Exception as e:
-                # print(f"Error in folder {folder_name} (rc={rc}): {e}")
-                continue
+        # Attempts that were trying to generate rc spaces
+        target_attempts = len(self._records_for(valid_indices=valid_indices))
+        # Attempts that actually generated rc spaces, and whose output graph could be scored
+        successful = self._records_for(rc, valid_indices, scored=True)
+        successful_attempts = len(successful)
+        valid_indices_used = list(successful)
+        scores = [record["score"] for record in successful.values()]
 
         if target_attempts == 0:
             return None, None, None, valid_indices_used
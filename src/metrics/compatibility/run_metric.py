@@ -1,14 +1,24 @@
-import sys
 import os
 import json
-
-eval_path = sys.argv[1]
+import argparse
 
 from src.metrics.compatibility.eval_overall import Evaluate
+from src.metrics.metric_cache import DEFAULT_CACHE_PATH, MetricCache
+from src.dataset_convert.rplan_graph import expected_structure_cache_info
+
+parser = argparse.ArgumentParser(description="Compatibility metric aggregator")
+parser.add_argument("results_folder", type=str, help="Path to results folder (e.g., results/5_6_7_8)")
+parser.add_argument("--cache_path", type=str, default=DEFAULT_CACHE_PATH, help=f"Per-sample metric cache (default: {DEFAULT_CACHE_PATH})")
+parser.add_argument("--no_cache", action="store_true", help="Recompute every sample without reading or writing the cache")
+args = parser.parse_args()
 
-overall_evaluation = Evaluate(eval_path)
+eval_path = args.results_folder
+cache = None if args.no_cache else MetricCache(args.cache_path)
+overall_evaluation = Evaluate(eval_path, cache=cache)
 
 stats, all_valid_indices = overall_evaluation.evaluate()
+cache_info = expected_structure_cache_info()
+print(f"Expected-graph cache: {cache_info['hits']} hits, {cache_info['misses']} misses ({cache_info['hit_rate']:.1%})")
 
 result_folder = eval_path.split('/')[1]
 
@@ -0,0 +1,236 @@
+import os
+import hashlib
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+
+# Bump whenever rendering or feature extraction changes, so cached ground-truth statistics are recomputed
+FEATURES_VERSION = "2"
+
+DEFAULT_STATS_CACHE_DIR = "final_results/.fid_cache"
+
+
+class InceptionFeatureExtractor:
+    """
+    pytorch_fid's InceptionV3 applied to in-memory RGB images.
+
+    Images are (H, W, 3) uint8 arrays; they are scaled to [0, 1] exactly like the
+    ToTensor transform pytorch_fid uses when it reads PNGs, so features match the
+    file-based `calculate_fid_given_paths`.
+    """
+
+    def __init__(self, device: Optional[str] = None, dims: int = 2048):
+        # torch and pytorch_fid are only needed for extraction; the statistics below are plain numpy
+        import torch
+        from pytorch_fid.inception import InceptionV3
+
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.dims = dims
+        block_idx = InceptionV3.BLOCK_INDEX_BY_DIM[dims]
+        self.model = InceptionV3([block_idx]).to(self.device)
+        self.model.eval()
+
+    def __call__(self, images: List[np.ndarray]) -> np.ndarray:
+        import torch
+        from torch.nn.functional import adaptive_avg_pool2d
+
+        with torch.no_grad():
+            batch = torch.from_numpy(np.stack(images)).to(self.device)
+            batch = batch.permute(0, 3, 1, 2).float().div_(255.0)
+            pred = self.model(batch)[0]
+            if pred.size(2) != 1 or pred.size(3) != 1:
+                pred = adaptive_avg_pool2d(pred, output_size=(1, 1))
+        return pred.squeeze(3).squeeze(2).cpu().numpy()
+
+
+class FeatureAccumulator:
+    """
+    Streaming FID/KID statistics over an arbitrarily large feature set.
+
+    Keeps the running sum and sum of outer products of the features (for mean/covariance)
+    plus a uniform reservoir sample of up to `reservoir_size` features (for KID), so memory
+    is O(dims^2) regardless of the number of images. Accumulators built on different shards
+    can be merged, and their state saved to / loaded from npz.
+    """
+
+    def __init__(self, dims: int = 2048, reservoir_size: int = 2000, seed: Optional[int] = 0):
+        self.dims = dims
+        self.reservoir_size = reservoir_size
+        self.count = 0
+        self.sum = np.zeros(dims, dtype=np.float64)
+        self.outer = np.zeros((dims, dims), dtype=np.float64)
+        self.reservoir = np.empty((0, dims), dtype=np.float32)
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, features: np.ndarray) -> None:
+        features = np.asarray(features, dtype=np.float64).reshape(-1, self.dims)
+        if not len(features):
+            return
+        self.sum += features.sum(axis=0)
+        self.outer += features.T @ features
+        self._update_reservoir(features.astype(np.float32))
+        self.count += len(features)
+
+    def _update_reservoir(self, features: np.ndarray) -> None:
+        # Algorithm R, vectorized over the batch: the i-th feature overall replaces a random
+        # slot with probability reservoir_size / (i + 1)
+        free = max(0, self.reservoir_size - len(self.reservoir))
+        if free:
+            self.reservoir = np.concatenate([self.reservoir, features[:free]])
+        rest = features[free:]
+        if not len(rest):
+            return
+        positions = self.count + free + np.arange(len(rest))
+        slots = (self._rng.random(len(rest)) * (positions + 1)).astype(np.int64)
+        keep = slots < self.reservoir_size
+        # Later features win when two replace the same slot, as in the sequential algorithm
+        self.reservoir[slots[keep]] = rest[keep]
+
+    def merge(self, other: "FeatureAccumulator") -> "FeatureAccumulator":
+        """Fold another accumulator (e.g. from another shard) into this one."""
+        if other.dims != self.dims:
+            raise ValueError(f"Cannot merge accumulators with {other.dims} and {self.dims} dims")
+        total = self.count + other.count
+        if other.count:
+            # The union's reservoir takes a hypergeometric share of each side's uniform sample
+            size = min(self.reservoir_size, len(self.reservoir) + len(other.reservoir))
+            from_self = self._rng.hypergeometric(self.count, other.count, min(size, total)) if self.count else 0
+            from_self = min(from_self, len(self.reservoir))
+            from_other = min(size - from_self, len(other.reservoir))
+            self.reservoir = np.concatenate([
+                self.reservoir[self._rng.choice(len(self.reservoir), from_self, replace=False)],
+                other.reservoir[self._rng.choice(len(other.reservoir), from_other, replace=False)],
+            ])
+        self.sum += other.sum
+        self.outer += other.outer
+        self.count = total
+        return self
+
+    def statistics(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Mean and (unbiased) covariance, matching np.mean / np.cov(rowvar=False)."""
+        if self.count < 2:
+            raise ValueError("At least two features are needed for a covariance")
+        mu = self.sum / self.count
+        sigma = (self.outer - self.count * np.outer(mu, mu)) / (self.count - 1)
+        return mu, sigma
+
+    def save(self, path: str) -> None:
+        np.savez(path, dims=self.dims, reservoir_size=self.reservoir_size, count=self.count,
+                 sum=self.sum, outer=self.outer, reservoir=self.reservoir)
+
+    @classmethod
+    def load(cls, path: str) -> "FeatureAccumulator":
+        with np.load(path) as data:
+            acc = cls(int(data["dims"]), int(data["reservoir_size"]))
+            acc.count = int(data["count"])
+            acc.sum = data["sum"]
+            acc.outer = data["outer"]
+            acc.reservoir = data["reservoir"]
+        return acc
+
+
+class ActivationCollector:
+    """
+    Buffers rendered images and runs them through the extractor `batch_size` at a time,
+    streaming the activations into a FeatureAccumulator, so only one batch of images and
+    no activation list is held in memory regardless of the number of samples.
+    """
+
+    def __init__(self, extractor: InceptionFeatureExtractor, batch_size: int = 64, reservoir_size: int = 2000):
+        self.extractor = extractor
+        self.batch_size = max(1, int(batch_size))
+        self.accumulator = FeatureAccumulator(extractor.dims, reservoir_size)
+        self._pending: List[np.ndarray] = []
+
+    @property
+    def count(self) -> int:
+        return self.accumulator.count + len(self._pending)
+
+    def add(self, image: np.ndarray) -> None:
+        self._pending.append(image)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> FeatureAccumulator:
+        if self._pending:
+            self.accumulator.update(self.extractor(self._pending))
+            self._pending = []
+        return self.accumulator
+
+
+def fid_from_accumulators(generated: FeatureAccumulator, ground_truth: FeatureAccumulator) -> Optional[float]:
+    """FID between two accumulators, or None when either side has fewer than two features."""
+    from pytorch_fid.fid_score import calculate_frechet_distance
+
+    if generated.count < 2 or ground_truth.count < 2:
+        return None
+    mu1, sigma1 = generated.statistics()
+    mu2, sigma2 = ground_truth.statistics()
+    return float(calculate_frechet_distance(mu1, sigma1, mu2, sigma2))
+
+
+def kid_from_accumulators(generated: FeatureAccumulator, ground_truth: FeatureAccumulator,
+                          num_subsets: int = 100, subset_size: int = 1000,
+                          seed: Optional[int] = 0) -> Optional[Tuple[float, float]]:
+    """
+    Kernel Inception Distance (unbiased MMD^2 with the cubic polynomial kernel) on the reservoirs,
+    averaged over random subsets. Returns (mean, std) or None when either side has fewer than two features.
+    """
+    real, fake = ground_truth.reservoir.astype(np.float64), generated.reservoir.astype(np.float64)
+    m = min(subset_size, len(real), len(fake))
+    if m < 2:
+        return None
+
+    rng = np.random.default_rng(seed)
+    dims = real.shape[1]
+    mmds = np.empty(num_subsets)
+    for i in range(num_subsets):
+        x = fake[rng.choice(len(fake), m, replace=False)]
+        y = real[rng.choice(len(real), m, replace=False)]
+        k_xx = (x @ x.T / dims + 1) ** 3
+        k_yy = (y @ y.T / dims + 1) ** 3
+        k_xy = (x @ y.T / dims + 1) ** 3
+        within = (k_xx.sum() - np.trace(k_xx) + k_yy.sum() - np.trace(k_yy)) / (m * (m - 1))
+        mmds[i] = within - 2 * k_xy.mean()
+    return float(mmds.mean()), float(mmds.std())
+
+
+class StatisticsCache:
+    """
+    On-disk cache of ground-truth Inception statistics (FeatureAccumulator state).
+
+    The ground truth of a results folder is the test split, which is the same for every model
+    being compared, so its statistics are keyed by a fingerprint of the ground-truth samples'
+    content together with the renderer, resolution, feature dims and FEATURES_VERSION.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_STATS_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def fingerprint(ground_truth_texts: Iterable[Optional[str]], renderer: str, resolution: int, dims: int) -> str:
+        """Order-independent hash of the ground-truth sample texts plus the rendering settings."""
+        sample_hashes = sorted(
+            hashlib.sha256(text.encode("utf-8")).hexdigest() for text in ground_truth_texts if text is not None
+        )
+        h = hashlib.sha256(f"{FEATURES_VERSION}|{renderer}|{resolution}|{dims}".encode("utf-8"))
+        for sample_hash in sample_hashes:
+            h.update(sample_hash.encode("ascii"))
+        return h.hexdigest()
+
+    def _path(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, f"{fingerprint}.npz")
+
+    def load(self, fingerprint: str) -> Optional[FeatureAccumulator]:
+        path = self._path(fingerprint)
+        if not os.path.exists(path):
+            return None
+        return FeatureAccumulator.load(path)
+
+    def save(self, fingerprint: str, accumulator: FeatureAccumulator) -> str:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(fingerprint)
+        # Write under a temporary name first so concurrent runs never read a partial file
+        tmp_path = path + ".tmp.npz"
+        accumulator.save(tmp_path)
+        os.replace(tmp_path, path)
+        return path
@@ -1,26 +1,138 @@
 import json
-import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import torch
+import numpy as np
+from PIL import Image
 from datetime import datetime
 from tqdm import tqdm
 from pytorch_fid.fid_score import calculate_fid_given_paths
 from src.plot.housediffusion_visualizer import HouseDiffusionVisualizerDS2D
 from src.plot.direct_visualizer import DirectVisualizer
+from src.metrics.results_store import ResultsStore
+from src.metrics.diversity.features import (
+    DEFAULT_STATS_CACHE_DIR,
+    ActivationCollector,
+    InceptionFeatureExtractor,
+    StatisticsCache,
+    fid_from_accumulators,
+    kid_from_accumulators,
+)
+
+VIZ_TYPES = ("housediffusion", "direct")
+
+
+def _read_text(path):
+    try:
+        return path.read_text()
+    except OSError:
+        return None
+
+
+def _load_item(item):
+    """
+    Parse a (sample_id, 0.json text, analysis/sample.json text) item.
+    Returns (generated_data, gt_data, messages); generated_data is None if the sample must be skipped.
+    """
+    sample_id, generated_text, gt_text = item
+    messages = []
+    if generated_text is None:
+        return None, None, [f"Warning: 0.json not found, skipping sample {sample_id}"]
+    try:
+        generated_data = json.loads(generated_text)
+    except Exception as e:
+        return None, None, [f"❌ Error processing sample {sample_id}: {e}"]
+
+    gt_data = None
+    if gt_text is None:
+        messages.append(f"Warning: No ground truth file found for sample {sample_id}")
+    else:
+        try:
+            gt_data = json.loads(gt_text)
+        except Exception as e:
+            messages.append(f"Warning: Could not process ground truth for sample {sample_id}: {e}")
+    return generated_data, gt_data, messages
+
+
+def _keeps_sample(item):
+    """Whether _load_item keeps the sample, i.e. whether its ground truth is rendered at all."""
+    _, generated_text, _ = item
+    if generated_text is None:
+        return False
+    try:
+        return json.loads(generated_text) is not None
+    except Exception:
+        return False
+
+
+# Per-process generator used by the rendering pool (visualizers are built once per worker)
+_WORKER_GENERATOR = None
+
+
+def _init_render_worker(results_dir, resolution, save_images, keep_images, cached_ground_truth, direct_backend):
+    global _WORKER_GENERATOR
+    _WORKER_GENERATOR = DiversityMetricGenerator(results_dir=results_dir, resolution=resolution, save_images=save_images,
+                                                 direct_backend=direct_backend)
+    _WORKER_GENERATOR.keep_images = keep_images
+    _WORKER_GENERATOR.cached_ground_truth = set(cached_ground_truth)
+
+
+def _render_chunk(items):
+    results = []
+    for item in items:
+        generated_data, gt_data, messages = _load_item(item)
+        images = []
+        if generated_data is not None:
+            images, errors = _WORKER_GENERATOR.render_images(item[0], generated_data, gt_data)
+            messages += errors
+        results.append((item[0], images, messages))
+    return results
 
 class DiversityMetricGenerator:
-    def __init__(self, results_dir="results_GRPO_70B", resolution=256):
+    def __init__(self, results_dir="results_GRPO_70B", resolution=256, save_images=True,
+                 extractor=None, batch_size=64, stats_cache=None, workers=1, chunk_size=16,
+                 direct_backend="matplotlib"):
         """
         Initialize the diversity metric generator.
         
         Args:
             results_dir (str): Name of the results directory to process
             resolution (int): Resolution for generated images
+            save_images (bool): Whether to also write the rendered PNG/SVG files to disk
+            extractor (InceptionFeatureExtractor, optional): If given, rendered images are fed to it
+                in memory (in batches of batch_size) and FID is computed without reading images back
+            batch_size (int): Number of images per Inception forward pass
+            stats_cache (StatisticsCache, optional): Cache of ground-truth Inception statistics; on a hit
+                the ground truth is neither featurized nor (unless images are saved) rendered
+            workers (int): Number of rendering processes; each builds its own visualizers
+            chunk_size (int): Samples sent to a rendering process at a time
+            direct_backend (str): DirectVisualizer backend, "matplotlib" or the faster but not
+                pixel-identical "raster" (scores of the two are not comparable)
         """
         self.results_dir = Path(results_dir).name
         self.resolution = resolution
+        self.save_images = save_images
+        self.extractor = extractor
+        self.stats_cache = stats_cache
+        # Ground-truth FeatureAccumulator per visualization type loaded from the cache, and their cache keys
+        self.gt_statistics = {}
+        self.gt_fingerprints = {}
+        self.cached_ground_truth = set()
+        self.workers = max(1, int(workers))
+        self.chunk_size = max(1, int(chunk_size))
+        # Warning and error messages per sample id
+        self.failures = {}
+        self.collectors = None
+        # Rendered arrays are only needed when they are featurized in memory
+        self.keep_images = extractor is not None
+        if extractor is not None:
+            self.collectors = {
+                viz: {split: ActivationCollector(extractor, batch_size) for split in ("generated", "ground_truth")}
+                for viz in VIZ_TYPES
+            }
         self.visualizer = HouseDiffusionVisualizerDS2D(resolution=resolution)
-        self.direct_visualizer = DirectVisualizer(resolution=resolution)
+        self.direct_visualizer = DirectVisualizer(resolution=resolution, backend=direct_backend)
         
         # Set up paths - save in project root under results_diversity
         if Path(results_dir).exists():
@@ -45,6 +157,8 @@ class DiversityMetricGenerator:
         self.direct_ground_truth_path = self.direct_viz_base / "ground_truth"
         
         # Create directories if they don't exist
+        if not save_images:
+            return
         self.generated_path.mkdir(parents=True, exist_ok=True)
         self.generated_svg_path.mkdir(parents=True, exist_ok=True)
         self.ground_truth_path.mkdir(parents=True, exist_ok=True)
@@ -59,71 +173,186 @@ class DiversityMetricGenerator:
             sample_dir (Path): Path to the sample directory
             sample_id (str): Sample identifier
         """
-        generated_json = sample_dir / "0.json"
-        analysis_dir = sample_dir / "analysis"
+        item = (sample_id, _read_text(sample_dir / "0.json"), _read_text(sample_dir / "analysis" / "sample.json"))
+        generated_data, gt_data, messages = _load_item(item)
+        self._report(sample_id, messages)
+        if generated_data is not None:
+            self.render_sample(sample_id, generated_data, gt_data)
+
+    def render_sample(self, sample_id, generated_data, gt_data=None):
+        """
+        Generate visualizations for an already loaded sample.
         
-        if not generated_json.exists():
-            print(f"Warning: {generated_json} not found, skipping sample {sample_id}")
-            return
+        Args:
+            sample_id (str): Sample identifier
+            generated_data (dict): Generated floorplan (contents of 0.json)
+            gt_data (dict, optional): Ground truth sample (contents of analysis/sample.json)
+        """
+        images, errors = self.render_images(sample_id, generated_data, gt_data)
+        self._report(sample_id, errors)
+        self._collect(images)
+
+    def render_images(self, sample_id, generated_data, gt_data=None):
+        """
+        Render (and optionally save) the generated and ground-truth images of one sample.
         
+        Returns:
+            tuple: ([(viz, split, RGB array)], [error messages])
+        """
+        images, errors = [], []
         try:
-            # Load the generated floorplan data
-            with open(generated_json, 'r') as f:
-                generated_data = json.load(f)
-            
-            # Generate HouseDiffusion PNG image for the generated floorplan
-            output_path = self.generated_path / f"{sample_id}.png"
-            img = self.visualizer.visualize_floorplan_ds2d(
-                str(generated_json),
-                save_path=str(output_path),
-                save_svg=False,
-                # show_edges=False
-            )
-            
-            # Generate HouseDiffusion SVG image for the generated floorplan
-            svg_output_path = self.generated_svg_path / f"{sample_id}.svg"
-            svg_img = self.visualizer.visualize_floorplan_ds2d(
-                str(generated_json),
-                save_path=str(svg_output_path),
-                save_svg=True,
-                # show_edges=False
+            # HouseDiffusion rendering of the generated floorplan (PNG and SVG come from one drawing)
+            self._render_housediffusion(
+                images, "generated", generated_data,
+                self.generated_path / f"{sample_id}.png",
+                self.generated_svg_path / f"{sample_id}.svg"
             )
             
             # Generate Direct visualization for the generated floorplan
-            self.direct_visualizer.generate_and_save_visualization(generated_data, str(self.direct_generated_path / f"{sample_id}.png"))
+            self._render_direct(images, "generated", generated_data, self.direct_generated_path / f"{sample_id}.png")
                 
-            # Process ground truth if available in analysis directory
-            if analysis_dir.exists():
-                ground_truth_json = analysis_dir / "sample.json"
-                if ground_truth_json.exists():
-                    try:
-                        with open(ground_truth_json, 'r') as f:
-                            gt_data = json.load(f)
-                        
-                        # Check if ground truth has the expected format
-                        if "spaces" in gt_data:
-                            # HouseDiffusion ground truth visualization
-                            gt_output_path = self.ground_truth_path / f"{sample_id}.png"
-                            gt_img = self.visualizer.visualize_floorplan_ds2d(
-                                str(ground_truth_json),
-                                save_path=str(gt_output_path),
-                                save_svg=False,
-                                show_edges=False
-                            )
-                            
-                            # Direct ground truth visualization
-                            self.direct_visualizer.generate_and_save_visualization(gt_data, str(self.direct_ground_truth_path / f"{sample_id}.png"))
-                        else:
-                            print(f"Warning: Ground truth data for sample {sample_id} doesn't have 'spaces' key")
-                        
-                    except Exception as e:
-                        print(f"Warning: Could not process ground truth for sample {sample_id}: {e}")
-                else:
-                    print(f"Warning: No ground truth file found for sample {sample_id}")
-                        
         except Exception as e:
-            print(f"❌ Error processing sample {sample_id}: {e}")
-    
+            errors.append(f"❌ Error processing sample {sample_id}: {e}")
+
+        # The ground truth is rendered independently of the generated plan, so the ground-truth set
+        # (and its cached statistics) only depends on the test split
+        if gt_data is not None:
+            try:
+                # Check if ground truth has the expected format
+                if "spaces" in gt_data:
+                    # HouseDiffusion ground truth visualization
+                    if self._needs_ground_truth("housediffusion"):
+                        self._render_housediffusion(images, "ground_truth", gt_data, self.ground_truth_path / f"{sample_id}.png")
+                    
+                    # Direct ground truth visualization
+                    if self._needs_ground_truth("direct"):
+                        self._render_direct(images, "ground_truth", gt_data, self.direct_ground_truth_path / f"{sample_id}.png")
+                else:
+                    errors.append(f"Warning: Ground truth data for sample {sample_id} doesn't have 'spaces' key")
+                
+            except Exception as e:
+                errors.append(f"Warning: Could not process ground truth for sample {sample_id}: {e}")
+        return images, errors
+
+    def _render_housediffusion(self, images, split, data, png_path, svg_path=None):
+        """Rasterize the HouseDiffusion drawing once in memory and optionally save PNG/SVG."""
+        drawing = self.visualizer.build_drawing_ds2d(data, show_edges=False)
+        if drawing is None:
+            return
+        img = self.visualizer.drawing_to_image(drawing)
+        if self.save_images:
+            img.save(png_path)
+            if svg_path is not None:
+                drawing.saveSvg(str(svg_path))
+        if self.keep_images:
+            images.append(("housediffusion", split, np.asarray(img.convert('RGB'))))
+
+    def _render_direct(self, images, split, data, png_path):
+        image = self.direct_visualizer.render_array(data)
+        if self.save_images:
+            Image.fromarray(image).save(png_path)
+        if self.keep_images:
+            images.append(("direct", split, image))
+
+    def _report(self, sample_id, messages):
+        for message in messages:
+            print(message)
+        if messages:
+            self.failures.setdefault(str(sample_id), []).extend(messages)
+
+    def _collect(self, images):
+        """Feed rendered RGB arrays to the feature collectors (cached ground truth is skipped)."""
+        if self.collectors is None:
+            return
+        for viz, split, image in images:
+            if not (split == "ground_truth" and viz in self.cached_ground_truth):
+                self.collectors[viz][split].add(image)
+
+    def _needs_ground_truth(self, viz):
+        """Ground truth only has to be rendered if it is saved or its statistics are not cached."""
+        return self.save_images or viz not in self.cached_ground_truth
+
+    def renderer_name(self, viz):
+        if viz == "direct":
+            return f"direct-{self.direct_visualizer.backend}"
+        return viz
+
+    def load_ground_truth_statistics(self, ground_truth_texts):
+        """
+        Look up cached ground-truth statistics for this test split.
+        
+        Args:
+            ground_truth_texts (list): Raw analysis/sample.json contents of the samples whose ground truth
+                is rendered (those kept by _load_item), so the cache key covers exactly the accumulated set
+        """
+        if self.stats_cache is None or self.collectors is None:
+            return
+        ground_truth_texts = list(ground_truth_texts)
+        for viz in VIZ_TYPES:
+            fingerprint = StatisticsCache.fingerprint(
+                ground_truth_texts, self.renderer_name(viz), self.resolution, self.extractor.dims
+            )
+            self.gt_fingerprints[viz] = fingerprint
+            cached = self.stats_cache.load(fingerprint)
+            if cached is not None:
+                self.gt_statistics[viz] = cached
+                self.cached_ground_truth.add(viz)
+                print(f"♻️  Using cached {viz} ground-truth statistics ({cached.count} images)")
+
+    def image_counts(self, split):
+        """Number of rendered images per visualization type, from the collectors or the saved files."""
+        if self.collectors is not None:
+            return {
+                viz: self.gt_statistics[viz].count if split == "ground_truth" and viz in self.gt_statistics
+                else self.collectors[viz][split].count
+                for viz in VIZ_TYPES
+            }
+        paths = {
+            "generated": {"housediffusion": self.generated_path, "direct": self.direct_generated_path},
+            "ground_truth": {"housediffusion": self.ground_truth_path, "direct": self.direct_ground_truth_path},
+        }[split]
+        return {viz: len(list(path.glob("*.png"))) for viz, path in paths.items()}
+
+    def _ground_truth_accumulator(self, viz):
+        """Cached ground-truth accumulator, or the freshly streamed one (which is then cached)."""
+        if viz not in self.gt_statistics:
+            accumulator = self.collectors[viz]["ground_truth"].flush()
+            if accumulator.count >= 2 and self.stats_cache is not None and viz in self.gt_fingerprints:
+                self.stats_cache.save(self.gt_fingerprints[viz], accumulator)
+            self.gt_statistics[viz] = accumulator
+        return self.gt_statistics[viz]
+
+    def compute_fid_scores(self):
+        """FID per visualization type from the streamed feature statistics."""
+        scores = {}
+        for viz in VIZ_TYPES:
+            print(f"\n🔍 Computing {viz} FID from in-memory features...")
+            generated = self.collectors[viz]["generated"].flush()
+            scores[viz] = fid_from_accumulators(generated, self._ground_truth_accumulator(viz))
+        return scores
+
+    def compute_kid_scores(self):
+        """KID (mean, std) per visualization type from the feature reservoirs."""
+        scores = {}
+        for viz in VIZ_TYPES:
+            print(f"\n🔍 Computing {viz} KID from in-memory features...")
+            generated = self.collectors[viz]["generated"].flush()
+            kid = kid_from_accumulators(generated, self._ground_truth_accumulator(viz))
+            scores[viz] = None if kid is None else {"mean": kid[0], "std": kid[1]}
+        return scores
+
+    def _render_parallel(self, items):
+        """Render items in a process pool; features, messages and progress are handled here."""
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        init_args = (str(self.source_path), self.resolution, self.save_images, self.keep_images,
+                     sorted(self.cached_ground_truth), self.direct_visualizer.backend)
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_render_worker, initargs=init_args) as pool:
+            with tqdm(total=len(items), desc="Processing samples", unit="sample") as progress:
+                for results in pool.map(_render_chunk, chunks):
+                    for sample_id, images, messages in results:
+                        self._report(sample_id, messages)
+                        self._collect(images)
+                    progress.update(len(results))
 
     def generate_diversity_metrics(self, max_samples=None):
         """
@@ -136,38 +365,56 @@ class DiversityMetricGenerator:
             print(f"❌ Source path {self.source_path} does not exist!")
             return
         
-        # Get all sample directories (numbered directories)
-        sample_dirs = [d for d in self.source_path.iterdir() if d.is_dir() and d.name.isdigit()]
-        sample_dirs.sort(key=lambda x: int(x.name))
-        
-        if max_samples:
-            sample_dirs = sample_dirs[:max_samples]
-        
-        print(f"🏠 Processing {len(sample_dirs)} samples from {self.source_path}")
-        print(f"📁 HouseDiffusion visualizations:")
-        print(f"   - Generated images: {self.generated_path}")
-        print(f"   - Generated SVG files: {self.generated_svg_path}")
-        print(f"   - Ground truth images: {self.ground_truth_path}")
-        print(f"📁 Direct visualizations:")
-        print(f"   - Generated images: {self.direct_generated_path}")
-        print(f"   - Ground truth images: {self.direct_ground_truth_path}")
+        store = ResultsStore(str(self.source_path))
+        if store.is_current():
+            rows = store.rows(columns=["index", "output", "sample"])
+            if max_samples:
+                rows = rows[:max_samples]
+            items = [(str(row["index"]), row["output"], row["sample"]) for row in rows]
+            print(f"🏠 Processing samples from results table {store.path}")
+        else:
+            # Get all sample directories (numbered directories)
+            sample_dirs = [d for d in self.source_path.iterdir() if d.is_dir() and d.name.isdigit()]
+            sample_dirs.sort(key=lambda x: int(x.name))
+            
+            if max_samples:
+                sample_dirs = sample_dirs[:max_samples]
+            
+            items = [(d.name, _read_text(d / "0.json"), _read_text(d / "analysis" / "sample.json")) for d in sample_dirs]
+            print(f"🏠 Processing {len(sample_dirs)} samples from {self.source_path}")
+        self.load_ground_truth_statistics(item[2] for item in items if _keeps_sample(item))
+        if self.save_images:
+            print(f"📁 HouseDiffusion visualizations:")
+            print(f"   - Generated images: {self.generated_path}")
+            print(f"   - Generated SVG files: {self.generated_svg_path}")
+            print(f"   - Ground truth images: {self.ground_truth_path}")
+            print(f"📁 Direct visualizations:")
+            print(f"   - Generated images: {self.direct_generated_path}")
+            print(f"   - Ground truth images: {self.direct_ground_truth_path}")
         
         # Process each sample
-        processed = 0
-        for sample_dir in tqdm(sample_dirs, desc="Processing samples", unit="sample"):
-            sample_id = sample_dir.name
-            self.process_single_sample(sample_dir, sample_id)
-            processed += 1
+        if self.workers > 1 and len(items) > self.chunk_size:
+            self._render_parallel(items)
+        else:
+            for item in tqdm(items, desc="Processing samples", unit="sample"):
+                generated_data, gt_data, messages = _load_item(item)
+                self._report(item[0], messages)
+                if generated_data is not None:
+                    self.render_sample(item[0], generated_data, gt_data)
+        processed = len(items)
         
         print(f"\n🎉 Diversity metric generation complete!")
-        print(f"📊 All visualizations saved in: {self.diversity_base}")
+        if self.save_images:
+            print(f"📊 All visualizations saved in: {self.diversity_base}")
         
         # Print summary statistics
-        hd_generated_count = len(list(self.generated_path.glob("*.png")))
-        hd_svg_count = len(list(self.generated_svg_path.glob("*.svg")))
-        hd_gt_count = len(list(self.ground_truth_path.glob("*.png")))
-        direct_generated_count = len(list(self.direct_generated_path.glob("*.png")))
-        direct_gt_count = len(list(self.direct_ground_truth_path.glob("*.png")))
+        generated_counts = self.image_counts("generated")
+        gt_counts = self.image_counts("ground_truth")
+        hd_generated_count = generated_counts["housediffusion"]
+        hd_svg_count = len(list(self.generated_svg_path.glob("*.svg"))) if self.save_images else 0
+        hd_gt_count = gt_counts["housediffusion"]
+        direct_generated_count = generated_counts["direct"]
+        direct_gt_count = gt_counts["direct"]
         
         print(f"📈 Summary:")
         print(f"   HouseDiffusion Visualizations:")
@@ -178,6 +425,9 @@ class DiversityMetricGenerator:
         print(f"     - Generated: {direct_generated_count}")
         print(f"     - Ground truth: {direct_gt_count}")
         print(f"   - Total samples processed: {processed}")
+        if self.failures:
+            print(f"   - Samples with warnings or errors: {len(self.failures)}")
+        return processed
 
 def compute_fid_score(generated_path, ground_truth_path, device="cuda" if torch.cuda.is_available() else "cpu"):
     """
@@ -229,7 +479,7 @@ def compute_fid_score(generated_path, ground_truth_path, device="cuda" if torch.
         print(f"❌ Error computing FID score: {e}")
         return None
 
-def save_diversity_results(generator, fid_scores, generated_counts, gt_counts, processed_count):
+def save_diversity_results(generator, fid_scores, generated_counts, gt_counts, processed_count, kid_scores=None):
     """
     Save diversity metric results to a JSON file.
     
@@ -239,15 +489,18 @@ def save_diversity_results(generator, fid_scores, generated_counts, gt_counts, p
         generated_counts (dict): Number of generated images per visualization type
         gt_counts (dict): Number of ground truth images per visualization type
         processed_count (int): Number of samples processed
+        kid_scores (dict, optional): KID mean/std per visualization type
     """
     # Get SVG count
-    svg_count = len(list(generator.generated_svg_path.glob("*.svg")))
+    svg_count = len(list(generator.generated_svg_path.glob("*.svg"))) if generator.save_images else 0
     
     results = {
         "timestamp": datetime.now().isoformat(),
         "fid_scores": fid_scores,
+        "kid_scores": kid_scores,
         "results_directory": generator.results_dir,
         "resolution": generator.resolution,
+        "direct_backend": generator.direct_visualizer.backend,
         "statistics": {
             "housediffusion": {
                 "generated_images": generated_counts.get("housediffusion", 0),
@@ -258,8 +511,11 @@ def save_diversity_results(generator, fid_scores, generated_counts, gt_counts, p
                 "generated_images": generated_counts.get("direct", 0),
                 "ground_truth_images": gt_counts.get("direct", 0)
             },
-            "samples_processed": processed_count
+            "samples_processed": processed_count,
+            "images_saved": generator.save_images,
+            "samples_with_failures": len(generator.failures)
         },
+        "failures": generator.failures,
         "paths": {
             "housediffusion": {
                 "generated_images": str(generator.generated_path),
@@ -287,52 +543,72 @@ def save_diversity_results(generator, fid_scores, generated_counts, gt_counts, p
 
 def main():
     """Main function to run the diversity metric generation."""
-    if len(sys.argv) < 2:
-        print("Usage: python run_metric.py <results_directory>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Render floorplans and compute FID for a results folder")
+    parser.add_argument("results_folder", type=str, help="Path to results folder (e.g., results/5_6_7_8)")
+    parser.add_argument("--no_save_images", action="store_true",
+                        help="Only compute features in memory; do not write PNG/SVG files")
+    parser.add_argument("--from_disk", action="store_true",
+                        help="Compute FID from the saved PNG files with pytorch_fid instead of in memory")
+    parser.add_argument("--batch_size", type=int, default=64, help="Images per Inception forward pass (default: 64)")
+    parser.add_argument("--device", type=str, default=None, help="Torch device for feature extraction")
+    parser.add_argument("--stats_cache_dir", type=str, default=DEFAULT_STATS_CACHE_DIR,
+                        help=f"Cache directory for ground-truth Inception statistics (default: {DEFAULT_STATS_CACHE_DIR})")
+    parser.add_argument("--no_stats_cache", action="store_true", help="Always recompute ground-truth statistics")
+    parser.add_argument("--workers", type=int, default=1, help="Number of rendering processes (default: 1)")
+    parser.add_argument("--direct_backend", type=str, default="matplotlib", choices=["matplotlib", "raster"],
+                        help="Renderer of the direct visualizations; raster is faster but its scores are not "
+                             "comparable with matplotlib ones (default: matplotlib)")
+    # Extra positional arguments (e.g. the renderer name passed by scripts/metric.sh) are ignored
+    args, _ = parser.parse_known_args()
+
+    if args.from_disk and args.no_save_images:
+        parser.error("--from_disk needs the saved images; drop --no_save_images")
 
-    results_dir = sys.argv[1]
+    extractor = None if args.from_disk else InceptionFeatureExtractor(device=args.device)
     generator = DiversityMetricGenerator(
-        results_dir=results_dir,
-        resolution=256
+        results_dir=args.results_folder,
+        resolution=256,
+        save_images=not args.no_save_images,
+        extractor=extractor,
+        batch_size=args.batch_size,
+        stats_cache=None if args.no_stats_cache else StatisticsCache(args.stats_cache_dir),
+        workers=args.workers,
+        direct_backend=args.direct_backend
     )
     
-    generator.generate_diversity_metrics() 
+    processed_count = generator.generate_diversity_metrics() 
+    if processed_count is None:
+        return
     
     # Get counts for both visualization types
-    hd_generated_count = len(list(generator.generated_path.glob("*.png")))
-    hd_gt_count = len(list(generator.ground_truth_path.glob("*.png")))
-    direct_generated_count = len(list(generator.direct_generated_path.glob("*.png")))
-    direct_gt_count = len(list(generator.direct_ground_truth_path.glob("*.png")))
+    generated_counts = generator.image_counts("generated")
+    gt_counts = generator.image_counts("ground_truth")
     
     # Compute FID scores for both visualization types
     print(f"\n🔍 Computing FID scores for both visualization types...")
     
-    hd_fid_score = compute_fid_score(
-        generated_path=generator.generated_path,
-        ground_truth_path=generator.ground_truth_path
-    )
-    
-    direct_fid_score = compute_fid_score(
-        generated_path=generator.direct_generated_path,
-        ground_truth_path=generator.direct_ground_truth_path
-    )
+    kid_scores = None
+    if args.from_disk:
+        hd_fid_score = compute_fid_score(
+            generated_path=generator.generated_path,
+            ground_truth_path=generator.ground_truth_path
+        )
+        
+        direct_fid_score = compute_fid_score(
+            generated_path=generator.direct_generated_path,
+            ground_truth_path=generator.direct_ground_truth_path
+        )
+    else:
+        in_memory_scores = generator.compute_fid_scores()
+        hd_fid_score = in_memory_scores["housediffusion"]
+        direct_fid_score = in_memory_scores["direct"]
+        kid_scores = generator.compute_kid_scores()
     
     fid_scores = {
         "housediffusion": hd_fid_score,
         "direct": direct_fid_score
     }
     
-    generated_counts = {
-        "housediffusion": hd_generated_count,
-        "direct": direct_generated_count
-    }
-    
-    gt_counts = {
-        "housediffusion": hd_gt_count,
-        "direct": direct_gt_count
-    }
-    
     # Print results
     print(f"\n🎯 Final FID Scores:")
     if hd_fid_score is not None:
@@ -347,8 +623,12 @@ def main():
         
     print(f"💡 Lower FID scores indicate better image quality and similarity to real data")
     
-    processed_count = len([d for d in generator.source_path.iterdir() if d.is_dir() and d.name.isdigit()])
-    save_diversity_results(generator, fid_scores, generated_counts, gt_counts, processed_count)
+    if kid_scores is not None:
+        print(f"\n🎯 Final KID Scores:")
+        for viz, kid in kid_scores.items():
+            print(f"   {viz}: " + ("Could not compute" if kid is None else f"{kid['mean']:.6f} ± {kid['std']:.6f}"))
+    
+    save_diversity_results(generator, fid_scores, generated_counts, gt_counts, processed_count, kid_scores)
 
 if __name__ == "__main__":
     main()
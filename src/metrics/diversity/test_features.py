@@ -0,0 +1,143 @@
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from src.metrics.diversity.features import FeatureAccumulator, StatisticsCache, kid_from_accumulators
+
+DIMS = 8
+
+
+def features(n, seed=0, shift=0.0):
+    return np.random.default_rng(seed).normal(shift, 1.0, size=(n, DIMS))
+
+
+def accumulate(batches, reservoir_size=50, seed=0):
+    acc = FeatureAccumulator(DIMS, reservoir_size, seed)
+    for batch in batches:
+        acc.update(batch)
+    return acc
+
+
+class TestFeatureAccumulator:
+    """Streamed statistics equal the batch ones, and the reservoir is a uniform sample"""
+
+    def test_statistics_match_numpy(self):
+        data = features(500)
+        acc = accumulate(np.array_split(data, 7))
+        mu, sigma = acc.statistics()
+        assert acc.count == len(data)
+        np.testing.assert_allclose(mu, np.mean(data, axis=0), atol=1e-12)
+        np.testing.assert_allclose(sigma, np.cov(data, rowvar=False), atol=1e-10)
+
+    def test_statistics_need_two_features(self):
+        with pytest.raises(ValueError):
+            accumulate([features(1)]).statistics()
+
+    def test_merge_matches_single_accumulator(self):
+        data = features(300)
+        single = accumulate([data])
+        merged = accumulate([data[:120]], seed=1).merge(accumulate([data[120:]], seed=2))
+        assert merged.count == single.count
+        np.testing.assert_allclose(merged.sum, single.sum)
+        np.testing.assert_allclose(merged.outer, single.outer)
+        for merged_stat, single_stat in zip(merged.statistics(), single.statistics()):
+            np.testing.assert_allclose(merged_stat, single_stat, atol=1e-10)
+        assert len(merged.reservoir) == merged.reservoir_size
+        # Every reservoir row is one of the features, and none is drawn twice
+        rows = {tuple(row) for row in data.astype(np.float32)}
+        assert all(tuple(row) in rows for row in merged.reservoir)
+        assert len({tuple(row) for row in merged.reservoir}) == merged.reservoir_size
+
+    def test_merge_rejects_other_dims(self):
+        with pytest.raises(ValueError):
+            accumulate([features(4)]).merge(FeatureAccumulator(DIMS + 1))
+
+    def test_reservoir_size(self):
+        acc = FeatureAccumulator(DIMS, reservoir_size=50)
+        acc.update(features(30))
+        assert len(acc.reservoir) == 30
+        acc.update(features(30, seed=1))
+        assert len(acc.reservoir) == 50
+        acc.update(features(500, seed=2))
+        assert len(acc.reservoir) == 50 and acc.count == 560
+
+    def test_reservoir_is_uniform(self):
+        """Every one of 100 features, streamed in batches, is kept with probability 10 / 100"""
+        n, size, trials = 100, 10, 2000
+        ids = np.arange(n, dtype=np.float64)[:, None]
+        kept = np.zeros(n)
+        for trial in range(trials):
+            acc = FeatureAccumulator(1, size, seed=trial)
+            for batch in np.array_split(ids, 13):
+                acc.update(batch)
+            kept[acc.reservoir[:, 0].astype(np.int64)] += 1
+        # The binomial std of each frequency is 0.0067
+        np.testing.assert_allclose(kept / trials, size / n, atol=0.03)
+
+    def test_merged_reservoir_is_uniform(self):
+        """After merging shards of 30 and 70 features, the first shard makes up 30% of the reservoir"""
+        size, trials = 10, 2000
+        from_first = 0
+        for trial in range(trials):
+            first = FeatureAccumulator(1, size, seed=2 * trial)
+            first.update(np.zeros((30, 1)))
+            second = FeatureAccumulator(1, size, seed=2 * trial + 1)
+            second.update(np.ones((70, 1)))
+            merged = first.merge(second)
+            assert len(merged.reservoir) == size
+            from_first += int((merged.reservoir[:, 0] == 0).sum())
+        assert from_first / (size * trials) == pytest.approx(0.3, abs=0.02)
+
+    def test_save_load_round_trip(self, tmp_path):
+        acc = accumulate(np.array_split(features(200), 3))
+        path = str(tmp_path / "acc.npz")
+        acc.save(path)
+        loaded = FeatureAccumulator.load(path)
+        assert (loaded.dims, loaded.reservoir_size, loaded.count) == (acc.dims, acc.reservoir_size, acc.count)
+        np.testing.assert_array_equal(loaded.sum, acc.sum)
+        np.testing.assert_array_equal(loaded.outer, acc.outer)
+        np.testing.assert_array_equal(loaded.reservoir, acc.reservoir)
+        # A loaded accumulator keeps streaming
+        loaded.update(features(10, seed=1))
+        assert loaded.count == acc.count + 10
+
+
+class TestKID:
+    def test_same_distribution_is_near_zero(self):
+        same = kid_from_accumulators(accumulate([features(400, seed=1)], 200), accumulate([features(400, seed=2)], 200),
+                                     num_subsets=20, subset_size=100)
+        shifted = kid_from_accumulators(accumulate([features(400, seed=1, shift=1.0)], 200), accumulate([features(400, seed=2)], 200),
+                                        num_subsets=20, subset_size=100)
+        assert abs(same[0]) < 3 * same[1] + 1e-3
+        assert shifted[0] > 10 * abs(same[0])
+
+    def test_reproducible_with_seed(self):
+        generated, ground_truth = accumulate([features(100, seed=1)]), accumulate([features(100, seed=2)])
+        assert kid_from_accumulators(generated, ground_truth, 10, 20) == kid_from_accumulators(generated, ground_truth, 10, 20)
+
+    def test_needs_two_features(self):
+        assert kid_from_accumulators(accumulate([features(1)]), accumulate([features(100)])) is None
+
+
+class TestStatisticsCache:
+    def test_fingerprint(self):
+        texts = ['{"a": 1}', '{"b": 2}', None]
+        fingerprint = StatisticsCache.fingerprint(texts, "housediffusion", 256, DIMS)
+        assert fingerprint == StatisticsCache.fingerprint(texts[::-1], "housediffusion", 256, DIMS)
+        assert fingerprint != StatisticsCache.fingerprint(texts, "housediffusion", 512, DIMS)
+        assert fingerprint != StatisticsCache.fingerprint(texts, "direct", 256, DIMS)
+        assert fingerprint != StatisticsCache.fingerprint(texts[:1], "housediffusion", 256, DIMS)
+
+    def test_save_load_round_trip(self, tmp_path):
+        cache = StatisticsCache(str(tmp_path / "fid_cache"))
+        fingerprint = StatisticsCache.fingerprint(['{"a": 1}'], "housediffusion", 256, DIMS)
+        assert cache.load(fingerprint) is None
+        acc = accumulate([features(60)])
+        cache.save(fingerprint, acc)
+        loaded = cache.load(fingerprint)
+        for loaded_stat, stat in zip(loaded.statistics(), acc.statistics()):
+            np.testing.assert_array_equal(loaded_stat, stat)
+        np.testing.assert_array_equal(loaded.reservoir, acc.reservoir)
+        assert [p.name for p in (tmp_path / "fid_cache").iterdir()] == [f"{fingerprint}.npz"]
@@ -0,0 +1,38 @@
+import hashlib
+import os
+from src.utils.sqlite_cache import SQLiteCache
+
+# Bump whenever a change to the metric code alters per-sample results,
+# so that stale cache entries are ignored instead of silently reused.
+METRIC_VERSION = "1"
+
+DEFAULT_CACHE_PATH = "final_results/metric_cache.sqlite"
+
+
+class MetricCache(SQLiteCache):
+    """
+    On-disk cache of per-sample metrics, keyed by the content hash of a
+    sample's 0.json + prompt.json and the metric code version.
+
+    Entries are stored per metric kind ("numerical", "compatibility") so that
+    different evaluators can share one cache file across results folders.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, version: str = METRIC_VERSION):
+        super().__init__(path, "metrics")
+        self.version = version
+
+    def sample_key(self, sample_dir: str) -> str:
+        """
+        Hash 0.json + prompt.json of a sample folder together with the metric version.
+        Missing files hash to a marker so that the key changes once they appear.
+        """
+        h = hashlib.sha256(self.version.encode("utf-8"))
+        for name in ("0.json", "prompt.json"):
+            h.update(b"\0" + name.encode("utf-8") + b"\0")
+            try:
+                with open(os.path.join(sample_dir, name), "rb") as f:
+                    h.update(f.read())
+            except OSError:
+                h.update(b"<missing>")
+        return h.hexdigest()
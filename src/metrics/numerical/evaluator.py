@@ -1,59 +1,121 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+import numpy as np
+import pyarrow.dataset as pads
 from typing import Dict, List, Tuple, Optional
 from src.utils.json_check.verify import is_valid_json
+from src.metrics.bootstrap import paired_bootstrap
+from src.metrics.metric_cache import MetricCache
+from src.metrics.results_store import METRIC_COLUMNS, ResultsStore, sample_folders
 from src.metrics.numerical.utils import NumericalUtils
 from src.metrics.numerical.calculator import NumericalMetricsCalculator
 
+CACHE_KIND = "numerical"
+
+METRIC_KEYS = [
+    ("json_validity", "JSON Validity ↑"),
+    # ("room_count_match_pct", "Room Count ↑"),
+    # ("total_area_pct_diff", "Total Area ↑"),
+    # ("polygon_area_pct_diff_mean", "Polygon Area ↑"),
+    ("overlap_present_pct", "Overlap ↓"),
+    ("percentage_overlap_pct", "Percentage Overlap ↓"),
+    # ("prompt_room_count_pct", "Prompt Room Count ↑"),
+    # ("prompt_total_area_coverage_pct", "Prompt Total Area ↑"),
+    ("prompt_room_id_recall_pct", "Room ID ↑"),
+    ("prompt_room_area_mape_pct", "Room Area MAPE ↓"),
+    # ("prompt_room_area_compliance_pct", "Rooms Area Compliance (10%) ↑"),
+]
+
+
+def evaluate_sample(subfolder: str) -> Dict[str, Optional[float]]:
+    """Compute the per-sample record (JSON validity + SampleMetrics fields) for one sample folder."""
+    output_fp = NumericalUtils.load_json(os.path.join(subfolder, "0.json"))
+    prompt_fp = NumericalUtils.load_json(os.path.join(subfolder, "prompt.json"))
+
+    is_valid = is_valid_json(output_fp) if isinstance(output_fp, dict) else False
+    record: Dict[str, Optional[float]] = {"json_validity": 1.0 if is_valid else 0.0}
+    if is_valid:
+        record.update(asdict(NumericalMetricsCalculator(output_fp, prompt_fp).compute()))
+    return record
+
+
+def _evaluate_chunk(subfolders: List[str]) -> List[Dict[str, Optional[float]]]:
+    return [evaluate_sample(subfolder) for subfolder in subfolders]
+
+
+def evaluate_samples(subfolders: List[str], workers: int = 1, chunk_size: int = 64) -> List[Dict[str, Optional[float]]]:
+    """
+    Evaluate sample folders, optionally fanned out over a process pool.
+    Folders are sent in chunks to amortize IPC; results come back in input order.
+    """
+    if workers <= 1 or len(subfolders) <= chunk_size:
+        return _evaluate_chunk(subfolders)
+
+    chunks = [subfolders[i:i + chunk_size] for i in range(0, len(subfolders), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [record for chunk in pool.map(_evaluate_chunk, chunks) for record in chunk]
+
 
 class NumericalEvaluate:
     """Aggregates numerical metrics across a results folder (overall stats, not split by room count)."""
 
-    def __init__(self, folder_path: str, viz_round: int = 2):
+    def __init__(self, folder_path: str, viz_round: int = 2, cache: Optional[MetricCache] = None,
+                 workers: int = 1, chunk_size: int = 64, bootstrap: int = 0):
         self.folder_path = folder_path
         self.viz_round = max(0, int(viz_round))
-        self.metric_keys = [
-            ("json_validity", "JSON Validity ↑"),
-            # ("room_count_match_pct", "Room Count ↑"),
-            # ("total_area_pct_diff", "Total Area ↑"),
-            # ("polygon_area_pct_diff_mean", "Polygon Area ↑"),
-            ("overlap_present_pct", "Overlap ↓"),
-            ("percentage_overlap_pct", "Percentage Overlap ↓"),
-            # ("prompt_room_count_pct", "Prompt Room Count ↑"),
-            # ("prompt_total_area_coverage_pct", "Prompt Total Area ↑"),
-            ("prompt_room_id_recall_pct", "Room ID ↑"),
-            ("prompt_room_area_mape_pct", "Room Area MAPE ↓"),
-            # ("prompt_room_area_compliance_pct", "Rooms Area Compliance (10%) ↑"),
-        ]
+        self.cache = cache
+        self.workers = max(1, int(workers))
+        self.chunk_size = max(1, int(chunk_size))
+        # Number of bootstrap resamples for 95% confidence intervals (0 disables them)
+        self.bootstrap = max(0, int(bootstrap))
+        self.confidence_intervals: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        self.metric_keys = list(METRIC_KEYS)
+
+    def _sample_records(self) -> List[Tuple[int, Dict[str, Optional[float]]]]:
+        store = ResultsStore(self.folder_path)
+        if store.is_current():
+            # Metric columns are only read for valid outputs; the rest only need their index
+            valid = {row.pop("index"): row for row in store.rows(columns=["index"] + METRIC_COLUMNS,
+                                                                 filter=pads.field("json_valid") == True)}
+            return [(idx, {**valid[idx], "json_validity": 1.0} if idx in valid else {"json_validity": 0.0})
+                    for idx in store.indices()]
+
+        folders = sample_folders(self.folder_path)
+        if self.cache is None:
+            records = evaluate_samples([subfolder for _, subfolder in folders], self.workers, self.chunk_size)
+            return [(idx, record) for (idx, _), record in zip(folders, records)]
+
+        keys = [self.cache.sample_key(subfolder) for _, subfolder in folders]
+        cached = self.cache.get_many(keys, CACHE_KIND)
+
+        # Only evaluate samples missing from the cache, each distinct key once
+        missing: Dict[str, str] = {}
+        for (_, subfolder), key in zip(folders, keys):
+            if key not in cached and key not in missing:
+                missing[key] = subfolder
+        computed = dict(zip(missing, evaluate_samples(list(missing.values()), self.workers, self.chunk_size)))
+        self.cache.put_many(computed, CACHE_KIND)
+
+        return [(idx, cached[key] if key in cached else computed[key]) for (idx, _), key in zip(folders, keys)]
 
     def evaluate(self) -> Tuple[Dict[str, Tuple[Optional[float], Optional[float]]], List[int]]:
         # Collect sample metrics overall
         samples: Dict[str, List[Optional[float]]] = {k: [] for k, _ in self.metric_keys}
         valid_indices: List[int] = []
 
-        for folder_name in sorted(os.listdir(self.folder_path), key=lambda x: int(x) if x.isdigit() else x):
-            if not folder_name.isdigit():
-                continue
-            idx = int(folder_name)
-            subfolder = os.path.join(self.folder_path, folder_name)
-            if not os.path.isdir(subfolder):
-                continue
-
-            output_fp = NumericalUtils.load_json(os.path.join(subfolder, "0.json"))
-            prompt_fp = NumericalUtils.load_json(os.path.join(subfolder, "prompt.json"))
-
+        for idx, record in self._sample_records():
             # record JSON validity for every sample
-            is_valid = is_valid_json(output_fp) if isinstance(output_fp, dict) else False
-            samples["json_validity"].append(1.0 if is_valid else 0.0)
+            samples["json_validity"].append(record["json_validity"])
 
-            if not is_valid:
+            if not record["json_validity"]:
                 continue
 
-            sm = NumericalMetricsCalculator(output_fp, prompt_fp).compute()
             valid_indices.append(idx)
             for key, _title in self.metric_keys:
                 if key == "json_validity":
                     continue
-                samples[key].append(getattr(sm, key))
+                samples[key].append(record.get(key))
 
         # Aggregate mean/std overall
         stats: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
@@ -61,9 +123,17 @@ class NumericalEvaluate:
             mean, std = NumericalUtils.mean_std(samples[key])
             stats[key] = (None if mean is None else round(mean, 4), None if std is None else round(std, 4))
 
+            if self.bootstrap:
+                clean = np.array([v for v in samples[key] if v is not None], dtype=float)
+                if clean.size:
+                    bs = paired_bootstrap(clean[None, :], n_resamples=self.bootstrap)
+                    self.confidence_intervals[key] = (round(float(bs["ci_low"][0]), 4), round(float(bs["ci_high"][0]), 4))
+                else:
+                    self.confidence_intervals[key] = (None, None)
+
         # Print Markdown table: single overall column
-        header = "| Metric | mean ± std |"
-        divider = "|------------|------------|"
+        header = "| Metric | mean ± std |" + (" 95% CI |" if self.bootstrap else "")
+        divider = "|------------|------------|" + ("------------|" if self.bootstrap else "")
         print(header)
         print(divider)
         for key, title in self.metric_keys:
@@ -72,7 +142,10 @@ class NumericalEvaluate:
                 cell = "-"
             else:
                 cell = f"{mean:.{self.viz_round}f} ± {std:.{self.viz_round}f}"
+            if self.bootstrap:
+                low, high = self.confidence_intervals[key]
+                cell += " | -" if low is None else f" | [{low:.{self.viz_round}f}, {high:.{self.viz_round}f}]"
             print(f"| {title} | {cell} |")
         print()
 
-        return stats, valid_indices 
\ No newline at end of file
+        return stats, valid_indices
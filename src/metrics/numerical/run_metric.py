@@ -1,6 +1,7 @@
 import os
 import json
 import argparse
+from src.metrics.metric_cache import DEFAULT_CACHE_PATH, MetricCache
 from src.metrics.numerical.evaluator import NumericalEvaluate
 
 
@@ -8,10 +9,17 @@ def main():
     parser = argparse.ArgumentParser(description="Numerical metrics aggregator")
     parser.add_argument("results_folder", type=str, help="Path to results folder (e.g., results/5_6_7_8)")
     parser.add_argument("--round", dest="viz_round", type=int, default=2, help="Rounding precision for displayed numbers (default: 2)")
+    parser.add_argument("--cache_path", type=str, default=DEFAULT_CACHE_PATH, help=f"Per-sample metric cache (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--no_cache", action="store_true", help="Recompute every sample without reading or writing the cache")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes used to evaluate samples (default: 1)")
+    parser.add_argument("--chunk_size", type=int, default=64, help="Sample folders sent to a worker per task (default: 64)")
+    parser.add_argument("--bootstrap", type=int, default=0, help="Bootstrap resamples for 95%% confidence intervals (default: 0, disabled)")
     args = parser.parse_args()
 
     eval_path = args.results_folder
-    evaluator = NumericalEvaluate(eval_path, viz_round=args.viz_round)
+    cache = None if args.no_cache else MetricCache(args.cache_path)
+    evaluator = NumericalEvaluate(eval_path, viz_round=args.viz_round, cache=cache,
+                                  workers=args.workers, chunk_size=args.chunk_size, bootstrap=args.bootstrap)
     stats, valid_indices = evaluator.evaluate()
 
     result_folder = eval_path.split('/')[1]
@@ -24,6 +32,11 @@ def main():
         "stats": {k: {"mean": round(stats[k][0], args.viz_round), "std": round(stats[k][1], args.viz_round)} for k, _ in evaluator.metric_keys},
         # "valid_indices": valid_indices,
     }
+    if args.bootstrap:
+        for k, (low, high) in evaluator.confidence_intervals.items():
+            if low is not None:
+                payload["stats"][k]["ci_low"] = round(low, args.viz_round)
+                payload["stats"][k]["ci_high"] = round(high, args.viz_round)
 
     with open(os.path.join(output_dir, "numerical.json"), "w", encoding="utf-8") as f:
         json.dump(payload, f, indent=4)
@@ -0,0 +1,99 @@
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from src.metrics.compatibility.eval_overall import compatibility_record, compatibility_records
+from src.metrics.numerical.evaluator import evaluate_sample
+from src.metrics.results_store import METRIC_COLUMNS, ResultsStore, sample_folders, source_stamp
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def sample_row(index: int, sample_dir: str, completion: Optional[str] = None,
+               numerical: Optional[Dict[str, Any]] = None, compatibility: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build one results-table row from a sample folder (0.json, prompt.json, analysis/sample.json),
+    including its per-sample numerical and compatibility metrics.
+    Already computed metric records can be passed in to avoid evaluating the sample twice.
+    """
+    stamp = source_stamp(sample_dir)
+    prompt = _read_text(os.path.join(sample_dir, "prompt.json"))
+    sample = _read_text(os.path.join(sample_dir, "analysis", "sample.json"))
+
+    rplan_id, room_count = None, None
+    try:
+        sample_fp = json.loads(sample) if sample is not None else {}
+        rplan_id = sample_fp.get("rplan_id")
+        room_count = sample_fp.get("room_count")
+    except Exception:
+        pass
+    if room_count is None:
+        try:
+            room_count = json.loads(prompt).get("room_count")
+        except Exception:
+            pass
+
+    if numerical is None:
+        numerical = evaluate_sample(sample_dir)
+    if compatibility is None:
+        compatibility = compatibility_record(sample_dir)
+
+    row = {
+        "index": index,
+        "rplan_id": None if rplan_id is None else str(rplan_id),
+        "room_count": room_count if isinstance(room_count, int) else None,
+        "prompt": prompt,
+        "completion": completion,
+        "output": _read_text(os.path.join(sample_dir, "0.json")),
+        "sample": sample,
+        "prompt_ok": compatibility["prompt_ok"],
+        "json_valid": bool(numerical["json_validity"]),
+        "output_room_count": compatibility["room_count"],
+        "compatibility": compatibility["score"],
+        "source_stamp": stamp,
+    }
+    for name in METRIC_COLUMNS:
+        row[name] = numerical.get(name)
+    return row
+
+
+def _rows_for_chunk(items: List[tuple]) -> List[Dict[str, Any]]:
+    # Score the whole chunk's compatibility in one batch
+    records = compatibility_records([sample_dir for _, sample_dir in items])
+    return [sample_row(index, sample_dir, compatibility=record) for (index, sample_dir), record in zip(items, records)]
+
+
+def build_results_store(results_dir: str, workers: int = 1, chunk_size: int = 64) -> int:
+    """(Re)build the results table of a folder by crawling `<idx>/` sample folders once. Returns the number of rows."""
+    items = sample_folders(results_dir)
+
+    if workers <= 1 or len(items) <= chunk_size:
+        rows = _rows_for_chunk(items)
+    else:
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = [row for chunk in pool.map(_rows_for_chunk, chunks) for row in chunk]
+
+    ResultsStore(results_dir).replace(rows)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the columnar results table for a results folder")
+    parser.add_argument("results_folder", type=str, help="Path to results folder (e.g., results/5_6_7_8)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (default: 1)")
+    args = parser.parse_args()
+
+    count = build_results_store(args.results_folder, workers=args.workers)
+    print(f"Wrote {count} rows to {ResultsStore(args.results_folder).path}")
+
+
+if __name__ == "__main__":
+    main()
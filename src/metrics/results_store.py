@@ -0,0 +1,121 @@
+import os
+from dataclasses import fields
+from typing import Any, Dict, List, Optional, Tuple
+import pyarrow as pa
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+from src.metrics.numerical.sample_metrics import SampleMetrics
+
+STORE_DIRNAME = "_results"
+METRIC_COLUMNS = [f.name for f in fields(SampleMetrics)]
+
+# Files of a sample folder that its row is built from; their sizes and modification times are stored with the row
+SOURCE_FILES = ("0.json", "prompt.json", os.path.join("analysis", "sample.json"))
+
+SCHEMA = pa.schema(
+    [
+        ("index", pa.int64()),
+        ("rplan_id", pa.string()),
+        ("room_count", pa.int64()),
+        ("prompt", pa.string()),
+        ("completion", pa.string()),
+        ("output", pa.string()),
+        ("sample", pa.string()),
+        ("prompt_ok", pa.bool_()),
+        ("json_valid", pa.bool_()),
+        ("output_room_count", pa.int64()),
+        ("compatibility", pa.int64()),
+        ("source_stamp", pa.string()),
+    ]
+    + [(name, pa.float64()) for name in METRIC_COLUMNS]
+)
+
+
+def sample_folders(results_dir: str) -> List[Tuple[int, str]]:
+    """(index, path) of every `<idx>/` sample folder of a results folder, by index."""
+    # Only digit names are sorted as numbers: the table's own _results/ folder sits next to them
+    folders = []
+    for folder_name in sorted((name for name in os.listdir(results_dir) if name.isdigit()), key=int):
+        sample_dir = os.path.join(results_dir, folder_name)
+        if os.path.isdir(sample_dir):
+            folders.append((int(folder_name), sample_dir))
+    return folders
+
+
+def source_stamp(sample_dir: str) -> str:
+    """Size and modification time of every SOURCE_FILES file of a sample folder ("-" when missing)."""
+    parts = []
+    for name in SOURCE_FILES:
+        try:
+            st = os.stat(os.path.join(sample_dir, name))
+            parts.append(f"{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            parts.append("-")
+    return "|".join(parts)
+
+
+class ResultsStore:
+    """
+    Columnar (Parquet) table of generations and per-sample metrics for one results folder.
+
+    The table lives in `<results_dir>/_results/` as one or more part files, so that
+    generation jobs over different test ranges can each write their own part.
+    Readers get projection and predicate pushdown through pyarrow.dataset, e.g.:
+
+        store.read(columns=["index"], filter=(pads.field("json_valid") == True) & (pads.field("output_room_count") == 8))
+
+    Every row keeps the source_stamp of its sample folder. Readers only use the table when is_current(),
+    so folders that were added, removed or regenerated after the table was written are never reported
+    from outdated rows; they crawl the sample folders instead.
+    """
+
+    def __init__(self, results_dir: str):
+        self.results_dir = results_dir
+        self.path = os.path.join(results_dir, STORE_DIRNAME)
+
+    def exists(self) -> bool:
+        return os.path.isdir(self.path) and any(name.endswith(".parquet") for name in os.listdir(self.path))
+
+    def is_current(self) -> bool:
+        """
+        Whether the table exists and has exactly one row per sample folder, none of whose
+        source files changed since the row was written (only the folders are stat'ed).
+        """
+        if not self.exists():
+            return False
+        table = self.read(columns=["index", "source_stamp"])
+        stamps = dict(zip(table.column("index").to_pylist(), table.column("source_stamp").to_pylist()))
+        folders = sample_folders(self.results_dir)
+        current = (len(stamps) == table.num_rows == len(folders)
+                   and all(stamps.get(idx) == source_stamp(sample_dir) for idx, sample_dir in folders))
+        if not current:
+            print(f"Results table {self.path} is out of date with the sample folders; reading the folders instead")
+        return current
+
+    def write(self, rows: List[Dict[str, Any]], part: str = "all") -> str:
+        os.makedirs(self.path, exist_ok=True)
+        part_path = os.path.join(self.path, f"part-{part}.parquet")
+        table = pa.Table.from_pylist(rows, schema=SCHEMA)
+        pq.write_table(table.sort_by("index"), part_path)
+        return part_path
+
+    def replace(self, rows: List[Dict[str, Any]]) -> str:
+        """Replace every part of the table with a single part holding rows."""
+        if os.path.isdir(self.path):
+            for name in os.listdir(self.path):
+                if name.endswith(".parquet"):
+                    os.remove(os.path.join(self.path, name))
+        return self.write(rows)
+
+    def read(self, columns: Optional[List[str]] = None, filter: Optional[pads.Expression] = None) -> pa.Table:
+        dataset = pads.dataset(self.path, format="parquet", schema=SCHEMA)
+        table = dataset.to_table(columns=columns, filter=filter)
+        # Parts from different generation jobs are not globally ordered
+        return table.sort_by("index") if "index" in table.column_names else table
+
+    def rows(self, columns: Optional[List[str]] = None, filter: Optional[pads.Expression] = None) -> List[Dict[str, Any]]:
+        return self.read(columns=columns, filter=filter).to_pylist()
+
+    def indices(self, filter: Optional[pads.Expression] = None) -> List[int]:
+        return self.read(columns=["index"], filter=filter).column("index").to_pylist()
+
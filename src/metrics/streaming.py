@@ -0,0 +1,185 @@
+import os
+import json
+import math
+from typing import Any, Dict, List, Optional, Tuple
+from src.metrics.numerical.evaluator import METRIC_KEYS, evaluate_sample
+from src.metrics.compatibility.eval_overall import compatibility_record
+
+
+def final_results_dir(eval_path: str) -> str:
+    """Output folder used by the run_metric scripts for a results folder (e.g. results/<exp> -> final_results/<exp>)."""
+    return f"final_results/{eval_path.split('/')[1]}"
+
+
+class RunningStat:
+    """Running mean / sample std (Welford), mergeable across shards (Chan et al.)."""
+
+    def __init__(self, n: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, value: float) -> None:
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other: "RunningStat") -> None:
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+
+    def mean_std(self) -> Tuple[Optional[float], Optional[float]]:
+        # Same conventions as NumericalUtils.mean_std / statistics.stdev
+        if self.n == 0:
+            return None, None
+        if self.n == 1:
+            return self.mean, 0.0
+        return self.mean, math.sqrt(self.m2 / (self.n - 1))
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"n": self.n, "mean": self.mean, "m2": self.m2}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, float]) -> "RunningStat":
+        return cls(data["n"], data["mean"], data["m2"])
+
+
+class StreamingMetricsAggregator:
+    """
+    Aggregates numerical and compatibility metrics sample by sample while generations are written,
+    and produces the same numerical.json / compatibility.json as the run_metric scripts.
+
+    Each generation job owns one part state file under `<final_results>/<exp>/streaming/`, which is
+    checkpointed every `checkpoint_every` samples. `finalize` merges all parts, so jobs over
+    different test ranges of the same output folder combine into one result.
+    """
+
+    def __init__(self, eval_path: str, part: str = "all", room_counts: Optional[List[int]] = None,
+                 checkpoint_every: int = 100, viz_round: int = 2):
+        self.eval_path = eval_path
+        self.part = part
+        self.room_counts = room_counts or [5, 6, 7, 8]
+        self.checkpoint_every = max(1, int(checkpoint_every))
+        self.viz_round = viz_round
+        self.output_dir = final_results_dir(eval_path)
+        self.state_dir = os.path.join(self.output_dir, "streaming")
+
+        self.numerical = {key: RunningStat() for key, _ in METRIC_KEYS}
+        self.target_attempts = 0
+        self.successful = {rc: 0 for rc in self.room_counts}
+        self.compatibility = {rc: RunningStat() for rc in self.room_counts}
+        self.seen = 0
+
+    def add(self, sample_dir: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Evaluate a finished sample folder and add it. Returns the (numerical, compatibility) records."""
+        numerical = evaluate_sample(sample_dir)
+        compatibility = compatibility_record(sample_dir)
+        self.add_records(numerical, compatibility)
+        return numerical, compatibility
+
+    def add_records(self, numerical: Dict[str, Any], compatibility: Dict[str, Any]) -> None:
+        self.numerical["json_validity"].update(numerical["json_validity"])
+        if numerical["json_validity"]:
+            for key, _ in METRIC_KEYS:
+                if key != "json_validity" and numerical.get(key) is not None:
+                    self.numerical[key].update(numerical[key])
+
+        if compatibility["prompt_ok"]:
+            self.target_attempts += 1
+            rc = compatibility["room_count"]
+            # As Evaluate._compute_raw_for: an attempt only succeeds when its output graph could be scored
+            if compatibility["valid"] and rc in self.successful and compatibility["score"] is not None:
+                self.successful[rc] += 1
+                self.compatibility[rc].update(compatibility["score"])
+
+        self.seen += 1
+        if self.seen % self.checkpoint_every == 0:
+            self.checkpoint()
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "seen": self.seen,
+            "numerical": {key: stat.to_dict() for key, stat in self.numerical.items()},
+            "target_attempts": self.target_attempts,
+            "successful": {str(rc): count for rc, count in self.successful.items()},
+            "compatibility": {str(rc): stat.to_dict() for rc, stat in self.compatibility.items()},
+        }
+
+    def merge_state(self, state: Dict[str, Any]) -> None:
+        self.seen += state["seen"]
+        for key, stat in state["numerical"].items():
+            if key in self.numerical:
+                self.numerical[key].merge(RunningStat.from_dict(stat))
+        self.target_attempts += state["target_attempts"]
+        for rc in self.room_counts:
+            self.successful[rc] += state["successful"].get(str(rc), 0)
+            if str(rc) in state["compatibility"]:
+                self.compatibility[rc].merge(RunningStat.from_dict(state["compatibility"][str(rc)]))
+
+    def checkpoint(self) -> str:
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = os.path.join(self.state_dir, f"part-{self.part}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state(), f)
+        os.replace(tmp_path, path)
+        return path
+
+    def numerical_payload(self) -> Dict[str, Any]:
+        stats = {}
+        for key, _ in METRIC_KEYS:
+            mean, std = self.numerical[key].mean_std()
+            if mean is None:
+                stats[key] = None
+            else:
+                stats[key] = {"mean": round(round(mean, 4), self.viz_round), "std": round(round(std, 4), self.viz_round)}
+        return {"eval_path": self.eval_path, "stats": stats}
+
+    def compatibility_payload(self) -> Dict[str, Any]:
+        json_data = {
+            "model_name": "DS2D v2",
+            "eval_path": self.eval_path,
+            "room_counts": self.room_counts,
+            "stats": {},
+        }
+        for rc in self.room_counts:
+            mean, std = self.compatibility[rc].mean_std()
+            if self.target_attempts == 0 or mean is None:
+                json_data["stats"][str(rc)] = None
+                continue
+            error_rate = (self.target_attempts - self.successful[rc]) / self.target_attempts * 100
+            json_data["stats"][str(rc)] = {
+                "mean": round(mean, 2),
+                "std": round(std, 2),
+                "error_percentage": round(error_rate, 2),
+            }
+        return json_data
+
+    def finalize(self) -> "StreamingMetricsAggregator":
+        """
+        Checkpoint this part, merge every part of the results folder and write
+        numerical.json / compatibility.json. Returns the merged aggregator.
+        """
+        own_path = self.checkpoint()
+        merged = StreamingMetricsAggregator(self.eval_path, room_counts=self.room_counts, viz_round=self.viz_round)
+        for name in sorted(os.listdir(self.state_dir)):
+            if not (name.startswith("part-") and name.endswith(".json")):
+                continue
+            path = os.path.join(self.state_dir, name)
+            if path == own_path:
+                merged.merge_state(self.state())
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    merged.merge_state(json.load(f))
+
+        with open(os.path.join(self.output_dir, "numerical.json"), "w", encoding="utf-8") as f:
+            json.dump(merged.numerical_payload(), f, indent=4)
+        with open(os.path.join(self.output_dir, "compatibility.json"), "w") as f:
+            json.dump(merged.compatibility_payload(), f, indent=4)
+        return merged
@@ -0,0 +1,121 @@
+import contextlib
+import io
+import json
+import shutil
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+# compare_models imports eval_overall as a sibling, as when it is run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent / "compatibility"))
+from src.metrics.bootstrap import paired_bootstrap, resample_counts
+from compare_models import bootstrap_intersection, get_intersection_of_valid_indices
+from eval_overall import Evaluate
+from test_streaming import results_folder, write_sample
+from test_fixtures import *
+
+ROOM_COUNTS = list(range(1, 16))
+
+
+def metric_samples(n_models=3, n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=n)
+    return np.stack([base + rng.normal(0.1 * m, 0.5, size=n) for m in range(n_models)])
+
+
+class TestPairedBootstrap:
+    def test_reproducible_with_seed(self):
+        samples = metric_samples()
+        first, second = paired_bootstrap(samples, n_resamples=500, seed=3), paired_bootstrap(samples, n_resamples=500, seed=3)
+        assert first.keys() == second.keys()
+        for key in first:
+            np.testing.assert_array_equal(first[key], second[key])
+        other = paired_bootstrap(samples, n_resamples=500, seed=4)
+        assert not np.array_equal(first["ci_low"], other["ci_low"])
+
+    def test_ci_brackets_observed_mean(self):
+        samples = metric_samples()
+        bs = paired_bootstrap(samples, n_resamples=1000)
+        np.testing.assert_allclose(bs["mean"], samples.mean(axis=1))
+        assert np.all(bs["ci_low"] <= bs["mean"]) and np.all(bs["mean"] <= bs["ci_high"])
+        assert np.all(bs["diff_ci_low"] <= bs["diff"]) and np.all(bs["diff"] <= bs["diff_ci_high"])
+        # A higher confidence gives wider intervals on the same resamples
+        wide = paired_bootstrap(samples, n_resamples=1000, confidence=0.99)
+        assert np.all(wide["ci_low"] <= bs["ci_low"]) and np.all(bs["ci_high"] <= wide["ci_high"])
+
+    @pytest.mark.parametrize("reference", [0, 2])
+    def test_reference_row(self, reference):
+        bs = paired_bootstrap(metric_samples(), n_resamples=500, reference=reference)
+        assert bs["diff"][reference] == 0
+        assert bs["diff_ci_low"][reference] == 0 and bs["diff_ci_high"][reference] == 0
+        assert bs["p_diff"][reference] == 1
+
+    def test_resamples_are_paired(self):
+        """A model that is the reference plus a constant has a degenerate difference interval, however noisy the samples"""
+        reference = np.random.default_rng(0).normal(0, 10, size=100)
+        bs = paired_bootstrap(np.stack([reference, reference + 0.5]), n_resamples=500)
+        assert bs["ci_high"][0] - bs["ci_low"][0] > 1
+        np.testing.assert_allclose([bs["diff_ci_low"][1], bs["diff"][1], bs["diff_ci_high"][1]], 0.5)
+        assert bs["p_diff"][1] == 0
+
+    def test_resample_counts(self):
+        counts = resample_counts(7, 50, np.random.default_rng(0))
+        assert counts.shape == (50, 7)
+        np.testing.assert_array_equal(counts.sum(axis=1), 7)
+
+    def test_needs_samples(self):
+        with pytest.raises(ValueError):
+            paired_bootstrap(np.empty((2, 0)))
+
+
+class TestBootstrapIntersection:
+    """compare_models bootstraps every model over the same intersected sample ids"""
+
+    @pytest.fixture
+    def evaluators(self, results_folder):
+        # A second model: sample 0 missing, sample 2 scored against a perturbed graph, and an extra sample
+        other = shutil.copytree(results_folder, results_folder.parent / "other")
+        shutil.rmtree(other / "0")
+        with open(other / "2" / "prompt.json", encoding="utf-8") as f:
+            prompt = json.load(f)
+        for room in prompt["input_graph"]:
+            prompt["input_graph"][room] = []
+        with open(other / "2" / "0.json", encoding="utf-8") as f:
+            write_sample(str(other / "2"), json.load(f), prompt)
+        shutil.copytree(other / "5", other / "100")
+        folders = {"model": str(results_folder), "other": str(other)}
+        return {name: Evaluate(folder, room_counts=ROOM_COUNTS) for name, folder in folders.items()}
+
+    def test_paired_over_intersection(self, evaluators):
+        names = list(evaluators)
+        with contextlib.redirect_stdout(io.StringIO()):
+            common = get_intersection_of_valid_indices([ev.folder_path for ev in evaluators.values()], ROOM_COUNTS)
+        stats = bootstrap_intersection(evaluators, names, common, ROOM_COUNTS, n_resamples=500)
+
+        checked = 0
+        for rc in ROOM_COUNTS:
+            valid = [set(ev.get_valid_indices_for(rc)) for ev in evaluators.values()]
+            assert common[rc] == sorted(set.intersection(*valid))
+            assert 0 not in common[rc] and 100 not in common[rc]
+            scores = {name: dict(zip(common[rc], ev.get_scores(common[rc]))) for name, ev in evaluators.items()}
+            ids = [idx for idx in common[rc] if all(scores[name][idx] is not None for name in names)]
+            if not ids:
+                assert stats[rc] is None
+                continue
+
+            samples = np.array([[scores[name][idx] for idx in ids] for name in names], dtype=float)
+            expected = paired_bootstrap(samples, n_resamples=500)
+            for m, name in enumerate(names):
+                assert stats[rc][name]["n"] == len(ids)
+                assert stats[rc][name] == pytest.approx({**{key: values[m] for key, values in expected.items()}, "n": len(ids)})
+            assert stats[rc][names[0]]["diff"] == 0 and stats[rc][names[0]]["p_diff"] == 1
+            assert stats[rc]["other"]["diff"] == pytest.approx(samples[1].mean() - samples[0].mean())
+            checked += 1
+        assert checked
+        # The perturbed sample scores differently, so the models differ on its room count
+        perturbed_rc = next(rc for rc in ROOM_COUNTS if 2 in common[rc])
+        assert stats[perturbed_rc]["other"]["diff"] != 0
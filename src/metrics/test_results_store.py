@@ -0,0 +1,63 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from src.metrics.compatibility.eval_overall import Evaluate
+from src.metrics.numerical.evaluator import NumericalEvaluate
+from src.metrics.results_rows import build_results_store
+from src.metrics.results_store import ResultsStore
+from test_streaming import results_folder, write_sample
+from test_fixtures import *
+
+
+def evaluate(folder):
+    """Compatibility and numerical results of a folder, with the scripts' table output silenced"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return Evaluate(str(folder)).evaluate(), NumericalEvaluate(str(folder)).evaluate()
+
+
+class TestResultsStore:
+    """Readers only use the results table while it matches the sample folders"""
+
+    def test_table_matches_crawl(self, results_folder):
+        crawled = evaluate(results_folder)
+        build_results_store(str(results_folder))
+        assert ResultsStore(str(results_folder)).is_current()
+        assert evaluate(results_folder) == crawled
+
+    def test_changed_folders_fall_back(self, results_folder, tmp_path):
+        build_results_store(str(results_folder))
+        store = ResultsStore(str(results_folder))
+
+        # A sample added without the table (e.g. a generation run without --results_store)
+        shutil.copytree(results_folder / "0", results_folder / "100")
+        assert not store.is_current()
+        assert evaluate(results_folder) == evaluate(shutil.copytree(results_folder, tmp_path / "crawl" / "added", ignore=shutil.ignore_patterns("_results")))
+        build_results_store(str(results_folder))
+        assert store.is_current()
+
+        # A regenerated sample: its output is now the next sample's
+        with open(results_folder / "1" / "0.json", encoding="utf-8") as f:
+            output = json.load(f)
+        write_sample(str(results_folder / "0"), output, json.load(open(results_folder / "1" / "prompt.json", encoding="utf-8")))
+        assert not store.is_current()
+        assert evaluate(results_folder) == evaluate(shutil.copytree(results_folder, tmp_path / "crawl" / "regenerated", ignore=shutil.ignore_patterns("_results")))
+        build_results_store(str(results_folder))
+
+        # A removed sample
+        shutil.rmtree(results_folder / "100")
+        assert not store.is_current()
+
+    def test_table_without_stamps_is_stale(self, results_folder):
+        build_results_store(str(results_folder))
+        store = ResultsStore(str(results_folder))
+        rows = [{key: value for key, value in row.items() if key != "source_stamp"} for row in store.rows()]
+        store.replace(rows)
+        assert not store.is_current()
@@ -0,0 +1,106 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+# The metrics import their siblings through the repository root (src.metrics); the DS2D fixtures live in dataset_convert
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "src" / "dataset_convert"))
+from src.dataset_convert.rplan_graph import RPLANGraph
+from src.metrics.streaming import StreamingMetricsAggregator
+from test_fixtures import *
+
+FIXTURES = [
+    "sample_ds2d_data",
+    "complex_ds2d_data",
+    "generated_ds2d_data",
+    "double_connection_balcony_ds2d_data",
+    "multiple_doors_ds2d_data",
+]
+
+
+def write_sample(sample_dir, output, prompt):
+    os.makedirs(os.path.join(sample_dir, "analysis"), exist_ok=True)
+    with open(os.path.join(sample_dir, "0.json"), "w", encoding="utf-8") as f:
+        f.write(output if isinstance(output, str) else json.dumps(output))
+    if prompt is not None:
+        with open(os.path.join(sample_dir, "prompt.json"), "w", encoding="utf-8") as f:
+            json.dump(prompt, f)
+    with open(os.path.join(sample_dir, "analysis", "sample.json"), "w", encoding="utf-8") as f:
+        json.dump({"rplan_id": os.path.basename(sample_dir), "room_count": None if prompt is None else prompt["room_count"]}, f)
+
+
+def output_for(plan):
+    """A generated output (schema fields only) with the fixture's rooms"""
+    spaces = [
+        {"id": space.get("id", space["room_type"]), "room_type": space["room_type"],
+         "area": space.get("area", 1.0), "floor_polygon": space["floor_polygon"]}
+        for space in plan["spaces"]
+    ]
+    return {"room_count": plan.get("room_count", 7), "total_area": plan.get("total_area", 80.0), "spaces": spaces}
+
+
+def prompt_for(plan):
+    rooms = [space for space in plan["spaces"] if space["room_type"] != "interior_door"]
+    return {
+        "room_count": len(rooms),
+        "total_area": round(sum(space.get("area", 0) for space in rooms), 2),
+        "spaces": [{"id": space["id"], "room_type": space["room_type"], "area": space.get("area")} for space in rooms],
+        "input_graph": RPLANGraph.from_ds2d(plan).to_labeled_adjacency(),
+    }
+
+
+@pytest.fixture
+def results_folder(tmp_path, request):
+    """
+    A results folder under tmp_path/results/ built from the DS2D fixtures: outputs that match their
+    prompt, outputs scored against a perturbed graph, a prompt graph that cannot be scored (valid
+    output, no score), an invalid output and a missing prompt.
+    """
+    plans = [output_for(request.getfixturevalue(name)) for name in FIXTURES]
+    folder = tmp_path / "results" / "streamed"
+    index = 0
+    for repeat in range(3):
+        for plan in plans:
+            prompt = prompt_for(plan)
+            output = plan
+            if repeat == 1:
+                # Drop one room's edges from the expected graph
+                prompt["input_graph"][next(iter(prompt["input_graph"]))] = []
+            elif repeat == 2 and index % 2:
+                # A neighbor that is not a room: the output is valid but its graph cannot be scored
+                prompt["input_graph"][next(iter(prompt["input_graph"]))] = ["missing_room"]
+            elif repeat == 2:
+                output = {**plan, "spaces": "broken"}
+            write_sample(str(folder / str(index)), output, prompt)
+            index += 1
+    write_sample(str(folder / str(index)), "{not json", None)
+    return folder
+
+
+class TestStreamingMetrics:
+    """Streamed aggregates equal the run_metric scripts' output for the same folder"""
+
+    def run_metric(self, cwd, kind, eval_path):
+        env = dict(os.environ, PYTHONPATH=str(ROOT))
+        subprocess.run([sys.executable, "-m", f"src.metrics.{kind}.run_metric", eval_path, "--no_cache"],
+                       cwd=cwd, env=env, check=True, capture_output=True)
+        with open(os.path.join(cwd, "final_results", os.path.basename(eval_path), f"{kind}.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_payloads_match_run_metric(self, results_folder, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        eval_path = "results/streamed"
+        aggregator = StreamingMetricsAggregator(eval_path, checkpoint_every=1000)
+        records = [aggregator.add(os.path.join(eval_path, name))[1] for name in sorted(os.listdir(eval_path), key=int)]
+
+        # The folder has valid outputs of a reported room count that could not be scored
+        assert any(r["valid"] and r["score"] is None and r["room_count"] in aggregator.room_counts for r in records)
+        assert any(aggregator.successful.values())
+        compatibility = json.loads(json.dumps(aggregator.compatibility_payload()))
+        assert compatibility == self.run_metric(str(tmp_path), "compatibility", eval_path)
+        numerical = json.loads(json.dumps(aggregator.numerical_payload()))
+        assert numerical == self.run_metric(str(tmp_path), "numerical", eval_path)
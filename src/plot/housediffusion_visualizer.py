@@ -78,16 +78,21 @@ class HouseDiffusionVisualizerDS2D:
         This replicates the exact mask processing logic from the original HouseDiffusion system.
         
         Args:
-            filename (str): Path to the my_data_format.json file
+            filename (str or dict): Path to the my_data_format.json file, or the already loaded floorplan dict
             
         Returns:
             list: rooms_data - processed room data in internal format
         """
-        with open(filename, 'r') as f:
-            data = json.load(f)
-        
-        rooms_data = []
+        if isinstance(filename, dict):
+            data = filename
+        else:
+            with open(filename, 'r') as f:
+                data = json.load(f)
         
+        return self.reader_ds2d_batch([data])[0]
+
+    def _room_polygons_px(self, data, im_size):
+        """Room polygons of one plan in mask-image coordinates, with their room ids (same normalization as before)."""
         # Find the bounding box of all spaces to normalize coordinates
         all_x = []
         all_y = []
@@ -113,65 +118,106 @@ class HouseDiffusionVisualizerDS2D:
         center_x = (min_x + max_x) / 2
         center_y = (min_y + max_y) / 2
         
-        # Process each room using the EXACT mask-based approach from original
+        rooms = []
         for room in data['spaces']:
             room_type_str = room['room_type']
             room_id = self.ROOM_TYPE_TO_ID.get(room_type_str, 1)  # Default to living room if unknown
             
-            # Use mask-based approach like the original (exact same as build_graph_and_masks)
-            im_size = 256
-            out_size = 64
-            
-            # Create room mask (exact same as original)
-            room_img = Image.new('L', (im_size, im_size))
-            draw = ImageDraw.Draw(room_img)
-            
             # Convert polygon coordinates to [0,1] then to image coordinates
             polygon_coords = []
             for point in room['floor_polygon']:
-                # Normalize to [0, 1] range
                 norm_x = (point['x'] - center_x) * scale + 0.5
                 norm_y = (point['y'] - center_y) * scale + 0.5
-                # Convert to image coordinates
-                img_x = norm_x * im_size
-                img_y = norm_y * im_size
-                polygon_coords.append((img_x, img_y))
+                polygon_coords.append((norm_x * im_size, norm_y * im_size))
+            rooms.append((polygon_coords, room_id))
+        return rooms
+
+    def reader_ds2d_batch(self, plans, rooms_per_pass=64):
+        """
+        Batched version of reader_ds2d for one or many already loaded plans.
+        
+        Instead of a fresh 256x256 mask per room, the room masks are drawn as vertical tiles of a
+        single image. The 256 -> 64 downscale only resamples a window around each room, the upscale
+        to the output resolution runs once for the whole stack, and contours are then extracted per
+        tile. Masks are drawn at their own origin and pasted into their tile, and rooms stay inside
+        the central 80% of it, so the resampling kernels never mix neighbouring tiles and the
+        contours are identical to the original per-room processing.
+        
+        Args:
+            plans (list): Floorplan dicts (contents of my_data_format.json)
+            rooms_per_pass (int): Maximum number of room tiles rasterized together
             
-            # Draw the polygon to create a mask
-            if len(polygon_coords) >= 3:
-                draw.polygon(polygon_coords, fill='white')
+        Returns:
+            list: rooms_data per plan, as returned by reader_ds2d
+        """
+        im_size = 256
+        out_size = 64
+        
+        rooms = []
+        for plan_idx, data in enumerate(plans):
+            for polygon_coords, room_id in self._room_polygons_px(data, im_size):
+                rooms.append((plan_idx, polygon_coords, room_id))
+        
+        results = [[] for _ in plans]
+        for start in range(0, len(rooms), rooms_per_pass):
+            chunk = rooms[start:start + rooms_per_pass]
             
-            # Apply the exact same processing as original
-            room_img = room_img.resize((out_size, out_size))
-            room_array = np.array(room_img)
+            # Draw every room mask into its own tile of one tall image. Each mask is drawn at its
+            # own origin, as before, and pasted: shifting the float coordinates by the tile offset
+            # would change how they round to pixels.
+            tiles_img = Image.new('L', (im_size, im_size * len(chunk)))
+            mask_img = Image.new('L', (im_size, im_size))
+            draw = ImageDraw.Draw(mask_img)
+            for tile, (_, polygon_coords, _) in enumerate(chunk):
+                if len(polygon_coords) >= 3:
+                    draw.rectangle((0, 0, im_size, im_size), fill=0)
+                    draw.polygon(polygon_coords, fill='white')
+                    tiles_img.paste(mask_img, (0, tile * im_size))
             
-            # Find contours to get clean polygons (exact same as original)
-            room_array = room_array.astype(np.uint8)
-            room_array = cv.resize(room_array, (self.resolution, self.resolution), interpolation=cv.INTER_AREA)
-            contours, _ = cv.findContours(room_array, cv.RETR_TREE, cv.CHAIN_APPROX_SIMPLE)
+            # Apply the exact same processing as original. The bicubic downscale only needs to run
+            # around each room: output pixels whose kernel window is empty are zero anyway.
+            factor = im_size // out_size
+            pad = 3  # bicubic support (2 output pixels) plus rounding slack
+            tiles = np.zeros((out_size * len(chunk), out_size), dtype=np.uint8)
+            for tile, (_, polygon_coords, _) in enumerate(chunk):
+                if len(polygon_coords) < 3:
+                    continue
+                xs = [x for x, _ in polygon_coords]
+                ys = [y for _, y in polygon_coords]
+                x0 = min(max(int(np.floor(min(xs) / factor)) - pad, 0), out_size)
+                x1 = min(max(int(np.ceil(max(xs) / factor)) + pad, 0), out_size)
+                y0 = min(max(int(np.floor(min(ys) / factor)) - pad, 0), out_size)
+                y1 = min(max(int(np.ceil(max(ys) / factor)) + pad, 0), out_size)
+                if x0 >= x1 or y0 >= y1:
+                    continue
+                offset = tile * out_size
+                box = (x0 * factor, (y0 + offset) * factor, x1 * factor, (y1 + offset) * factor)
+                tiles[offset + y0:offset + y1, x0:x1] = np.array(tiles_img.resize((x1 - x0, y1 - y0), box=box))
+            tiles = cv.resize(tiles, (self.resolution, self.resolution * len(chunk)), interpolation=cv.INTER_AREA)
             
-            if contours:
-                # Take the largest contour
-                largest_contour = max(contours, key=cv.contourArea)
-                # Convert contour to polygon coordinates normalized to [-1, 1] like the model output
-                polygon_coords = largest_contour[:, 0, :].astype(float) / self.resolution * 2 - 1
-                rooms_data.append([polygon_coords, room_id])
-        
-        return rooms_data
+            for tile, (plan_idx, _, room_id) in enumerate(chunk):
+                room_array = tiles[tile * self.resolution:(tile + 1) * self.resolution]
+                contours, _ = cv.findContours(room_array, cv.RETR_TREE, cv.CHAIN_APPROX_SIMPLE)
+                
+                if contours:
+                    # Take the largest contour
+                    largest_contour = max(contours, key=cv.contourArea)
+                    # Convert contour to polygon coordinates normalized to [-1, 1] like the model output
+                    polygon = largest_contour[:, 0, :].astype(float) / self.resolution * 2 - 1
+                    results[plan_idx].append([polygon, room_id])
+        
+        return results
     
-    def visualize_floorplan_ds2d(self, filename, save_path=None, save_svg=False, show_edges=False):
+    def build_drawing_ds2d(self, filename, show_edges=False):
         """
-        Visualize floorplan from DS2D format JSON file.
-        Uses the same visualization logic as the original HouseDiffusion system.
+        Build the HouseDiffusion-style SVG drawing of a DS2D floorplan without rasterizing it.
         
         Args:
-            filename (str): Path to the my_data_format.json file
-            save_path (str, optional): Path to save the output image
-            save_svg (bool): Whether to save as SVG format as well
+            filename (str or dict): Path to the my_data_format.json file, or the already loaded floorplan dict
             show_edges (bool): Whether to show corner points/edges
             
         Returns:
-            PIL.Image: The generated floorplan image
+            drawsvg.Drawing: The colored floorplan drawing, or None if no spaces were found
         """
         # Read and process the DS2D data
         spaces = self.reader_ds2d(filename)
@@ -265,6 +311,52 @@ class HouseDiffusionVisualizerDS2D:
         # print(f"Rooms: {room_counts}")
         # print(f"Doors/Walls: {door_counts}")
         
+        return draw_color
+
+    def drawing_to_image(self, draw_color):
+        """
+        Rasterize a drawing in memory with cairosvg.
+        
+        Returns:
+            PIL.Image: The rasterized floorplan image
+        """
+        svg_bytes = cairosvg.svg2png(draw_color.asSvg())
+        return Image.open(io.BytesIO(svg_bytes))
+
+    def render_array_ds2d(self, filename, show_edges=False):
+        """
+        Render a DS2D floorplan straight to an RGB array, without touching the disk.
+        
+        Args:
+            filename (str or dict): Path to the my_data_format.json file, or the already loaded floorplan dict
+            show_edges (bool): Whether to show corner points/edges
+            
+        Returns:
+            np.ndarray: (resolution, resolution, 3) uint8 image, or None if no spaces were found
+        """
+        draw_color = self.build_drawing_ds2d(filename, show_edges=show_edges)
+        if draw_color is None:
+            return None
+        return np.asarray(self.drawing_to_image(draw_color).convert('RGB'))
+
+    def visualize_floorplan_ds2d(self, filename, save_path=None, save_svg=False, show_edges=False):
+        """
+        Visualize floorplan from DS2D format JSON file.
+        Uses the same visualization logic as the original HouseDiffusion system.
+        
+        Args:
+            filename (str or dict): Path to the my_data_format.json file, or the already loaded floorplan dict
+            save_path (str, optional): Path to save the output image
+            save_svg (bool): Whether to save as SVG format as well
+            show_edges (bool): Whether to show corner points/edges
+            
+        Returns:
+            PIL.Image: The generated floorplan image
+        """
+        draw_color = self.build_drawing_ds2d(filename, show_edges=show_edges)
+        if draw_color is None:
+            return None
+
         # Convert to image and save (enhanced with both SVG and PNG)
         if save_path:
             if save_svg:
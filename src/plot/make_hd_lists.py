@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import json
 from pathlib import Path
+from src.metrics.results_store import ResultsStore
 
 ROOT = Path(__file__).resolve().parents[2]
 RESULTS_DIR = ROOT / "results" / "results8_GRPO_70B"
@@ -16,6 +17,17 @@ def collect(results_dir: Path) -> tuple[list[str], dict[str, str]]:
     if not results_dir.exists():
         return rplan_ids, folder_to_rplan
 
+    store = ResultsStore(str(results_dir))
+    if store.is_current():
+        rows = store.rows(columns=["index", "rplan_id"])
+        # Same order as the directory walk below (folder names sorted as strings)
+        for row in sorted(rows, key=lambda r: str(r["index"])):
+            if row["rplan_id"]:
+                rid = str(row["rplan_id"])
+                rplan_ids.append(rid)
+                folder_to_rplan[str(row["index"])] = rid
+        return rplan_ids, folder_to_rplan
+
     for entry in sorted(results_dir.iterdir(), key=lambda p: (p.is_file(), p.name)):
         if not entry.is_dir():
             continue
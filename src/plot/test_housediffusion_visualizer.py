@@ -0,0 +1,98 @@
+import copy
+import json
+import random
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "src" / "dataset_convert"))
+# The drawing methods need drawSvg and cairosvg at import; the readers only use PIL and OpenCV
+pytest.importorskip("drawSvg")
+pytest.importorskip("cairosvg")
+import cv2 as cv
+from PIL import Image, ImageDraw
+from src.plot.housediffusion_visualizer import HouseDiffusionVisualizerDS2D
+from test_fixtures import *
+
+FIXTURES = [
+    "sample_ds2d_data",
+    "complex_ds2d_data",
+    "generated_ds2d_data",
+    "double_connection_balcony_ds2d_data",
+    "containment_issue_ds2d_data",
+    "multiple_doors_ds2d_data",
+    "floating_interior_door_data",
+]
+
+RESOLUTIONS = [64, 128, 256, 512]
+
+
+def per_room_reader(visualizer, data):
+    """The original reader_ds2d: a fresh 256x256 mask per room, downscaled to 64 and upscaled to the resolution"""
+    im_size, out_size = 256, 64
+    rooms_data = []
+    for polygon_coords, room_id in visualizer._room_polygons_px(data, im_size):
+        room_img = Image.new('L', (im_size, im_size))
+        if len(polygon_coords) >= 3:
+            ImageDraw.Draw(room_img).polygon(polygon_coords, fill='white')
+        room_array = np.array(room_img.resize((out_size, out_size))).astype(np.uint8)
+        room_array = cv.resize(room_array, (visualizer.resolution, visualizer.resolution), interpolation=cv.INTER_AREA)
+        contours, _ = cv.findContours(room_array, cv.RETR_TREE, cv.CHAIN_APPROX_SIMPLE)
+        if contours:
+            largest_contour = max(contours, key=cv.contourArea)
+            rooms_data.append([largest_contour[:, 0, :].astype(float) / visualizer.resolution * 2 - 1, room_id])
+    return rooms_data
+
+
+def jittered(plan, rng):
+    """A copy of the plan with sub-pixel vertex offsets, so polygon edges round to pixels in every way"""
+    plan = copy.deepcopy(plan)
+    for space in plan["spaces"]:
+        for point in space["floor_polygon"]:
+            point["x"] += rng.uniform(-0.3, 0.3) * rng.random()
+            point["y"] += rng.uniform(-0.3, 0.3) * rng.random()
+    return plan
+
+
+def assert_same_rooms(expected, actual):
+    assert len(actual) == len(expected)
+    for (expected_polygon, expected_id), (polygon, room_id) in zip(expected, actual):
+        assert room_id == expected_id
+        np.testing.assert_array_equal(polygon, expected_polygon)
+
+
+@pytest.fixture
+def plans(request):
+    rng = random.Random(0)
+    fixtures = [request.getfixturevalue(name) for name in FIXTURES]
+    return fixtures + [jittered(plan, rng) for plan in fixtures for _ in range(3)]
+
+
+class TestReaderDS2DBatch:
+    """The batched reader returns exactly the contours of the per-room one"""
+
+    @pytest.mark.parametrize("resolution", RESOLUTIONS)
+    def test_batch_matches_per_room(self, plans, resolution):
+        visualizer = HouseDiffusionVisualizerDS2D(resolution=resolution)
+        expected = [per_room_reader(visualizer, plan) for plan in plans]
+        assert any(expected)
+        # Passes that hold many rooms, a few rooms (tiles of different plans share a pass) and one room
+        for rooms_per_pass in (64, 5, 1):
+            batched = visualizer.reader_ds2d_batch(plans, rooms_per_pass=rooms_per_pass)
+            assert len(batched) == len(plans)
+            for expected_rooms, rooms in zip(expected, batched):
+                assert_same_rooms(expected_rooms, rooms)
+
+    def test_single_plan_matches_per_room(self, plans, tmp_path):
+        visualizer = HouseDiffusionVisualizerDS2D()
+        path = tmp_path / "plan.json"
+        path.write_text(json.dumps(plans[1]))
+        assert_same_rooms(per_room_reader(visualizer, plans[1]), visualizer.reader_ds2d(plans[1]))
+        assert_same_rooms(per_room_reader(visualizer, plans[1]), visualizer.reader_ds2d(str(path)))
+
+    def test_empty_plans(self):
+        visualizer = HouseDiffusionVisualizerDS2D()
+        assert visualizer.reader_ds2d_batch([{"spaces": []}, {"spaces": []}]) == [[], []]
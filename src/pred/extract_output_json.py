@@ -1,14 +1,17 @@
 import json
 from src.utils import repair_json
+from src.utils.compact_format import expand_floorplan
 
-def extract_output_json(input_str: str):
+def extract_output_json(input_str: str, compact: bool = False):
     """
     Extracts and returns a JSON object from the input string by locating the assistant marker.
     The function searches for the string "assistant" and extracts all text following it.
     It then attempts to parse the extracted substring as JSON. If parsing fails, it calls repair_json.
     If the resulting JSON is wrapped in an "output" key, it returns that value.
+    With compact=True, [x, y] fixed-point vertices of the compact encoding are expanded back to {x, y} in meters.
     
     :param input_str: The string containing the assistant output.
+    :param compact: Whether the output uses the compact encoding (see src.utils.compact_format).
     :return: The parsed JSON object (or the value of the "output" key if present), 
              or an empty dict if parsing fails.
     """
@@ -30,10 +33,10 @@ def extract_output_json(input_str: str):
             parsed_json = {}
 
     if isinstance(parsed_json, dict) and "output" in parsed_json:
-        return parsed_json["output"]
+        parsed_json = parsed_json["output"]
     elif isinstance(parsed_json, dict) and "floor_plan" in parsed_json:
-        return parsed_json["floor_plan"]
+        parsed_json = parsed_json["floor_plan"]
     elif isinstance(parsed_json, list):
-        return {"rooms": parsed_json}
+        parsed_json = {"rooms": parsed_json}
     
-    return parsed_json
+    return expand_floorplan(parsed_json) if compact else parsed_json
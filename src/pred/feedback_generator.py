@@ -4,6 +4,7 @@ from src.dataset_convert.rplan_graph import RPLANGraph
 from src.utils.constants import OVERLAP_TOL
 from src.utils.json_check.verify import is_valid_json, is_valid_json_feedback
 import json
+import math
 from shapely.ops import unary_union
 import traceback
 
@@ -136,9 +137,9 @@ class FeedbackGenerator:
         return feedback
     
     @staticmethod
-    def grpo_feedback(output_floor_plan, input_prompt, round_digits: int = 4):
+    def grpo_feedback(output_floor_plan, input_prompt, round_digits: int = 4, compact: bool = False):
         try:
-            output_floor_plan = extract_output_json(output_floor_plan)
+            output_floor_plan = extract_output_json(output_floor_plan, compact)
             input_graph_json = json.loads(input_prompt.get("input_graph", "{}"))
             
             polygons_overlap = {}
@@ -191,9 +192,10 @@ class FeedbackGenerator:
             else:
                 total_area_ratio = 0
 
-            input_graph = RPLANGraph.from_labeled_adjacency(input_graph_json)
-            output_graph = RPLANGraph.from_ds2d(output_floor_plan)
-            compatibility_score = output_graph.compatibility_score_scaled(input_graph)
+            scores, _ = RPLANGraph.batch_compatibility([output_floor_plan], [input_graph_json], scaled=True)
+            compatibility_score = scores[0].item()
+            if math.isnan(compatibility_score):
+                return {"is_valid_json": False}
 
 #             print(f"""
 # {'='*60}
@@ -1,4 +1,5 @@
 import ast
+import math
 import os
 import json
 from tqdm import tqdm
@@ -7,6 +8,9 @@ from src.dataset_convert.rplan_graph import RPLANGraph
 from src.utils import build_prompt
 from src.pred.feedback_generator import FeedbackGenerator
 from src.pred.extract_output_json import extract_output_json
+from src.metrics.results_rows import sample_row
+from src.metrics.results_store import ResultsStore
+from src.metrics.streaming import StreamingMetricsAggregator
 from datasets import load_from_disk
 from vllm import LLM, SamplingParams
 from vllm.lora.request import LoRARequest
@@ -26,7 +30,11 @@ class FloorplanGenerator:
         batch_size=32,
         device="cuda",
         output_dir="outputs",
-        use_sampling=True
+        use_sampling=True,
+        results_store=False,
+        stream_metrics=False,
+        checkpoint_every=100,
+        compact=False
     ):
         self.model_name_or_path = model_name_or_path
         self.enable_lora = lora_adapter_path
@@ -37,6 +45,11 @@ class FloorplanGenerator:
         self.batch_size = batch_size
         self.device = device
         self.output_dir = output_dir
+        self.results_store = results_store
+        self.stream_metrics = stream_metrics
+        self.checkpoint_every = checkpoint_every
+        # Prompts and generations use the compact floorplan encoding (see src.utils.compact_format)
+        self.compact = compact
         self.test_range_start = 0
 
         self.model = LLM(
@@ -89,42 +102,55 @@ class FloorplanGenerator:
         2. Minimum total_overlap_area 
         3. Minimum compatibility_score
         """
-        def _evaluate_candidate(candidate):
+        keys = []
+        scored = []
+        for idx, candidate in enumerate(candidates):
             # First priority: JSON validity
             try:
-                output_json = extract_output_json(candidate.text)
+                output_json = extract_output_json(candidate.text, self.compact)
                 if not output_json:  # Invalid or empty JSON
-                    return (1, float('inf'), float('inf'))
+                    keys.append((1, float('inf'), float('inf')))
+                    continue
                 json_invalid = 0
             except Exception:
-                return (1, float('inf'), float('inf'))  
-            
+                keys.append((1, float('inf'), float('inf')))
+                continue
+
             # Second priority: total overlap area
             try:
                 analysis = FeedbackGenerator.analyze(output_json, input_prompt)
                 overlap_area = analysis.get('total_overlap_area', float('inf'))
             except Exception:
                 overlap_area = float('inf')
-            
-            # Third priority: compatibility score
+
+            keys.append((json_invalid, overlap_area, float('inf')))
+            scored.append((idx, output_json))
+
+        # Third priority: compatibility score, computed for all parsed candidates in one batch
+        if scored:
             try:
-                input_graph = RPLANGraph.from_ds2d(output_json)
-                expected_graph = RPLANGraph.from_labeled_adjacency(
-                    input_prompt.get("input_graph", {})
-                )
-                compatibility_score = input_graph.compatibility_score(expected_graph)
+                expected = input_prompt.get("input_graph", {})
+                scores, _ = RPLANGraph.batch_compatibility([output_json for _, output_json in scored], [expected] * len(scored))
+                for (idx, _), score in zip(scored, scores.tolist()):
+                    if not math.isnan(score):
+                        keys[idx] = keys[idx][:2] + (int(score),)
             except Exception:
-                compatibility_score = float('inf')
-            
-            return (json_invalid, overlap_area, compatibility_score)
-        
-        return min(candidates, key=_evaluate_candidate)
+                pass
+
+        return candidates[min(range(len(candidates)), key=keys.__getitem__)]
 
     def generate_floorplans(self):
+        store_rows = []
+        # One part per test range, so jobs over different ranges can share an output_dir
+        part = f"{self.test_range_start}-{self.test_range_start + self.total_examples}"
+        aggregator = None
+        if self.stream_metrics:
+            aggregator = StreamingMetricsAggregator(self.output_dir, part=part, checkpoint_every=self.checkpoint_every)
+
         for i in tqdm(range(0, self.total_examples, self.batch_size), desc="Generating floorplans"):
             raw_batch = self.dataset[i: i + self.batch_size]
             samples = [dict(zip(raw_batch.keys(), t)) for t in zip(*raw_batch.values())]
-            batch_prompts = [build_prompt(sample) for sample in samples]
+            batch_prompts = [build_prompt(sample, compact=self.compact) for sample in samples]
 
             outputs = self.model.generate(
                 batch_prompts,
@@ -136,13 +162,13 @@ class FloorplanGenerator:
                 input_prompt = ast.literal_eval(sample.get("prompt", "{}"))
                 input_prompt = input_prompt["input"]
                 if self.use_sampling:
-                    output_json = self._select_least(outputs[idx].outputs, input_prompt)
-                    output_json = extract_output_json(output_json.text)
+                    generated_text = self._select_least(outputs[idx].outputs, input_prompt)
                 else:
                     generated_text = outputs[idx].outputs[0]
-                    output_json = extract_output_json(generated_text.text)
+                output_json = extract_output_json(generated_text.text, self.compact)
 
-                sample_dir = os.path.join(self.output_dir, str(i + idx + self.test_range_start))
+                sample_index = i + idx + self.test_range_start
+                sample_dir = os.path.join(self.output_dir, str(sample_index))
                 os.makedirs(sample_dir, exist_ok=True)
 
                 ground_truth_dir = os.path.join(sample_dir, "analysis")
@@ -154,3 +180,13 @@ class FloorplanGenerator:
                     json.dump(sample, f, indent=4)
                 with open(os.path.join(sample_dir, f"0.json"), "w", encoding="utf-8") as f:
                     json.dump(output_json, f, indent=4)
+
+                numerical, compatibility = aggregator.add(sample_dir) if aggregator else (None, None)
+                if self.results_store:
+                    store_rows.append(sample_row(sample_index, sample_dir, completion=generated_text.text,
+                                                 numerical=numerical, compatibility=compatibility))
+
+        if self.results_store:
+            ResultsStore(self.output_dir).write(store_rows, part=part)
+        if aggregator:
+            aggregator.finalize()
@@ -1,10 +1,12 @@
 import ast
+import math
 import os
 import json
 from tqdm import tqdm
 from dotenv import load_dotenv
 from src.dataset_convert.rplan_graph import RPLANGraph
-from src.utils.constants import SYSTEM_PROMPT
+from src.utils.constants import SYSTEM_PROMPT, SYSTEM_PROMPT_COMPACT
+from src.utils.compact_format import compact_prompt_text
 from src.pred.feedback_generator import FeedbackGenerator
 from src.pred.extract_output_json import extract_output_json
 from datasets import load_from_disk
@@ -33,7 +35,8 @@ class FloorplanGenerator:
         output_dir="outputs",
         use_sampling=True,
         few_shot_text=None,
-        few_shot_path=None
+        few_shot_path=None,
+        compact=False
     ):
         self.model_name_or_path = model_name_or_path
         self.enable_lora = lora_adapter_path
@@ -44,6 +47,8 @@ class FloorplanGenerator:
         self.batch_size = batch_size
         self.device = device
         self.output_dir = output_dir
+        # Prompts and generations use the compact floorplan encoding (see src.utils.compact_format)
+        self.compact = compact
         self.test_range_start = 0
 
         resolved_few_shot = None
@@ -109,46 +114,54 @@ class FloorplanGenerator:
         2. Minimum total_overlap_area 
         3. Minimum compatibility_score
         """
-        def _evaluate_candidate(candidate):
+        keys = []
+        scored = []
+        for idx, candidate in enumerate(candidates):
             # First priority: JSON validity
             try:
-                output_json = extract_output_json(candidate.text)
+                output_json = extract_output_json(candidate.text, self.compact)
                 if not output_json:  # Invalid or empty JSON
-                    return (1, float('inf'), float('inf'))
+                    keys.append((1, float('inf'), float('inf')))
+                    continue
                 json_invalid = 0
             except Exception:
-                return (1, float('inf'), float('inf'))  
-            
+                keys.append((1, float('inf'), float('inf')))
+                continue
+
             # Second priority: total overlap area
             try:
                 analysis = FeedbackGenerator.analyze(output_json, input_prompt)
                 overlap_area = analysis.get('total_overlap_area', float('inf'))
             except Exception:
                 overlap_area = float('inf')
-            
-            # Third priority: compatibility score
+
+            keys.append((json_invalid, overlap_area, float('inf')))
+            scored.append((idx, output_json))
+
+        # Third priority: compatibility score, computed for all parsed candidates in one batch
+        if scored:
             try:
-                input_graph = RPLANGraph.from_ds2d(output_json)
-                expected_graph = RPLANGraph.from_labeled_adjacency(
-                    input_prompt.get("input_graph", {})
-                )
-                compatibility_score = input_graph.compatibility_score(expected_graph)
+                expected = input_prompt.get("input_graph", {})
+                scores, _ = RPLANGraph.batch_compatibility([output_json for _, output_json in scored], [expected] * len(scored))
+                for (idx, _), score in zip(scored, scores.tolist()):
+                    if not math.isnan(score):
+                        keys[idx] = keys[idx][:2] + (int(score),)
             except Exception:
-                compatibility_score = float('inf')
-            
-            return (json_invalid, overlap_area, compatibility_score)
-        
-        return min(candidates, key=_evaluate_candidate)
+                pass
+
+        return candidates[min(range(len(candidates)), key=keys.__getitem__)]
 
     def _build_prompt(self, sample):
         user_payload = sample.get("prompt", "{}")
         if isinstance(user_payload, bytes):
             user_payload = user_payload.decode("utf-8", errors="ignore")
+        if self.compact:
+            user_payload = compact_prompt_text(user_payload)
         if self.few_shot_text:
             user_payload = f"{self.few_shot_text}\n{user_payload}"
         prompt = (
             f"<|begin_of_text|><|start_header_id|>system<|end_header_id|>\n"
-            f"{SYSTEM_PROMPT}<|eot_id|><|start_header_id|>user<|end_header_id|>\n"
+            f"{SYSTEM_PROMPT_COMPACT if self.compact else SYSTEM_PROMPT}<|eot_id|><|start_header_id|>user<|end_header_id|>\n"
             f"{user_payload}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n"
         )
         return prompt
@@ -170,10 +183,10 @@ class FloorplanGenerator:
                 input_prompt = input_prompt["input"]
                 if self.use_sampling:
                     output_json = self._select_least(outputs[idx].outputs, input_prompt)
-                    output_json = extract_output_json(output_json.text)
+                    output_json = extract_output_json(output_json.text, self.compact)
                 else:
                     generated_text = outputs[idx].outputs[0]
-                    output_json = extract_output_json(generated_text.text)
+                    output_json = extract_output_json(generated_text.text, self.compact)
 
                 sample_dir = os.path.join(self.output_dir, str(i + idx + self.test_range_start))
                 os.makedirs(sample_dir, exist_ok=True)
@@ -14,6 +14,10 @@ def parse_arguments():
     parser.add_argument("--device", type=str, default="cuda")
     parser.add_argument("--output_dir", type=str, default="results_feedback/generations/rplan_3_70B/full_prompt", help="Directory to store the generated outputs")
     parser.add_argument("--use_sampling", action="store_true", help="Whether to use sampling mode")
+    parser.add_argument("--results_store", action="store_true", help="Also write generations and per-sample metrics to the columnar results table")
+    parser.add_argument("--stream_metrics", action="store_true", help="Aggregate numerical/compatibility metrics while generating and write numerical.json/compatibility.json at the end")
+    parser.add_argument("--checkpoint_every", type=int, default=100, help="Checkpoint streaming metrics every N samples")
+    parser.add_argument("--compact", action="store_true", help="Prompt for and parse the compact floorplan encoding")
     return parser.parse_args()
 
 def main():
@@ -35,7 +39,11 @@ def main():
         batch_size=args.batch_size,
         device=args.device,
         output_dir=args.output_dir,
-        use_sampling=use_sampling
+        use_sampling=use_sampling,
+        results_store=args.results_store,
+        stream_metrics=args.stream_metrics,
+        checkpoint_every=args.checkpoint_every,
+        compact=args.compact
     )
     generator.generate_floorplans()
 
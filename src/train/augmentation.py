@@ -0,0 +1,151 @@
+import json
+import os
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+# Converted coordinates are meters with 2 decimals (rplan.py round_value) inside the 18m × 18m house;
+# transforms are done on the 0.01m integer grid so augmented coordinates stay exactly on it
+COORD_SCALE = 100
+HOUSE_EXTENT = 18.0
+
+# The 8 symmetries of the square: rotation by k * 90° (k = index % 4), followed by a flip of x for index >= 4
+_ROTATIONS = np.array([[[1, 0], [0, 1]], [[0, -1], [1, 0]], [[-1, 0], [0, -1]], [[0, 1], [-1, 0]]], dtype=np.int64)
+_FLIP_X = np.array([[-1, 0], [0, 1]], dtype=np.int64)
+DIHEDRAL = np.concatenate([_ROTATIONS, _FLIP_X @ _ROTATIONS])
+
+
+def _swap_extent(room: Dict[str, Any]) -> Dict[str, Any]:
+    if "width" not in room and "height" not in room:
+        return room
+    swapped = dict(room)
+    swapped["width"], swapped["height"] = room.get("height"), room.get("width")
+    return swapped
+
+
+class FloorplanAugmenter:
+    """
+    Random geometric augmentation of batches of converted samples (columns as in rplan.py), for
+    Dataset.with_transform / set_transform.
+
+    Every sample gets a random rotation by a multiple of 90° and a random flip, applied to all
+    floor_polygon vertices of the batch at once, then a random translation that keeps the plan inside
+    the house extent, and its spaces in a random order. Polygons keep their winding (flipped ones are
+    walked the other way around). Width and height are swapped on quarter turns, in the spaces and in
+    the prompt, whose rooms follow the new space order; areas, the room count, the total area and the
+    graph are unchanged by these transforms.
+
+    The random generator is created per process (seeded with seed and the process id when a seed is
+    given), so data-loader workers do not repeat each other's augmentations.
+    """
+
+    def __init__(self, rotate: bool = True, flip: bool = True, translate: bool = True,
+                 shuffle_rooms: bool = True, extent: float = HOUSE_EXTENT, seed: Optional[int] = None):
+        self.rotate = rotate
+        self.flip = flip
+        self.translate = translate
+        self.shuffle_rooms = shuffle_rooms
+        self.extent = int(round(extent * COORD_SCALE))
+        self.seed = seed
+        self._rng = None
+        self._pid = None
+
+    @property
+    def rng(self) -> np.random.Generator:
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._rng = np.random.default_rng(None if self.seed is None else [self.seed, self._pid])
+        return self._rng
+
+    def transform_polygons(self, spaces_batch: List[List[Dict[str, Any]]], symmetries: np.ndarray) -> List[List[Dict[str, Any]]]:
+        """
+        Apply DIHEDRAL[symmetries[i]] and a random translation to every vertex of sample i. The vertices
+        of flipped samples (symmetry index >= 4) are reversed, so every polygon keeps its winding.
+        """
+        counts = [sum(len(space.get("floor_polygon") or []) for space in spaces) for spaces in spaces_batch]
+        points = np.array(
+            [[vertex["x"], vertex["y"]] for spaces in spaces_batch for space in spaces for vertex in space.get("floor_polygon") or []],
+            dtype=np.float64,
+        ).reshape(-1, 2)
+        points = np.rint(points * COORD_SCALE).astype(np.int64)
+        owner = np.repeat(np.arange(len(spaces_batch)), counts)
+        moved = np.einsum("nij,nj->ni", DIHEDRAL[symmetries][owner], points)
+
+        # Bounding box of every sample before and after the symmetry
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+        old_min = np.zeros((len(spaces_batch), 2), dtype=np.int64)
+        new_min = np.zeros((len(spaces_batch), 2), dtype=np.int64)
+        new_max = np.zeros((len(spaces_batch), 2), dtype=np.int64)
+        if len(nonempty):
+            old_min[nonempty] = np.minimum.reduceat(points, starts)
+            new_min[nonempty] = np.minimum.reduceat(moved, starts)
+            new_max[nonempty] = np.maximum.reduceat(moved, starts)
+        if self.translate:
+            slack = np.maximum(self.extent - (new_max - new_min), 0)
+            target_min = self.rng.integers(0, slack + 1)
+        else:
+            # Keep the plan where it was
+            target_min = old_min
+        moved += (target_min - new_min)[owner]
+        coords = (moved / COORD_SCALE).tolist()
+
+        flipped = (np.asarray(symmetries) >= 4).tolist()
+        augmented, offset = [], 0
+        for spaces, flip in zip(spaces_batch, flipped):
+            sample_spaces = []
+            for space in spaces:
+                n = len(space.get("floor_polygon") or [])
+                polygon = [{"x": x, "y": y} for x, y in coords[offset:offset + n]]
+                offset += n
+                if flip:
+                    # A flip turns clockwise rings counter-clockwise; walking back restores the winding
+                    polygon.reverse()
+                sample_spaces.append({**space, "floor_polygon": polygon} if n else dict(space))
+            augmented.append(sample_spaces)
+        return augmented
+
+    def _augment_prompt(self, prompt: str, spaces: List[Dict[str, Any]], quarter_turn: bool, reordered: bool) -> str:
+        if not quarter_turn and not reordered:
+            return prompt
+        try:
+            data = json.loads(prompt)
+            rooms = data["input"]["spaces"]
+        except (TypeError, ValueError, KeyError):
+            return prompt
+        if quarter_turn:
+            rooms = [_swap_extent(room) for room in rooms]
+        if reordered:
+            by_id = {room.get("id"): room for room in rooms}
+            order = [space.get("id") for space in spaces if space.get("id") in by_id]
+            # Rooms follow the space order; keep the original order when ids are not unique
+            if len(by_id) == len(rooms) and len(set(order)) == len(rooms):
+                rooms = [by_id[room_id] for room_id in order]
+        data["input"]["spaces"] = rooms
+        return json.dumps(data)
+
+    def __call__(self, batch: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+        spaces_batch = batch.get("spaces")
+        if not spaces_batch:
+            return batch
+        n = len(spaces_batch)
+        rotations = self.rng.integers(0, 4, size=n) if self.rotate else np.zeros(n, dtype=np.int64)
+        flips = self.rng.integers(0, 2, size=n) if self.flip else np.zeros(n, dtype=np.int64)
+        spaces_batch = self.transform_polygons(spaces_batch, rotations + 4 * flips)
+
+        quarter_turns = (rotations % 2 == 1).tolist()
+        augmented_spaces = []
+        for spaces, quarter_turn in zip(spaces_batch, quarter_turns):
+            if quarter_turn:
+                spaces = [_swap_extent(space) for space in spaces]
+            if self.shuffle_rooms and len(spaces) > 1:
+                spaces = [spaces[i] for i in self.rng.permutation(len(spaces))]
+            augmented_spaces.append(spaces)
+
+        augmented = dict(batch)
+        augmented["spaces"] = augmented_spaces
+        if "prompt" in batch:
+            augmented["prompt"] = [
+                self._augment_prompt(prompt, spaces, quarter_turn, self.shuffle_rooms)
+                for prompt, spaces, quarter_turn in zip(batch["prompt"], augmented_spaces, quarter_turns)
+            ]
+        return augmented
@@ -1,36 +1,201 @@
+import hashlib
+import os
 from datasets import load_from_disk
 # from utils.constants import SYSTEM_PROMPT
 # from utils import create_input, create_output
 from utils import create_output, build_prompt
-import random
-
-def shuffle_rooms(example):
-    if "rooms" in example:
-        example["rooms"] = random.sample(example["rooms"], k=len(example["rooms"]))
-    return example
-
-def get_custom_dataset(dataset_config, tokenizer, split):
-    dataset = load_from_disk(dataset_config.data_path)[split]
-    dataset = dataset.shuffle(seed=84)
-    dataset = dataset.with_transform(shuffle_rooms)
-
-    def process_sample(sample):
-        prompt = build_prompt(sample)
-        
-        prompt_tokens = tokenizer(prompt, add_special_tokens=False)
-        
-        response = f"{create_output(sample)}<|eot_id|>"
-        response_tokens = tokenizer(response, add_special_tokens=False)
-        
-        input_ids = prompt_tokens['input_ids'] + response_tokens['input_ids']
-        attention_mask = [1] * len(input_ids)
-        
-        labels = [-100] * len(prompt_tokens['input_ids']) + response_tokens['input_ids']
-        
+from utils.compact_format import compact_prompt_text
+from utils.disk_cache import tokenizer_fingerprint, write_atomic
+from sft_packing import FloorplanCollator, example_lengths, pack_dataset
+from augmentation import FloorplanAugmenter
+
+# Bump whenever the tokenized example layout changes, so cached tokenized datasets are rebuilt
+TOKENIZED_VERSION = "1"
+
+DEFAULT_TOKENIZED_CACHE_DIR = "datasets/.tokenized_cache"
+
+SHUFFLE_SEED = 84
+
+# Tokens per packed block (the training --context_length)
+DEFAULT_BLOCK_SIZE = 6144
+
+# Stands in for the user prompt when splitting the chat template into its constant parts
+_PROMPT_SENTINEL = "\0PROMPT\0"
+
+def _template_parts(compact):
+    """The chat template around the user prompt: (constant head, per-sample carry, constant tail)."""
+    prefix, suffix = build_prompt({"prompt": _PROMPT_SENTINEL}, compact=compact).split(_PROMPT_SENTINEL)
+    # Split after the last header marker, where tokenization always breaks; the rest of the
+    # prefix (the newline) is tokenized together with each user prompt
+    head_end = prefix.rindex(">") + 1
+    return prefix[:head_end], prefix[head_end:], suffix
+
+def _cache_key(dataset, tokenizer, split, compact):
+    """Hash of the tokenizer, the chat/target templates and the source split's content."""
+    h = hashlib.sha256(f"{TOKENIZED_VERSION}|{split}|{compact}|{SHUFFLE_SEED}|{dataset._fingerprint}".encode("utf-8"))
+    h.update(tokenizer_fingerprint(tokenizer).encode("utf-8"))
+    h.update("".join(_template_parts(compact)).encode("utf-8"))
+    if len(dataset):
+        h.update(create_output(dataset[0], compact=compact).encode("utf-8"))
+    return h.hexdigest()
+
+def _batch_tokenizer(tokenizer, compact=False):
+    """
+    Function tokenizing a batch of samples into input_ids / attention_mask / labels (prompt tokens masked with -100).
+
+    Batches go through the fast tokenizer at once, and the constant system-prompt head of the chat
+    template is tokenized a single time and prepended. The split is checked against whole-prompt
+    tokenization on the first batch; with a tokenizer where it does not hold, whole prompts are tokenized.
+    """
+    head, carry, tail = _template_parts(compact)
+    head_ids = tokenizer(head, add_special_tokens=False)["input_ids"]
+    tail_ids = tokenizer(tail, add_special_tokens=False)["input_ids"]
+    split_ok = None
+
+    def user_prompt(prompt):
+        return compact_prompt_text(prompt) if compact else prompt
+
+    def process_batch(batch):
+        nonlocal split_ok
+        samples = [dict(zip(batch.keys(), values)) for values in zip(*batch.values())]
+        users = [carry + user_prompt(sample.get("prompt", "{}")) for sample in samples]
+        responses = [f"{create_output(sample, compact=compact)}<|eot_id|>" for sample in samples]
+
+        if split_ok is None:
+            full = tokenizer([build_prompt(sample, compact=compact) for sample in samples], add_special_tokens=False)["input_ids"]
+            parts = tokenizer(users, add_special_tokens=False)["input_ids"]
+            split_ok = all(f == head_ids + p + tail_ids for f, p in zip(full, parts))
+        if split_ok:
+            prompts = [head_ids + ids + tail_ids for ids in tokenizer(users, add_special_tokens=False)["input_ids"]]
+        else:
+            prompts = tokenizer([build_prompt(sample, compact=compact) for sample in samples], add_special_tokens=False)["input_ids"]
+        response_ids = tokenizer(responses, add_special_tokens=False)["input_ids"]
+
+        input_ids = [p + r for p, r in zip(prompts, response_ids)]
         return {
             'input_ids': input_ids,
-            'attention_mask': attention_mask,
-            'labels': labels
+            'attention_mask': [[1] * len(ids) for ids in input_ids],
+            'labels': [[-100] * len(p) + r for p, r in zip(prompts, response_ids)],
         }
-    
-    return dataset.map(process_sample, remove_columns=dataset.column_names)
+
+    return process_batch
+
+def tokenize_dataset(dataset, tokenizer, compact=False, batch_size=1000):
+    """Tokenize every sample of the dataset (see _batch_tokenizer)."""
+    return dataset.map(_batch_tokenizer(tokenizer, compact=compact), batched=True, batch_size=batch_size,
+                       remove_columns=dataset.column_names)
+
+def load_tokenized_dataset(data_path, tokenizer, split, compact=False, cache_dir=DEFAULT_TOKENIZED_CACHE_DIR):
+    """
+    The shuffled, tokenized split, built once and cached on disk under a key of the tokenizer,
+    the templates and the source data; later launches (and the other ranks) load it directly.
+    """
+    dataset = load_from_disk(data_path)[split]
+    dataset = dataset.shuffle(seed=SHUFFLE_SEED)
+    path = os.path.join(cache_dir, _cache_key(dataset, tokenizer, split, compact))
+    if os.path.exists(path):
+        return load_from_disk(path)
+
+    tokenized = tokenize_dataset(dataset, tokenizer, compact=compact)
+    write_atomic(path, tokenized.save_to_disk)
+    return load_from_disk(path)
+
+def get_custom_dataset(dataset_config, tokenizer, split, compact=False):
+    cache_dir = getattr(dataset_config, "tokenized_cache_dir", DEFAULT_TOKENIZED_CACHE_DIR)
+    return load_tokenized_dataset(dataset_config.data_path, tokenizer, split, compact=compact, cache_dir=cache_dir)
+
+def get_compact_dataset(dataset_config, tokenizer, split):
+    """
+    get_custom_dataset with the compact floorplan encoding (minified JSON, [x, y] fixed-point vertices).
+    Select it with --custom_dataset.file "src/train/floorplan_dataset.py:get_compact_dataset".
+    """
+    return get_custom_dataset(dataset_config, tokenizer, split, compact=True)
+
+class LengthIndexedDataset:
+    """
+    A dataset transformed as it is indexed, which iterates as the token counts of a pretokenized copy
+    ({"input_ids": range(n)} per sample). That is all the cookbook's length-based batch sampler reads,
+    so building it does not transform every sample; the DataLoader then indexes the transformed dataset.
+    """
+
+    def __init__(self, dataset, lengths):
+        self.dataset = dataset
+        self.lengths = lengths
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, key):
+        return self.dataset[key]
+
+    def __getitems__(self, keys):
+        return self.dataset.__getitems__(keys)
+
+    def __iter__(self):
+        for length in self.lengths.tolist():
+            yield {"input_ids": range(length)}
+
+def get_augmented_dataset(dataset_config, tokenizer, split, compact=False):
+    """
+    Training samples augmented and tokenized as they are loaded, so every epoch sees new rotations,
+    flips, translations and room orders (see augmentation.FloorplanAugmenter); other splits are the cached
+    tokenized split. Select it with --custom_dataset.file "src/train/floorplan_dataset.py:get_augmented_dataset"
+    and --batching_strategy padding: its length-based sampler reads the token counts of the cached tokenized
+    split (augmentation only changes them by a few coordinate digits) instead of augmenting every sample up
+    front, as the packing strategy would.
+    """
+    tokenized = get_custom_dataset(dataset_config, tokenizer, split, compact=compact)
+    if split != getattr(dataset_config, "train_split", "train"):
+        return tokenized
+    # Same split and shuffle as the tokenized cache, so its lengths line up with the samples
+    dataset = load_from_disk(dataset_config.data_path)[split].shuffle(seed=SHUFFLE_SEED)
+    tokenize_batch = _batch_tokenizer(tokenizer, compact=compact)
+    augment = FloorplanAugmenter()
+    return LengthIndexedDataset(dataset.with_transform(lambda batch: tokenize_batch(augment(batch))), example_lengths(tokenized))
+
+def get_compact_augmented_dataset(dataset_config, tokenizer, split):
+    """get_augmented_dataset with the compact floorplan encoding."""
+    return get_augmented_dataset(dataset_config, tokenizer, split, compact=True)
+
+def _pad_token_id(tokenizer):
+    return tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+def get_packed_dataset(dataset_config, tokenizer, split, compact=False):
+    """
+    get_custom_dataset packed into fixed-length blocks with per-example position_ids (see sft_packing.pack_dataset).
+    Select it with --custom_dataset.file "src/train/floorplan_dataset.py:get_packed_dataset" together with
+    --batching_strategy padding (so the blocks are not concatenated again); get_data_collator keeps attention
+    within the packed examples. The block size is --custom_dataset.block_size (default 6144).
+    """
+    tokenized = get_custom_dataset(dataset_config, tokenizer, split, compact=compact)
+    block_size = getattr(dataset_config, "block_size", DEFAULT_BLOCK_SIZE)
+    pad_token_id = _pad_token_id(tokenizer)
+    fingerprint = hashlib.sha256(f"{tokenized._fingerprint}|{block_size}|{pad_token_id}|{SHUFFLE_SEED}".encode("utf-8")).hexdigest()
+    return pack_dataset(tokenized, block_size, pad_token_id, seed=SHUFFLE_SEED, fingerprint=fingerprint)
+
+def get_data_collator(processor, dataset_config=None):
+    """
+    Collator for every dataset of this file: pads unpacked examples, and gives packed blocks a block-diagonal
+    causal attention_mask in --custom_dataset.mask_dtype (default bfloat16, the training dtype unless --use_fp16,
+    which needs float16). Set --custom_dataset.flash_attention only for a model loaded with flash-attention-2,
+    which keeps packed examples apart from the position_ids alone and needs no mask.
+    """
+    mask_dtype = None if getattr(dataset_config, "flash_attention", False) else getattr(dataset_config, "mask_dtype", "bfloat16")
+    return FloorplanCollator(_pad_token_id(processor), getattr(processor, "padding_side", "right"), mask_dtype=mask_dtype)
+
+if __name__ == "__main__":
+    import argparse
+    from transformers import AutoTokenizer
+
+    parser = argparse.ArgumentParser(description="Tokenize a converted dataset once, ahead of training")
+    parser.add_argument("--data_path", type=str, required=True, help="Dataset saved by rplan.py (same as --custom_dataset.data_path)")
+    parser.add_argument("--tokenizer", type=str, required=True, help="Tokenizer name or path (the training --model_name)")
+    parser.add_argument("--splits", type=str, nargs="+", default=["train", "test"])
+    parser.add_argument("--compact", action="store_true", help="Use the compact floorplan encoding")
+    parser.add_argument("--cache_dir", type=str, default=DEFAULT_TOKENIZED_CACHE_DIR)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    for split in args.splits:
+        tokenized = load_tokenized_dataset(args.data_path, tokenizer, split, compact=args.compact, cache_dir=args.cache_dir)
+        print(split, tokenized)
@@ -0,0 +1,147 @@
+import bisect
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+import numpy as np
+import pyarrow.compute as pc
+from datasets import Dataset, Features, Sequence as SequenceFeature, Value
+
+if TYPE_CHECKING:
+    import torch
+
+PACKED_FEATURES = Features({
+    "input_ids": SequenceFeature(Value("int64")),
+    "labels": SequenceFeature(Value("int64")),
+    "position_ids": SequenceFeature(Value("int64")),
+})
+
+
+def example_lengths(dataset: Dataset, column: str = "input_ids") -> np.ndarray:
+    """Token count of every example, read from the Arrow list offsets without materializing the lists."""
+    return pc.list_value_length(dataset.with_format("arrow")[column]).to_numpy(zero_copy_only=False).astype(np.int64)
+
+
+def pack_lengths(lengths: Sequence[int], block_size: int) -> List[List[int]]:
+    """
+    Group example indices into blocks of at most block_size tokens (best-fit decreasing).
+    Examples longer than block_size get a block of their own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: (-lengths[i], i))
+    blocks: List[List[int]] = []
+    # Remaining capacity of every open block, kept sorted, with the blocks that have it
+    capacities: List[int] = []
+    blocks_by_capacity: Dict[int, List[int]] = {}
+    for idx in order:
+        length = int(lengths[idx])
+        pos = bisect.bisect_left(capacities, length)
+        if pos < len(capacities):
+            capacity = capacities[pos]
+            block = blocks_by_capacity[capacity].pop()
+            if not blocks_by_capacity[capacity]:
+                del blocks_by_capacity[capacity]
+                capacities.pop(pos)
+        else:
+            capacity = block_size
+            block = len(blocks)
+            blocks.append([])
+        blocks[block].append(idx)
+        remaining = capacity - length
+        if remaining > 0:
+            if remaining not in blocks_by_capacity:
+                bisect.insort(capacities, remaining)
+                blocks_by_capacity[remaining] = []
+            blocks_by_capacity[remaining].append(block)
+    return blocks
+
+
+def pack_dataset(dataset: Dataset, block_size: int, pad_token_id: int, seed: int = 84,
+                 fingerprint: Optional[str] = None) -> Dataset:
+    """
+    Pack tokenized examples (input_ids / labels) into fixed-length blocks of block_size tokens.
+
+    Every block carries position_ids that restart at 0 for each example (and for the padding tail),
+    which mark the example boundaries: FloorplanCollator turns them into a block-diagonal causal
+    attention_mask, or, with flash-attention-2 and no attention_mask, transformers derives the varlen
+    sequence boundaries from them.
+    Labels stay as tokenized; since every example starts with masked prompt tokens, no token is
+    ever trained to predict the start of the next example. Blocks are in a seeded random order.
+    """
+    lengths = example_lengths(dataset)
+    blocks = pack_lengths(lengths.tolist(), block_size)
+    np.random.default_rng(seed).shuffle(blocks)
+
+    def generate():
+        for members in blocks:
+            rows = dataset[sorted(members)]
+            input_ids, labels, position_ids = [], [], []
+            for ids, example_labels in zip(rows["input_ids"], rows["labels"]):
+                input_ids.extend(ids)
+                labels.extend(example_labels)
+                position_ids.extend(range(len(ids)))
+            pad = block_size - len(input_ids)
+            if pad > 0:
+                input_ids.extend([pad_token_id] * pad)
+                labels.extend([-100] * pad)
+                position_ids.extend(range(pad))
+            yield {"input_ids": input_ids, "labels": labels, "position_ids": position_ids}
+
+    return Dataset.from_generator(generate, features=PACKED_FEATURES, fingerprint=fingerprint)
+
+
+def example_ids(position_ids: np.ndarray) -> np.ndarray:
+    """Packed example of every token: a new example (or the padding tail) starts wherever the position_ids restart at 0."""
+    return np.cumsum(np.asarray(position_ids) == 0, axis=-1)
+
+
+def block_causal_allowed(position_ids: np.ndarray) -> np.ndarray:
+    """(batch, length, length) mask of the keys each query may attend to: itself and earlier tokens of its example."""
+    examples = example_ids(position_ids)
+    causal = np.tri(examples.shape[-1], dtype=bool)
+    return (examples[:, :, None] == examples[:, None, :]) & causal
+
+
+class FloorplanCollator:
+    """
+    Pads a batch to its longest example: input_ids with pad_token_id, labels with -100 and the
+    attention_mask with 0, like DataCollatorForSeq2Seq.
+
+    Packed blocks (with position_ids) get a 4-D block-diagonal causal attention_mask, so every token
+    only attends to earlier tokens of its own packed example. It is in the inverted form transformers
+    takes as is (0 where attention is allowed, the dtype minimum elsewhere), in mask_dtype, which must
+    be the model's compute dtype for sdpa. With mask_dtype=None packed blocks get no attention_mask,
+    which is only correct with flash-attention-2 (boundaries from the position_ids); sdpa and eager
+    attention would attend across the examples of a block.
+    """
+
+    def __init__(self, pad_token_id: int, padding_side: str = "right", mask_dtype: Optional[str] = "bfloat16"):
+        self.pad_token_id = pad_token_id
+        self.padding_side = padding_side
+        self.mask_dtype = mask_dtype
+
+    def _pad(self, sequences: List[List[int]], value, length: int) -> "torch.Tensor":
+        import torch
+
+        padded = []
+        for seq in sequences:
+            fill = [value(i) for i in range(length - len(seq))] if callable(value) else [value] * (length - len(seq))
+            padded.append(seq + fill if self.padding_side == "right" else fill + seq)
+        return torch.tensor(padded, dtype=torch.long)
+
+    def _block_causal_mask(self, position_ids: "torch.Tensor") -> "torch.Tensor":
+        import torch
+
+        allowed = torch.from_numpy(block_causal_allowed(position_ids.numpy()))[:, None]
+        dtype = getattr(torch, self.mask_dtype)
+        return torch.zeros(allowed.shape, dtype=dtype).masked_fill(~allowed, torch.finfo(dtype).min)
+
+    def __call__(self, features: List[Dict[str, List[int]]]) -> Dict[str, "torch.Tensor"]:
+        length = max(len(f["input_ids"]) for f in features)
+        batch = {
+            "input_ids": self._pad([list(f["input_ids"]) for f in features], self.pad_token_id, length),
+            "labels": self._pad([list(f["labels"]) for f in features], -100, length),
+        }
+        if "position_ids" in features[0]:
+            batch["position_ids"] = self._pad([list(f["position_ids"]) for f in features], lambda i: i, length)
+            if self.mask_dtype is not None:
+                batch["attention_mask"] = self._block_causal_mask(batch["position_ids"])
+        else:
+            batch["attention_mask"] = self._pad([[1] * len(f["input_ids"]) for f in features], 0, length)
+        return batch
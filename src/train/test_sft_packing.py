@@ -0,0 +1,118 @@
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+from datasets import Dataset
+
+# sft_packing is imported by the training code as a sibling module
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from sft_packing import FloorplanCollator, block_causal_allowed, example_ids, pack_dataset, pack_lengths
+
+BLOCK_SIZE = 32
+PAD_TOKEN_ID = 0
+
+
+@pytest.fixture
+def tokenized_examples():
+    """Tokenized examples with unique token ids and a masked prompt of 1 to 3 tokens"""
+    examples = []
+    for k, length in enumerate([5, 17, 9, 30, 3, 12, 8, 21, 6, 14]):
+        input_ids = [1000 * (k + 1) + t for t in range(length)]
+        prompt = 1 + k % 3
+        examples.append({"input_ids": input_ids, "labels": [-100] * prompt + input_ids[prompt:]})
+    return examples
+
+
+def split_block(block):
+    """(start, end) of every packed example and of the padding tail, where the position_ids restart"""
+    starts = [i for i, position in enumerate(block["position_ids"]) if position == 0]
+    return list(zip(starts, starts[1:] + [len(block["position_ids"])]))
+
+
+class TestPacking:
+    """Packed blocks hold the unpacked examples unchanged"""
+
+    def test_pack_lengths(self):
+        """Every index is in exactly one block, and blocks fit block_size unless an example alone exceeds it"""
+        lengths = [5, 17, 9, 30, 3, 12, 8, 21, 6, 14, 40]
+        blocks = pack_lengths(lengths, BLOCK_SIZE)
+        assert sorted(i for block in blocks for i in block) == list(range(len(lengths)))
+        for block in blocks:
+            assert sum(lengths[i] for i in block) <= BLOCK_SIZE or len(block) == 1
+
+    def test_blocks_match_examples(self, tokenized_examples):
+        """Labels and position_ids of every packed example equal those of the example alone"""
+        packed = pack_dataset(Dataset.from_list(tokenized_examples), BLOCK_SIZE, PAD_TOKEN_ID)
+        by_first_token = {example["input_ids"][0]: example for example in tokenized_examples}
+        seen = []
+        for block in packed:
+            assert len(block["input_ids"]) == len(block["labels"]) == len(block["position_ids"]) == BLOCK_SIZE
+            for start, end in split_block(block):
+                example = by_first_token.get(block["input_ids"][start])
+                if example is None:
+                    # Padding tail
+                    assert block["input_ids"][start:end] == [PAD_TOKEN_ID] * (end - start)
+                    assert block["labels"][start:end] == [-100] * (end - start)
+                    assert end == BLOCK_SIZE
+                    continue
+                assert block["input_ids"][start:end] == example["input_ids"]
+                assert block["labels"][start:end] == example["labels"]
+                assert block["position_ids"][start:end] == list(range(len(example["input_ids"])))
+                # No label crosses into the next example: it starts with masked prompt tokens
+                assert block["labels"][start] == -100
+                seen.append(example["input_ids"][0])
+        assert sorted(seen) == sorted(by_first_token)
+
+    def test_block_boundaries(self, tokenized_examples):
+        """Every packed example, and the padding tail, gets its own example id where its position_ids restart"""
+        packed = pack_dataset(Dataset.from_list(tokenized_examples), BLOCK_SIZE, PAD_TOKEN_ID)
+        position_ids = np.array(packed["position_ids"])
+        ids = example_ids(position_ids)
+        for block, block_ids in zip(packed, ids):
+            expected = np.zeros(BLOCK_SIZE, dtype=np.int64)
+            for k, (start, end) in enumerate(split_block(block)):
+                expected[start:end] = k + 1
+            np.testing.assert_array_equal(block_ids, expected)
+
+    def test_block_causal_allowed(self, tokenized_examples):
+        """Packed tokens only attend to earlier tokens of their own example"""
+        packed = pack_dataset(Dataset.from_list(tokenized_examples), BLOCK_SIZE, PAD_TOKEN_ID)
+        blocks = [packed[i] for i in range(len(packed))]
+        allowed = block_causal_allowed(np.array([block["position_ids"] for block in blocks]))
+        assert allowed.shape == (len(blocks), BLOCK_SIZE, BLOCK_SIZE)
+        for b, block in enumerate(blocks):
+            example = [0] * BLOCK_SIZE
+            for k, (start, end) in enumerate(split_block(block)):
+                example[start:end] = [k] * (end - start)
+            for i in range(BLOCK_SIZE):
+                for j in range(BLOCK_SIZE):
+                    assert allowed[b, i, j] == (example[i] == example[j] and j <= i)
+
+
+class TestCollator:
+    """Tensors of packed blocks and of padded examples"""
+
+    def test_block_causal_mask(self, tokenized_examples):
+        """The inverted 4-D mask is 0 exactly where block_causal_allowed allows attention"""
+        torch = pytest.importorskip("torch")
+        packed = pack_dataset(Dataset.from_list(tokenized_examples), BLOCK_SIZE, PAD_TOKEN_ID)
+        blocks = [packed[i] for i in range(2)]
+        batch = FloorplanCollator(PAD_TOKEN_ID, mask_dtype="float32")(blocks)
+        mask = batch["attention_mask"]
+        assert tuple(mask.shape) == (2, 1, BLOCK_SIZE, BLOCK_SIZE)
+        assert mask.dtype == torch.float32
+        allowed = block_causal_allowed(np.array([block["position_ids"] for block in blocks]))
+        np.testing.assert_array_equal(mask[:, 0].numpy() == 0, allowed)
+        assert (mask[:, 0].numpy()[~allowed] == torch.finfo(torch.float32).min).all()
+
+    def test_flash_attention_blocks_have_no_mask(self, tokenized_examples):
+        """Without a mask_dtype, packed blocks only carry position_ids; unpacked examples are padded"""
+        pytest.importorskip("torch")
+        packed = pack_dataset(Dataset.from_list(tokenized_examples), BLOCK_SIZE, PAD_TOKEN_ID)
+        batch = FloorplanCollator(PAD_TOKEN_ID, mask_dtype=None)([packed[0]])
+        assert "attention_mask" not in batch
+        assert batch["position_ids"][0].tolist() == packed[0]["position_ids"]
+
+        batch = FloorplanCollator(PAD_TOKEN_ID)(tokenized_examples[:2])
+        assert batch["attention_mask"].tolist() == [[1] * 5 + [0] * 12, [1] * 17]
+        assert batch["labels"][0].tolist() == tokenized_examples[0]["labels"] + [-100] * 12
@@ -0,0 +1,67 @@
+import json
+from typing import Any, Dict
+
+# Compact floorplans write coordinates as fixed-point integers in hundredths of a meter,
+# which is exact for the converter's 2-decimal coordinates (round_value)
+COORD_SCALE = 100
+
+COMPACT_SEPARATORS = (",", ":")
+
+
+def dumps(obj: Any, compact: bool = False) -> str:
+    """json.dumps, minified (no spaces after separators) when compact."""
+    if compact:
+        return json.dumps(obj, separators=COMPACT_SEPARATORS)
+    return json.dumps(obj)
+
+
+def to_fixed(value: float) -> int:
+    return int(round(float(value) * COORD_SCALE))
+
+
+def compact_floorplan(floorplan: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compact encoding of a floorplan: every `floor_polygon` becomes a list of [x, y]
+    fixed-point integer pairs instead of {"x": .., "y": ..} objects. Other fields are kept.
+    """
+    spaces = []
+    for space in floorplan.get("spaces") or []:
+        polygon = space.get("floor_polygon") or []
+        spaces.append({**space, "floor_polygon": [[to_fixed(p["x"]), to_fixed(p["y"])] for p in polygon]})
+    return {**floorplan, "spaces": spaces}
+
+
+def _is_vertex_pair(vertex: Any) -> bool:
+    return (isinstance(vertex, (list, tuple)) and len(vertex) == 2
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in vertex))
+
+
+def expand_floorplan(floorplan: Any) -> Any:
+    """
+    Inverse of compact_floorplan: [x, y] fixed-point vertices become {"x": .., "y": ..} in meters.
+    Vertices that are not pairs of numbers (e.g. already expanded ones) are left as they are.
+    """
+    if not isinstance(floorplan, dict):
+        return floorplan
+    expanded = dict(floorplan)
+    for key in ("spaces", "rooms"):
+        spaces = floorplan.get(key)
+        if not isinstance(spaces, list):
+            continue
+        expanded[key] = [
+            {**space, "floor_polygon": [
+                {"x": vertex[0] / COORD_SCALE, "y": vertex[1] / COORD_SCALE} if _is_vertex_pair(vertex) else vertex
+                for vertex in space["floor_polygon"]
+            ]}
+            if isinstance(space, dict) and isinstance(space.get("floor_polygon"), list) else space
+            for space in spaces
+        ]
+    return expanded
+
+
+def compact_prompt_text(prompt: str) -> str:
+    """Minify a prompt JSON string (the dataset's `prompt` column); text that is not JSON is returned unchanged."""
+    try:
+        return dumps(json.loads(prompt), compact=True)
+    except (TypeError, ValueError):
+        return prompt
@@ -25,4 +25,14 @@ Additional rules:
 Return only a JSON object containing an `output` key without extra commentary or explanation.
 """
 
+# SYSTEM_PROMPT for the compact encoding (see src.utils.compact_format)
+SYSTEM_PROMPT_COMPACT = SYSTEM_PROMPT.replace(
+   "an ordered list of `{x: , y:}` vertices defining a simple polygon",
+   "an ordered list of `[x, y]` vertices defining a simple polygon, "
+   "with coordinates as integers in hundredths of a meter (e.g. `[345, 120]` for x = 3.45 m, y = 1.2 m)",
+).replace(
+   "Return only a JSON object",
+   "Return only a minified JSON object",
+)
+
 OVERLAP_TOL = 0
\ No newline at end of file
@@ -1,7 +1,11 @@
-import json
-from src.utils.constants import SYSTEM_PROMPT
+from src.utils.constants import SYSTEM_PROMPT, SYSTEM_PROMPT_COMPACT
+from src.utils.compact_format import compact_floorplan, compact_prompt_text, dumps
     
-def create_output(sample):
+def create_output(sample, compact=False):
+    """
+    Training target of a converted sample. With compact=True it is minified and vertices are
+    [x, y] fixed-point pairs (see src.utils.compact_format); extract_output_json(..., compact=True) reverses it.
+    """
     output = {
         "room_count": sample.get("room_count"),
         "total_area": sample.get("total_area"),
@@ -15,12 +19,19 @@ def create_output(sample):
             for room in sample.get("spaces", [])
         ],
     }
-    return json.dumps({"output": output})
+    if compact:
+        output = compact_floorplan(output)
+    return dumps({"output": output}, compact=compact)
 
-def build_prompt(sample):
+def build_prompt(sample, compact=False):
+    """Chat prompt of a sample; compact=True minifies the prompt JSON and asks for compact output."""
+    system_prompt = SYSTEM_PROMPT_COMPACT if compact else SYSTEM_PROMPT
+    user_prompt = sample.get('prompt', '{}')
+    if compact:
+        user_prompt = compact_prompt_text(user_prompt)
     prompt = (
         f"<|begin_of_text|><|start_header_id|>system<|end_header_id|>\n"
-        f"{SYSTEM_PROMPT}<|eot_id|><|start_header_id|>user<|end_header_id|>\n"
-        f"{sample.get('prompt', '{}')}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n"
+        f"{system_prompt}<|eot_id|><|start_header_id|>user<|end_header_id|>\n"
+        f"{user_prompt}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n"
     )
     return prompt
@@ -0,0 +1,32 @@
+import hashlib
+import os
+import shutil
+from typing import Callable
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """Hash of a tokenizer's vocabulary and rules, for keying caches of tokenized data."""
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        return hashlib.sha256(backend.to_str().encode("utf-8")).hexdigest()
+    return f"{type(tokenizer).__name__}|{tokenizer.name_or_path}|{len(tokenizer)}"
+
+
+def write_atomic(path: str, write: Callable[[str], None], suffix: str = "") -> None:
+    """
+    Call write with a temporary path next to path (ending in suffix), then move the result to path,
+    so concurrent processes (e.g. the other ranks) never read a partial file or directory.
+    If another process moved its result there first, the temporary one is dropped.
+    """
+    tmp_path = f"{path}.tmp{os.getpid()}{suffix}"
+    write(tmp_path)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # A directory cannot replace a non-empty one: another process finished first
+        if not os.path.exists(path):
+            raise
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        else:
+            os.remove(tmp_path)
@@ -0,0 +1,68 @@
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, Optional
+
+# Keys per SELECT ... IN (...), well below SQLite's bound-parameter limit
+KEYS_PER_QUERY = 500
+
+
+class SQLiteCache:
+    """
+    On-disk key-value cache of JSON values in one SQLite table, with (key, kind) as its primary key so
+    that different kinds of entries can share one file. Subclasses decide how keys are derived (and so
+    when entries go stale); hits and misses count the lookups.
+    """
+
+    def __init__(self, path: str, table: str):
+        self.path = path
+        self.table = table
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT NOT NULL, kind TEXT NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (key, kind))"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, kind: str = "") -> Optional[Any]:
+        found = self.get_many([key], kind)
+        return found.get(key)
+
+    def get_many(self, keys: Iterable[str], kind: str = "") -> Dict[str, Any]:
+        found: Dict[str, Any] = {}
+        keys = list(keys)
+        for start in range(0, len(keys), KEYS_PER_QUERY):
+            chunk = keys[start:start + KEYS_PER_QUERY]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT key, value FROM {self.table} WHERE kind = ? AND key IN ({placeholders})",
+                (kind, *chunk),
+            ).fetchall()
+            for key, value in rows:
+                found[key] = json.loads(value)
+        # Per looked-up key, so that repeated keys (identical samples) count every time
+        hits = sum(key in found for key in keys)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def put(self, key: str, value: Any, kind: str = "") -> None:
+        self.put_many({key: value}, kind)
+
+    def put_many(self, values: Dict[str, Any], kind: str = "") -> None:
+        if not values:
+            return
+        self._conn.executemany(
+            f"INSERT OR REPLACE INTO {self.table} (key, kind, value) VALUES (?, ?, ?)",
+            [(key, kind, json.dumps(value)) for key, value in values.items()],
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,61 @@
+import argparse
+import statistics
+from collections import defaultdict
+from typing import Dict, List
+from datasets import load_from_disk
+from transformers import AutoTokenizer
+from src.utils.create_example import build_prompt, create_output
+
+COLUMNS = ["prompt", "target", "total"]
+
+
+def token_counts(sample, tokenizer, compact: bool) -> Dict[str, int]:
+    """Prompt, target (with the end-of-turn token, as in SFT) and total token counts of one sample."""
+    prompt = len(tokenizer(build_prompt(sample, compact=compact), add_special_tokens=False)["input_ids"])
+    target = len(tokenizer(f"{create_output(sample, compact=compact)}<|eot_id|>", add_special_tokens=False)["input_ids"])
+    return {"prompt": prompt, "target": target, "total": prompt + target}
+
+
+def token_report(dataset, tokenizer) -> Dict[int, Dict[str, Dict[str, List[int]]]]:
+    """Token counts per room count, for the default and the compact encoding."""
+    report: Dict[int, Dict[str, Dict[str, List[int]]]] = defaultdict(
+        lambda: {encoding: {column: [] for column in COLUMNS} for encoding in ("default", "compact")}
+    )
+    for sample in dataset:
+        for encoding in ("default", "compact"):
+            counts = token_counts(sample, tokenizer, compact=encoding == "compact")
+            for column in COLUMNS:
+                report[sample["room_count"]][encoding][column].append(counts[column])
+    return dict(sorted(report.items()))
+
+
+def print_report(report, context_length: int) -> None:
+    header = "| Rooms | Samples | " + " | ".join(
+        f"{column} default | {column} compact | {column} saved" for column in COLUMNS
+    ) + f" | > {context_length} default | > {context_length} compact |"
+    print(header)
+    print("|" + "|".join(["------------"] * (3 * len(COLUMNS) + 4)) + "|")
+    for room_count, encodings in report.items():
+        cells = [str(room_count), str(len(encodings["default"]["total"]))]
+        for column in COLUMNS:
+            default = statistics.mean(encodings["default"][column])
+            compact = statistics.mean(encodings["compact"][column])
+            cells += [f"{default:.0f}", f"{compact:.0f}", f"{100 * (1 - compact / default):.1f}%"]
+        for encoding in ("default", "compact"):
+            cells.append(str(sum(1 for total in encodings[encoding]["total"] if total > context_length)))
+        print("| " + " | ".join(cells) + " |")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mean token counts per room count of the default and compact floorplan encodings")
+    parser.add_argument("--dataset", type=str, default="datasets/rplan_converted_no_doors", help="Dataset saved by rplan.py")
+    parser.add_argument("--split", type=str, default="train")
+    parser.add_argument("--tokenizer", type=str, default="models/Llama-3.1-8B-Instruct", help="Tokenizer name or path")
+    parser.add_argument("--limit", type=int, default=None, help="Only count the first N samples")
+    parser.add_argument("--context_length", type=int, default=6144, help="Report how many samples exceed this length")
+    args = parser.parse_args()
+
+    dataset = load_from_disk(args.dataset)[args.split]
+    if args.limit:
+        dataset = dataset.select(range(min(args.limit, len(dataset))))
+    print_report(token_report(dataset, AutoTokenizer.from_pretrained(args.tokenizer)), args.context_length)